@@ -0,0 +1,134 @@
+"""Benchmark the daily measurement count query at scale.
+
+Compares the old ``func.date(measured_at) == day`` filter against the half-open
+timestamp range, with the old single-column index and the composite
+(user_id, measured_at) index.
+
+    python -m benchmarks.daily_count --rows 1000000 --users 1000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import create_engine, func, insert, text
+from sqlalchemy.orm import Session
+
+from src.database.models import Base, Measurement, User
+from src.database.repositories import MeasurementRepository
+
+
+def seed(engine, users: int, rows: int, days: int) -> None:
+    """Fill the database with synthetic users and measurements."""
+    Base.metadata.create_all(engine)
+    start = datetime(2024, 1, 1)
+    rng = random.Random(42)
+
+    with engine.begin() as connection:
+        connection.execute(
+            insert(User),
+            [{"telegram_id": 1_000_000 + i, "registered_at": start} for i in range(1, users + 1)],
+        )
+
+        batch = []
+        for _ in range(rows):
+            batch.append(
+                {
+                    "user_id": rng.randint(1, users),
+                    "systolic": rng.randint(100, 160),
+                    "diastolic": rng.randint(60, 99),
+                    "measured_at": start + timedelta(seconds=rng.randint(0, days * 86400)),
+                }
+            )
+            if len(batch) == 50_000:
+                connection.execute(insert(Measurement), batch)
+                batch.clear()
+        if batch:
+            connection.execute(insert(Measurement), batch)
+
+
+def count_with_date_function(session: Session, user_id: int, target_date: date) -> int:
+    """The previous, non-sargable implementation."""
+    return (
+        session.query(Measurement)
+        .filter(Measurement.user_id == user_id, func.date(Measurement.measured_at) == target_date)
+        .count()
+    )
+
+
+def count_with_range(session: Session, user_id: int, target_date: date) -> int:
+    """The current implementation: a half-open timestamp range on the composite index."""
+    return MeasurementRepository(session).get_daily_measurement_count(user_id, target_date)
+
+
+def time_queries(engine, query, users: int, days: int, iterations: int) -> list[float]:
+    """Run the query for random users/days and return latencies in milliseconds."""
+    rng = random.Random(7)
+    latencies = []
+    with Session(engine) as session:
+        for _ in range(iterations):
+            user_id = rng.randint(1, users)
+            target_date = date(2024, 1, 1) + timedelta(days=rng.randint(0, days - 1))
+            started = time.perf_counter()
+            query(session, user_id, target_date)
+            latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def set_index(engine, composite: bool) -> None:
+    """Switch between the old single-column and the new composite index."""
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX IF EXISTS ix_measurements_user_id"))
+        connection.execute(text("DROP INDEX IF EXISTS ix_measurements_user_id_measured_at"))
+        if composite:
+            connection.execute(
+                text(
+                    "CREATE INDEX ix_measurements_user_id_measured_at "
+                    "ON measurements (user_id, measured_at)"
+                )
+            )
+        else:
+            connection.execute(
+                text("CREATE INDEX ix_measurements_user_id ON measurements (user_id)")
+            )
+        connection.execute(text("ANALYZE"))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--database-url", help="SQLite URL (default: temporary file)")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    engine = create_engine(database_url)
+    print(f"Seeding {args.rows} measurements for {args.users} users into {database_url}")
+    seed(engine, args.users, args.rows, args.days)
+
+    cases = [
+        ("func.date + user_id index", False, count_with_date_function),
+        ("func.date + composite index", True, count_with_date_function),
+        ("range + composite index", True, count_with_range),
+    ]
+
+    print(f"{'case':32} {'p50 ms':>8} {'p99 ms':>8} {'mean ms':>8}")
+    for name, composite, query in cases:
+        set_index(engine, composite)
+        latencies = sorted(time_queries(engine, query, args.users, args.days, args.iterations))
+        p50 = latencies[len(latencies) // 2]
+        p99 = latencies[int(len(latencies) * 0.99) - 1]
+        print(f"{name:32} {p50:8.3f} {p99:8.3f} {statistics.mean(latencies):8.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""Compare SQLite write throughput with the default settings and the tuned profile.
+
+Writer threads record measurements one commit at a time, as the bot does for
+each message, while reader threads count today's readings. The baseline uses
+SQLite's defaults (rollback journal, synchronous=FULL, 2 MB cache, no mmap).
+
+    python -m benchmarks.sqlite_profile --writers 4 --readers 2 --measurements 2000
+"""
+
+import argparse
+import json
+import os
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+from src.database.database import Database, EngineOptions
+from src.database.repositories import get_repositories
+
+PROFILES = {
+    "default": EngineOptions(
+        sqlite_journal_mode="delete",
+        sqlite_synchronous="full",
+        sqlite_cache_size_kb=2000,
+        sqlite_mmap_size_mb=0,
+    ),
+    "tuned": EngineOptions(),
+}
+
+
+def run(profile: str, writers: int, readers: int, measurements: int, users: int) -> dict:
+    database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    db = Database(database_url, PROFILES[profile])
+    db.create_tables()
+    with db.get_session() as session:
+        user_repo, _ = get_repositories(session)
+        user_ids = [user_repo.create_user(telegram_id=1_000_000 + i).id for i in range(users)]
+
+    per_writer = measurements // writers
+    writing = threading.Event()
+    reads = [0] * readers
+
+    def write(worker: int) -> None:
+        for i in range(per_writer):
+            with db.get_session() as session:
+                _, measurement_repo = get_repositories(session)
+                user_id = user_ids[(worker * per_writer + i) % users]
+                measurement_repo.create_measurement(user_id, 120, 80)
+
+    def read(worker: int) -> None:
+        while writing.is_set():
+            with db.get_session() as session:
+                _, measurement_repo = get_repositories(session)
+                user_id = user_ids[reads[worker] % users]
+                measurement_repo.get_daily_measurement_count(user_id, datetime.utcnow().date())
+            reads[worker] += 1
+
+    threads = [threading.Thread(target=write, args=(i,)) for i in range(writers)]
+    reader_threads = [threading.Thread(target=read, args=(i,)) for i in range(readers)]
+
+    writing.set()
+    for thread in reader_threads:
+        thread.start()
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    writing.clear()
+    for thread in reader_threads:
+        thread.join()
+    db.engine.dispose()
+
+    return {
+        "profile": profile,
+        "writers": writers,
+        "readers": readers,
+        "measurements": per_writer * writers,
+        "seconds": round(elapsed, 3),
+        "inserts_per_second": round(per_writer * writers / elapsed, 1),
+        "reads_per_second": round(sum(reads) / elapsed, 1),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--profile", choices=[*PROFILES, "both"], default="both")
+    parser.add_argument("--writers", type=int, default=4)
+    parser.add_argument("--readers", type=int, default=2)
+    parser.add_argument("--measurements", type=int, default=2000)
+    parser.add_argument("--users", type=int, default=100)
+    args = parser.parse_args()
+
+    profiles = list(PROFILES) if args.profile == "both" else [args.profile]
+    results = [
+        run(profile, args.writers, args.readers, args.measurements, args.users)
+        for profile in profiles
+    ]
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""Benchmark the hot paths against a seeded database and emit JSON for regression tracking.
+
+Seeds users x measurements of synthetic data, then measures:
+
+- handle_measurement end to end (parsing, user lookup, insert, daily count) with
+  a stub message in place of the Bot
+- ReportGenerator.generate_csv_report at 10, 1k and 100k rows
+- MeasurementRepository.get_daily_measurement_count for random users and days
+- a full reminder fan-out through the outbox to a fake Telegram Bot API server
+
+    python -m benchmarks.suite --users 1000 --measurements 100 --output results.json
+    python -m benchmarks.suite --database-url postgresql://bp:bp@localhost/bp_bench
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+from datetime import date, datetime, timedelta
+
+import sqlalchemy
+
+from benchmarks.daily_count import seed
+from benchmarks.update_latency import TOKEN, FakeTelegramServer
+
+BENCHMARKS = ("handle_measurement", "csv_report", "daily_count", "reminder_fanout")
+REPORT_SIZES = (10, 1_000, 100_000)
+SEED_START = datetime(2024, 1, 1)
+
+
+def summarize(name: str, latencies: list[float], **params) -> dict:
+    """Latency percentiles (milliseconds) and throughput of one benchmark case."""
+    latencies = sorted(latencies)
+    total = sum(latencies)
+    return {
+        "name": name,
+        **params,
+        "iterations": len(latencies),
+        "p50_ms": round(latencies[len(latencies) // 2] * 1000, 3),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)] * 1000, 3),
+        "mean_ms": round(statistics.mean(latencies) * 1000, 3),
+        "ops_per_second": round(len(latencies) / total, 1) if total else None,
+    }
+
+
+class StubMessage:
+    """Just enough of aiogram's Message for the measurement handler; replies are collected."""
+
+    def __init__(self, telegram_id: int, text: str):
+        self.text = text
+        self.from_user = type("User", (), {"id": telegram_id})()
+        self.replies: list[str] = []
+
+    async def answer(self, text: str, **kwargs) -> None:
+        self.replies.append(text)
+
+
+async def bench_handle_measurement(users: int, iterations: int) -> list[dict]:
+    from src.bot.handlers import handle_measurement
+
+    rng = random.Random(1)
+    latencies = []
+    for _ in range(iterations):
+        message = StubMessage(
+            1_000_000 + rng.randint(1, users), f"{rng.randint(100, 160)}/{rng.randint(60, 99)}"
+        )
+        started = time.perf_counter()
+        await handle_measurement(message)
+        latencies.append(time.perf_counter() - started)
+        if not message.replies[0].startswith("✅"):
+            raise RuntimeError(f"Unexpected reply: {message.replies[0]}")
+    return [summarize("handle_measurement", latencies)]
+
+
+async def bench_csv_report(iterations: int) -> list[dict]:
+    from src.database.models import MeasurementRow
+    from src.services.report_generator import ReportGenerator
+
+    rng = random.Random(2)
+    results = []
+    for size in REPORT_SIZES:
+        rows = [
+            MeasurementRow(
+                rng.randint(100, 160), rng.randint(60, 99), SEED_START + timedelta(minutes=i)
+            )
+            for i in range(size)
+        ]
+        generator = ReportGenerator()
+        # Keep the total work roughly constant across sizes
+        runs = max(3, min(iterations, 1_000_000 // size))
+        latencies = []
+        report = ""
+        for _ in range(runs):
+            started = time.perf_counter()
+            report = generator.generate_csv_report(rows)
+            latencies.append(time.perf_counter() - started)
+        results.append(
+            summarize("csv_report", latencies, rows=size, report_bytes=len(report.encode()))
+        )
+    return results
+
+
+async def bench_daily_count(users: int, days: int, iterations: int) -> list[dict]:
+    from src.database.database import get_async_session
+    from src.database.repositories import get_async_repositories
+
+    rng = random.Random(3)
+    latencies = []
+    async with get_async_session() as session:
+        _, measurement_repo = get_async_repositories(session)
+        for _ in range(iterations):
+            user_id = rng.randint(1, users)
+            target_date = date(2024, 1, 1) + timedelta(days=rng.randint(0, days - 1))
+            started = time.perf_counter()
+            await measurement_repo.get_daily_measurement_count(user_id, target_date)
+            latencies.append(time.perf_counter() - started)
+    return [summarize("daily_count", latencies)]
+
+
+async def bench_reminder_fanout(rate: float, concurrency: int) -> list[dict]:
+    from aiogram import Bot
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+    from aiohttp import web
+
+    from src.services.broadcaster import Broadcaster
+    from src.services.outbox import ReminderOutbox
+
+    telegram = FakeTelegramServer()
+    api_app = web.Application()
+    api_app.router.add_route("*", "/bot{token}/{method}", telegram.handle)
+    api_runner = web.AppRunner(api_app)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, "127.0.0.1", 0).start()
+    api_port = api_runner.addresses[0][1]
+
+    bot = Bot(
+        token=TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{api_port}")),
+    )
+    outbox = ReminderOutbox(Broadcaster(bot, rate_limit=rate, concurrency=concurrency))
+    try:
+        started = time.perf_counter()
+        queued = await outbox.enqueue(
+            datetime.utcnow().replace(microsecond=0), include_default=True
+        )
+        enqueued = time.perf_counter()
+        while await outbox.drain_once():
+            pass
+        finished = time.perf_counter()
+        result = outbox.result
+    finally:
+        await bot.session.close()
+        await api_runner.cleanup()
+
+    return [
+        {
+            "name": "reminder_fanout",
+            "recipients": queued,
+            "rate_limit": rate,
+            "concurrency": concurrency,
+            "enqueue_ms": round((enqueued - started) * 1000, 3),
+            "total_seconds": round(finished - started, 3),
+            "sent": result.sent if result else 0,
+            "failed": result.failed if result else 0,
+            "messages_per_second": round(queued / (finished - started), 1),
+        }
+    ]
+
+
+async def run(args: argparse.Namespace, database_url: str) -> list[dict]:
+    # Imported late: the application reads its settings from the environment on import
+    from src.database.database import (
+        init_async_database,
+        init_database,
+        is_async_database_url,
+        to_sync_database_url,
+    )
+
+    if is_async_database_url(database_url):
+        await init_async_database(database_url)
+    else:
+        init_database(database_url)
+
+    if not args.skip_seed:
+        engine = sqlalchemy.create_engine(to_sync_database_url(database_url))
+        seed(engine, args.users, args.users * args.measurements, args.days)
+        engine.dispose()
+
+    selected = args.only or BENCHMARKS
+    results = []
+    if "handle_measurement" in selected:
+        results += await bench_handle_measurement(args.users, args.iterations)
+    if "csv_report" in selected:
+        results += await bench_csv_report(args.iterations)
+    if "daily_count" in selected:
+        results += await bench_daily_count(args.users, args.days, args.iterations)
+    if "reminder_fanout" in selected:
+        results += await bench_reminder_fanout(args.rate, args.concurrency)
+    return results
+
+
+def environment(database_url: str) -> dict:
+    """What the numbers were measured on."""
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "commit": commit,
+        "timestamp": datetime.utcnow().isoformat(timespec="seconds") + "Z",
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "platform": platform.platform(),
+        "database": sqlalchemy.engine.make_url(database_url).get_backend_name(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--only", nargs="+", choices=BENCHMARKS, help="Benchmarks to run")
+    parser.add_argument("--users", type=int, default=1_000)
+    parser.add_argument("--measurements", type=int, default=100, help="Seeded rows per user")
+    parser.add_argument("--days", type=int, default=90, help="Days the seeded rows span")
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--rate", type=float, default=1_000, help="Fan-out messages per second")
+    parser.add_argument("--concurrency", type=int, default=20, help="Fan-out senders")
+    parser.add_argument("--database-url", help="Database URL (default: temporary SQLite file)")
+    parser.add_argument("--skip-seed", action="store_true", help="Reuse an already seeded database")
+    parser.add_argument("--output", help="Write the JSON results to this file")
+    args = parser.parse_args()
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault("TELEGRAM_TOKEN", TOKEN)
+    os.environ["DATABASE_URL"] = database_url
+
+    report = {
+        "environment": environment(database_url),
+        "parameters": {
+            "users": args.users,
+            "measurements_per_user": args.measurements,
+            "days": args.days,
+            "iterations": args.iterations,
+        },
+        "results": asyncio.run(run(args, database_url)),
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    print(output)
+
+
+if __name__ == "__main__":
+    main()
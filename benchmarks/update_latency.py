@@ -0,0 +1,255 @@
+"""Replay Telegram updates through polling or webhook mode and measure handling latency.
+
+A local fake Bot API server stands in for Telegram: in polling mode it serves
+the updates from getUpdates, in webhook mode they are POSTed to the bot's aiohttp
+webhook server. Latency is measured from the moment an update is published to
+the moment the dispatcher finishes handling it.
+
+    python -m benchmarks.update_latency --mode both --users 200 --updates-count 2000
+    python -m benchmarks.update_latency --mode webhook --updates recorded.jsonl
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from aiohttp import ClientSession, web
+
+TOKEN = "123456:BENCHMARK"
+WEBHOOK_PATH = "/webhook"
+WEBHOOK_SECRET = "benchmark-secret"
+
+
+class FakeTelegramServer:
+    """Minimal Bot API: long-polled getUpdates plus canned replies for send methods."""
+
+    def __init__(self):
+        self.updates: list[dict] = []
+        self._new_updates = asyncio.Event()
+        self._message_id = 0
+
+    def publish(self, update: dict) -> None:
+        self.updates.append(update)
+        self._new_updates.set()
+
+    async def handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"].lower()
+        params = dict(await request.post())
+
+        if method == "getupdates":
+            result = await self._get_updates(
+                int(params.get("offset", 0)), float(params.get("timeout", 0))
+            )
+        elif method == "getme":
+            result = {"id": 1, "is_bot": True, "first_name": "Benchmark", "username": "bench_bot"}
+        elif method in ("sendmessage", "senddocument"):
+            self._message_id += 1
+            result = {
+                "message_id": self._message_id,
+                "date": int(time.time()),
+                "chat": {"id": int(params["chat_id"]), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        else:
+            result = True
+
+        return web.json_response({"ok": True, "result": result})
+
+    async def _get_updates(self, offset: int, timeout: float) -> list[dict]:
+        pending = [update for update in self.updates if update["update_id"] >= offset]
+        if not pending and timeout:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), timeout)
+            except TimeoutError:
+                return []
+            pending = [update for update in self.updates if update["update_id"] >= offset]
+        return pending[:100]
+
+
+def synthetic_updates(users: int, count: int) -> list[dict]:
+    """Measurement messages from random registered users."""
+    rng = random.Random(42)
+    updates = []
+    for update_id in range(1, count + 1):
+        telegram_id = 1_000_000 + rng.randint(1, users)
+        updates.append(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": int(time.time()),
+                    "chat": {"id": telegram_id, "type": "private"},
+                    "from": {"id": telegram_id, "is_bot": False, "first_name": "User"},
+                    "text": f"{rng.randint(100, 160)}/{rng.randint(60, 99)}",
+                },
+            }
+        )
+    return updates
+
+
+def load_updates(path: str) -> list[dict]:
+    """Read recorded updates (one Update JSON object per line), renumbering IDs."""
+    with open(path) as file:
+        updates = [json.loads(line) for line in file if line.strip()]
+    for update_id, update in enumerate(updates, start=1):
+        update["update_id"] = update_id
+    return updates
+
+
+async def run(mode: str, updates: list[dict], users: int, rate: float, database_url: str) -> dict:
+    # Imported late: the application reads its settings from the environment on import
+    from aiogram import Bot, Dispatcher
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import TelegramAPIServer
+
+    from src.bot.handlers import router
+    from src.bot.webhook import start_webhook_server
+    from src.database.database import (
+        Database,
+        init_async_database,
+        init_database,
+        is_async_database_url,
+        to_sync_database_url,
+    )
+    from src.database.repositories import get_repositories
+
+    if is_async_database_url(database_url):
+        await init_async_database(database_url)
+    else:
+        init_database(database_url)
+
+    seed_db = Database(to_sync_database_url(database_url))
+    with seed_db.get_session() as session:
+        user_repo, _ = get_repositories(session)
+        for i in range(1, users + 1):
+            user_repo.create_user(telegram_id=1_000_000 + i)
+    seed_db.engine.dispose()
+
+    telegram = FakeTelegramServer()
+    api_app = web.Application()
+    api_app.router.add_route("*", "/bot{token}/{method}", telegram.handle)
+    api_runner = web.AppRunner(api_app)
+    await api_runner.setup()
+    await web.TCPSite(api_runner, "127.0.0.1", 0).start()
+    api_port = api_runner.addresses[0][1]
+
+    bot = Bot(
+        token=TOKEN,
+        session=AiohttpSession(api=TelegramAPIServer.from_base(f"http://127.0.0.1:{api_port}")),
+    )
+    dp = Dispatcher()
+    dp.include_router(router)
+
+    published: dict[int, float] = {}
+    handled: dict[int, float] = {}
+    all_handled = asyncio.Event()
+
+    @dp.update.outer_middleware()
+    async def measure(handler, update, data):
+        try:
+            return await handler(update, data)
+        finally:
+            handled[update.update_id] = time.perf_counter()
+            if len(handled) == len(updates):
+                all_handled.set()
+
+    interval = 1 / rate
+    if mode == "polling":
+        polling = asyncio.create_task(
+            dp.start_polling(bot, handle_signals=False, polling_timeout=5)
+        )
+        await asyncio.sleep(0.5)
+        for update in updates:
+            published[update["update_id"]] = time.perf_counter()
+            telegram.publish(update)
+            await asyncio.sleep(interval)
+        await asyncio.wait_for(all_handled.wait(), timeout=300)
+        await dp.stop_polling()
+        await polling
+    else:
+        webhook_runner = await start_webhook_server(
+            bot, dp, host="127.0.0.1", port=0, path=WEBHOOK_PATH, secret=WEBHOOK_SECRET
+        )
+        webhook_port = webhook_runner.addresses[0][1]
+        url = f"http://127.0.0.1:{webhook_port}{WEBHOOK_PATH}"
+        headers = {"X-Telegram-Bot-Api-Secret-Token": WEBHOOK_SECRET}
+
+        async with ClientSession() as client:
+
+            async def post(update: dict) -> None:
+                async with client.post(url, json=update, headers=headers) as response:
+                    response.raise_for_status()
+
+            posts = []
+            for update in updates:
+                published[update["update_id"]] = time.perf_counter()
+                posts.append(asyncio.create_task(post(update)))
+                await asyncio.sleep(interval)
+            await asyncio.gather(*posts)
+            await asyncio.wait_for(all_handled.wait(), timeout=300)
+        await webhook_runner.cleanup()
+
+    await api_runner.cleanup()
+    await bot.session.close()
+
+    latencies = sorted((handled[uid] - published[uid]) * 1000 for uid in published)
+    return {
+        "mode": mode,
+        "updates": len(latencies),
+        "rate": rate,
+        "p50_ms": round(latencies[len(latencies) // 2], 3),
+        "p99_ms": round(latencies[max(0, int(len(latencies) * 0.99) - 1)], 3),
+        "max_ms": round(latencies[-1], 3),
+        "mean_ms": round(statistics.mean(latencies), 3),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--mode", choices=["polling", "webhook", "both"], default="both")
+    parser.add_argument("--updates", help="JSONL file with recorded updates")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--updates-count", type=int, default=2000)
+    parser.add_argument("--rate", type=float, default=500, help="Updates published per second")
+    parser.add_argument("--database-url", help="Database URL (default: temporary SQLite file)")
+    args = parser.parse_args()
+
+    if args.mode == "both":
+        # A router can only be attached to one dispatcher, so each mode gets its own process
+        results = []
+        for mode in ("polling", "webhook"):
+            command = [sys.executable, "-m", "benchmarks.update_latency", "--mode", mode]
+            for option in ("updates", "users", "updates_count", "rate", "database_url"):
+                value = getattr(args, option)
+                if value is not None:
+                    command += [f"--{option.replace('_', '-')}", str(value)]
+            output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+            results.append(json.loads(output.strip().splitlines()[-1]))
+        print(json.dumps(results, indent=2))
+        return
+
+    database_url = args.database_url
+    if not database_url:
+        database_url = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+    os.environ.setdefault("TELEGRAM_TOKEN", TOKEN)
+    os.environ["DATABASE_URL"] = database_url
+
+    updates = (
+        load_updates(args.updates)
+        if args.updates
+        else synthetic_updates(args.users, args.updates_count)
+    )
+    result = asyncio.run(run(args.mode, updates, args.users, args.rate, database_url))
+    print(json.dumps(result))
+
+
+if __name__ == "__main__":
+    main()
@@ -10,9 +10,25 @@ from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
 
-from src.bot.handlers import router
+from src.bot.handlers import (
+    active_user_cache,
+    bulk_exporter,
+    chart_renderer,
+    measurement_writer,
+    report_cache,
+    report_executor,
+    router,
+)
+from src.bot.webhook import start_webhook_server
 from src.config.settings import settings
-from src.database.database import init_database
+from src.database.database import (
+    EngineOptions,
+    init_async_database,
+    init_database,
+    is_async_database_url,
+)
+from src.services.leader import LeaderLease
+from src.services.metrics import start_metrics_server
 from src.services.scheduler import ReminderScheduler
 
 log_handlers = [logging.StreamHandler(sys.stdout)]
@@ -37,11 +53,21 @@ logger = logging.getLogger(__name__)
 async def main() -> NoReturn:
     """Main application entry point."""
     logger.info("Starting Blood Pressure Tracker Bot")
+    metrics_runner = None
 
     try:
         # Initialize database
         logger.info(f"Initializing database: {settings.database_url}")
-        init_database(settings.database_url)
+        engine_options = EngineOptions.from_settings(settings)
+        if is_async_database_url(settings.database_url):
+            await init_async_database(settings.database_url, engine_options)
+        else:
+            init_database(settings.database_url, engine_options)
+
+        if settings.metrics_port:
+            metrics_runner = await start_metrics_server(
+                settings.metrics_host, settings.metrics_port
+            )
 
         # Initialize bot and dispatcher
         bot = Bot(
@@ -52,23 +78,56 @@ async def main() -> NoReturn:
         dp = Dispatcher()
         dp.include_router(router)
 
-        # Initialize reminder scheduler
-        scheduler = ReminderScheduler(bot)
+        # Initialize reminder scheduler; with several instances one of them owns reminders
+        lease = None
+        if settings.reminder_leader_election:
+            lease = LeaderLease(
+                "reminders", settings.instance_id, ttl=settings.reminder_lease_ttl
+            )
+        scheduler = ReminderScheduler(
+            bot,
+            lease=lease,
+            schedule_refresh=settings.reminder_schedule_refresh,
+            active_users=active_user_cache,
+        )
+        # Handlers receive it to apply personal reminder schedules immediately
+        dp["scheduler"] = scheduler
 
-        # Start both bot polling and scheduler
-        logger.info("Starting bot and scheduler...")
+        # Start both update handling and scheduler
+        logger.info(f"Starting bot ({settings.bot_mode}) and scheduler...")
 
         async def start_polling():
             """Start bot polling."""
+            # Telegram refuses getUpdates while a webhook is registered
+            await bot.delete_webhook()
             await dp.start_polling(bot)
 
+        async def start_webhook():
+            """Register the webhook and serve updates until cancelled."""
+            await bot.set_webhook(
+                url=f"{settings.webhook_url.rstrip('/')}{settings.webhook_path}",
+                secret_token=settings.webhook_secret,
+            )
+            runner = await start_webhook_server(
+                bot,
+                dp,
+                host=settings.webhook_host,
+                port=settings.webhook_port,
+                path=settings.webhook_path,
+                secret=settings.webhook_secret,
+            )
+            try:
+                await asyncio.Event().wait()
+            finally:
+                await runner.cleanup()
+
         async def start_scheduler():
             """Start reminder scheduler."""
             await scheduler.start()
 
         # Run both tasks concurrently
         await asyncio.gather(
-            start_polling(),
+            start_webhook() if settings.bot_mode == "webhook" else start_polling(),
             start_scheduler(),
             return_exceptions=True
         )
@@ -79,6 +138,16 @@ async def main() -> NoReturn:
         logger.error(f"Fatal error: {e}")
         sys.exit(1)
     finally:
+        if measurement_writer is not None:
+            await measurement_writer.close()
+        report_executor.shutdown()
+        chart_renderer.shutdown()
+        bulk_exporter.shutdown()
+        if report_cache is not None:
+            logger.info(f"Report cache: {report_cache.stats()}")
+            report_cache.close()
+        if metrics_runner is not None:
+            await metrics_runner.cleanup()
         logger.info("Bot shutdown complete")
 
 
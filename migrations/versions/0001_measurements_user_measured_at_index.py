@@ -0,0 +1,51 @@
+"""Composite (user_id, measured_at) index on measurements
+
+Replaces the single-column user_id index: the composite index serves the
+per-user filters and the measured_at ordering/range scans in one lookup.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0001"
+down_revision: str | None = None
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _measurement_indexes() -> set[str] | None:
+    inspector = sa.inspect(op.get_bind())
+    if "measurements" not in inspector.get_table_names():
+        return None
+    return {index["name"] for index in inspector.get_indexes("measurements")}
+
+
+def upgrade() -> None:
+    indexes = _measurement_indexes()
+    if indexes is None:
+        return
+
+    if "ix_measurements_user_id_measured_at" not in indexes:
+        op.create_index(
+            "ix_measurements_user_id_measured_at", "measurements", ["user_id", "measured_at"]
+        )
+    if "ix_measurements_user_id" in indexes:
+        op.drop_index("ix_measurements_user_id", table_name="measurements")
+
+
+def downgrade() -> None:
+    indexes = _measurement_indexes()
+    if indexes is None:
+        return
+
+    if "ix_measurements_user_id" not in indexes:
+        op.create_index("ix_measurements_user_id", "measurements", ["user_id"])
+    if "ix_measurements_user_id_measured_at" in indexes:
+        op.drop_index("ix_measurements_user_id_measured_at", table_name="measurements")
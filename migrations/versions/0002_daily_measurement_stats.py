@@ -0,0 +1,97 @@
+"""Daily measurement statistics rollup table
+
+Creates the per-user, per-MSK-day rollup table and backfills it from the
+existing measurements.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0002"
+down_revision: str | None = "0001"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+# Day of a naive UTC timestamp in Moscow time (fixed UTC+3), per dialect
+MSK_DAY = {
+    "sqlite": "date(measured_at, '+3 hours')",
+    "postgresql": "CAST(measured_at + INTERVAL '3 hours' AS DATE)",
+}
+
+# Frozen copy of the rollup as of this revision, so later model changes cannot alter it
+BACKFILL = """
+INSERT INTO daily_measurement_stats (
+    user_id, day, count,
+    systolic_sum, systolic_min, systolic_max,
+    diastolic_sum, diastolic_min, diastolic_max,
+    first_measured_at, last_measured_at, last_systolic, last_diastolic
+)
+SELECT
+    user_id, {day}, COUNT(*),
+    SUM(systolic), MIN(systolic), MAX(systolic),
+    SUM(diastolic), MIN(diastolic), MAX(diastolic),
+    MIN(measured_at), MAX(measured_at), 0, 0
+FROM measurements
+GROUP BY user_id, {day}
+"""
+
+# The last reading of each day; the most recently inserted one wins a tie
+BACKFILL_LAST_READING = """
+UPDATE daily_measurement_stats SET
+    last_systolic = (
+        SELECT m.systolic FROM measurements m
+        WHERE m.user_id = daily_measurement_stats.user_id
+          AND m.measured_at = daily_measurement_stats.last_measured_at
+        ORDER BY m.id DESC LIMIT 1
+    ),
+    last_diastolic = (
+        SELECT m.diastolic FROM measurements m
+        WHERE m.user_id = daily_measurement_stats.user_id
+          AND m.measured_at = daily_measurement_stats.last_measured_at
+        ORDER BY m.id DESC LIMIT 1
+    )
+"""
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    tables = sa.inspect(bind).get_table_names()
+
+    if "daily_measurement_stats" not in tables:
+        op.create_table(
+            "daily_measurement_stats",
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("day", sa.Date(), nullable=False),
+            sa.Column("count", sa.Integer(), nullable=False),
+            sa.Column("systolic_sum", sa.Integer(), nullable=False),
+            sa.Column("systolic_min", sa.Integer(), nullable=False),
+            sa.Column("systolic_max", sa.Integer(), nullable=False),
+            sa.Column("diastolic_sum", sa.Integer(), nullable=False),
+            sa.Column("diastolic_min", sa.Integer(), nullable=False),
+            sa.Column("diastolic_max", sa.Integer(), nullable=False),
+            sa.Column("first_measured_at", sa.DateTime(), nullable=False),
+            sa.Column("last_measured_at", sa.DateTime(), nullable=False),
+            sa.Column("last_systolic", sa.Integer(), nullable=False),
+            sa.Column("last_diastolic", sa.Integer(), nullable=False),
+            sa.PrimaryKeyConstraint("user_id", "day"),
+        )
+
+    if "measurements" not in tables:
+        return
+
+    has_stats = bind.execute(sa.text("SELECT 1 FROM daily_measurement_stats LIMIT 1")).first()
+    if not has_stats:
+        day = MSK_DAY.get(bind.dialect.name, MSK_DAY["postgresql"])
+        op.execute(BACKFILL.format(day=day))
+        op.execute(BACKFILL_LAST_READING)
+
+
+def downgrade() -> None:
+    op.drop_table("daily_measurement_stats")
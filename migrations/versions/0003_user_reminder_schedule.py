@@ -0,0 +1,54 @@
+"""Per-user reminder time zone and times
+
+Adds nullable users.timezone and users.reminder_times; NULL keeps the
+global reminder schedule from the settings.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0003"
+down_revision: str | None = "0002"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+COLUMNS = {
+    "timezone": sa.String(64),
+    "reminder_times": sa.String(255),
+}
+
+
+def _user_columns() -> set[str] | None:
+    inspector = sa.inspect(op.get_bind())
+    if "users" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("users")}
+
+
+def upgrade() -> None:
+    columns = _user_columns()
+    if columns is None:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        for name, type_ in COLUMNS.items():
+            if name not in columns:
+                batch_op.add_column(sa.Column(name, type_, nullable=True))
+
+
+def downgrade() -> None:
+    columns = _user_columns()
+    if columns is None:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        for name in COLUMNS:
+            if name in columns:
+                batch_op.drop_column(name)
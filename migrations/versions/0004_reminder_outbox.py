@@ -0,0 +1,69 @@
+"""Reminder delivery outbox and user reachability flag
+
+Creates the reminder_deliveries table the scheduler drains, and adds
+users.is_active, cleared for chats Telegram reports as unreachable.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0004"
+down_revision: str | None = "0003"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "users" not in tables:
+        return
+
+    if "is_active" not in {column["name"] for column in inspector.get_columns("users")}:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.add_column(
+                sa.Column("is_active", sa.Boolean(), server_default=sa.true(), nullable=False)
+            )
+
+    if "reminder_deliveries" not in tables:
+        op.create_table(
+            "reminder_deliveries",
+            sa.Column("id", sa.Integer(), primary_key=True, autoincrement=True),
+            sa.Column("slot_at", sa.DateTime(), nullable=False),
+            sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id"), nullable=False),
+            sa.Column("status", sa.String(16), nullable=False),
+            sa.Column("attempts", sa.Integer(), nullable=False),
+            sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+            sa.Column("last_error", sa.String(255), nullable=True),
+            sa.Column("sent_at", sa.DateTime(), nullable=True),
+            sa.UniqueConstraint(
+                "slot_at", "user_id", name="uq_reminder_deliveries_slot_at_user_id"
+            ),
+        )
+        op.create_index(
+            "ix_reminder_deliveries_status_next_attempt_at",
+            "reminder_deliveries",
+            ["status", "next_attempt_at"],
+        )
+
+
+def downgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+    tables = inspector.get_table_names()
+
+    if "reminder_deliveries" in tables:
+        op.drop_table("reminder_deliveries")
+
+    if "users" in tables and "is_active" in {
+        column["name"] for column in inspector.get_columns("users")
+    }:
+        with op.batch_alter_table("users") as batch_op:
+            batch_op.drop_column("is_active")
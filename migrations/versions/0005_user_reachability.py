@@ -0,0 +1,52 @@
+"""User reachability tracking
+
+Adds users.consecutive_failures and users.last_failure_reason next to
+users.is_active, so repeatedly failing chats can be left out of reminders.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0005"
+down_revision: str | None = "0004"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _user_columns() -> set[str] | None:
+    inspector = sa.inspect(op.get_bind())
+    if "users" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("users")}
+
+
+def upgrade() -> None:
+    columns = _user_columns()
+    if columns is None:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        if "consecutive_failures" not in columns:
+            batch_op.add_column(
+                sa.Column("consecutive_failures", sa.Integer(), server_default="0", nullable=False)
+            )
+        if "last_failure_reason" not in columns:
+            batch_op.add_column(sa.Column("last_failure_reason", sa.String(255), nullable=True))
+
+
+def downgrade() -> None:
+    columns = _user_columns()
+    if columns is None:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        for name in ("last_failure_reason", "consecutive_failures"):
+            if name in columns:
+                batch_op.drop_column(name)
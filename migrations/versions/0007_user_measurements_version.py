@@ -0,0 +1,47 @@
+"""User measurements version
+
+Adds users.measurements_version, bumped with every new measurement so that
+cached reports can be checked for staleness with one primary-key lookup.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-17 00:00:00
+
+"""
+from collections.abc import Sequence
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "0007"
+down_revision: str | None = "0006"
+branch_labels: str | Sequence[str] | None = None
+depends_on: str | Sequence[str] | None = None
+
+
+def _user_columns() -> set[str] | None:
+    inspector = sa.inspect(op.get_bind())
+    if "users" not in inspector.get_table_names():
+        return None
+    return {column["name"] for column in inspector.get_columns("users")}
+
+
+def upgrade() -> None:
+    columns = _user_columns()
+    if columns is None or "measurements_version" in columns:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.add_column(
+            sa.Column("measurements_version", sa.Integer(), server_default="0", nullable=False)
+        )
+
+
+def downgrade() -> None:
+    columns = _user_columns()
+    if columns is None or "measurements_version" not in columns:
+        return
+
+    with op.batch_alter_table("users") as batch_op:
+        batch_op.drop_column("measurements_version")
@@ -1,39 +1,170 @@
+import asyncio
+import logging
 import re
-from datetime import date, datetime
+from datetime import datetime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from aiogram import F, Router
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.types import Message
 
 from ..config.settings import settings
-from ..database.database import get_database
-from ..database.repositories import get_repositories
-from ..services.report_generator import ReportGenerator
+from ..database.database import EngineOptions, get_async_session
+from ..database.repositories import AsyncUserRepository, get_async_repositories
+from ..services.analytics import ReadingArrays, UserStats, compute_stats
+from ..services.cache import LRUCache
+from ..services.chart import ChartRenderer
+from ..services.exporter import BulkExporter, ExportInProgressError
+from ..services.measurement_writer import MeasurementWriter
+from ..services.report_cache import ReportCache
+from ..services.report_generator import REPORT_FORMATS
+from ..services.report_worker import ReportExecutor, ReportQueueFullError
+from ..services.scheduler import (
+    MAX_REMINDER_TIMES,
+    ReminderScheduler,
+    format_reminder_times,
+    parse_reminder_times,
+)
+from .middlewares import MetricsMiddleware, ReactivationMiddleware
 
 router = Router()
 
+logger = logging.getLogger(__name__)
 
-def get_reminder_times_text() -> str:
-    """Get formatted reminder times text."""
-    times = ", ".join(settings.reminder_times)
-    return f"в {times} ежедневно (МСК)"
+# Largest document a bot may send
+TELEGRAM_DOCUMENT_LIMIT = 50 * 1024 * 1024
+
+# Telegram IDs of senders known to receive reminders; the reminder outbox evicts the
+# ones whose delivery fails
+active_user_cache: LRUCache[int, bool] = LRUCache(max_size=settings.user_cache_size, ttl=300)
+
+# Users who stopped receiving reminders (blocked bot, repeated failures) get them again
+# once they write to the bot
+router.message.outer_middleware(ReactivationMiddleware(active_user_cache))
+# Inner middleware: runs once a handler matched, so it knows which one to time
+router.message.middleware(MetricsMiddleware())
+
+# telegram_id -> user_id, so active users skip the users table on every message
+user_id_cache: LRUCache[int, int] = LRUCache(
+    max_size=settings.user_cache_size, ttl=settings.user_cache_ttl
+)
+
+# Reports are served again from this cache until the user records a new measurement
+report_cache = (
+    ReportCache(
+        max_bytes=int(settings.report_cache_size_mb * 1024 * 1024),
+        directory=settings.report_cache_dir,
+    )
+    if settings.report_cache_size_mb > 0
+    else None
+)
+
+# Report generation runs in a worker pool so large exports don't block other chats
+report_executor = ReportExecutor(
+    settings.database_url,
+    mode=settings.report_executor,
+    workers=settings.report_workers,
+    queue_size=settings.report_queue_size,
+    engine_options=EngineOptions.from_settings(settings),
+    cache=report_cache,
+)
+
+# Charts render in their own pool and are cached until the user's next measurement
+chart_renderer = ChartRenderer(
+    settings.database_url,
+    mode=settings.report_executor,
+    workers=settings.chart_workers,
+    cache_size=settings.chart_cache_size,
+    engine_options=EngineOptions.from_settings(settings),
+)
+
+# All-users exports run in the background, outside the report pool
+bulk_exporter = BulkExporter(
+    settings.database_url, engine_options=EngineOptions.from_settings(settings)
+)
+# Running export deliveries, kept referenced until they finish
+export_tasks: set[asyncio.Task] = set()
+
+# Optional write-behind buffer batching measurement inserts into shared commits
+measurement_writer = (
+    MeasurementWriter(
+        max_delay=settings.measurement_batch_delay, max_batch=settings.measurement_batch_size
+    )
+    if settings.measurement_write_behind
+    else None
+)
+
+
+async def send_report(
+    message: Message, user_id: int, report_format: str, filename: str, title: str, empty_text: str
+) -> None:
+    """Generate a user's report in the worker pool and send it, keeping the requester informed."""
+    from aiogram.types import FSInputFile
+
+    async def notify_waiting() -> None:
+        await message.answer("⏳ Отчет готовится, я отправлю его, как только он будет готов.")
+
+    try:
+        async with report_executor.report(user_id, report_format, notify_waiting) as report:
+            if not report.measurement_count:
+                await message.answer(empty_text)
+                return
+
+            if report.size > TELEGRAM_DOCUMENT_LIMIT:
+                await message.answer(
+                    "❌ Отчет слишком большой для Telegram. Попробуйте формат csv.gz или parquet."
+                )
+                return
+
+            await message.answer_document(
+                document=FSInputFile(report.path, filename),
+                caption=f"{title} ({report.measurement_count} измерений)",
+            )
+    except ReportQueueFullError:
+        await message.answer("⏳ Сейчас готовится слишком много отчетов. Попробуйте позже.")
+
+
+def parse_report_format(args: str | None) -> str | None:
+    """Report format named in the command arguments (CSV by default), or None if unknown."""
+    report_format = (args or "csv").strip().lower()
+    return report_format if report_format in REPORT_FORMATS else None
+
+
+async def get_user_id(user_repo: AsyncUserRepository, telegram_id: int) -> int | None:
+    """Resolve a Telegram ID to the internal user ID, consulting the cache first."""
+    user_id = user_id_cache.get(telegram_id)
+    if user_id is None:
+        user_id = await user_repo.get_id_by_telegram_id(telegram_id)
+        if user_id is not None:
+            user_id_cache.set(telegram_id, user_id)
+    return user_id
+
+
+def get_reminder_times_text(timezone: str | None = None, reminder_times: str | None = None) -> str:
+    """Get formatted reminder times text, for the defaults or a personal schedule."""
+    times = (
+        format_reminder_times(parse_reminder_times(reminder_times))
+        if reminder_times
+        else ", ".join(settings.reminder_times)
+    )
+    timezone = timezone or settings.reminder_timezone
+    return f"в {times} ежедневно ({'МСК' if timezone == 'Europe/Moscow' else timezone})"
 
 
 @router.message(CommandStart())
 async def start_command(message: Message) -> None:
     """Handle /start command and register user."""
-    db = get_database()
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
 
-    with db.get_session() as session:
-        user_repo, _ = get_repositories(session)
-
-        user = user_repo.create_user(
+        user = await user_repo.create_user(
             telegram_id=message.from_user.id,
             username=message.from_user.username,
             first_name=message.from_user.first_name,
         )
 
         if user:
+            user_id_cache.set(user.telegram_id, user.id)
             await message.answer(
                 "Добро пожаловать в Трекер Артериального Давления! 🩺\n\n"
                 "Я помогу вам отслеживать показания артериального давления.\n\n"
@@ -56,7 +187,13 @@ async def help_command(message: Message) -> None:
         "• Отправьте показания: 120/80\n"
         "• Формат: систолическое/диастолическое\n\n"
         "📋 Отчеты:\n"
-        "• /report - Скачать CSV со всеми измерениями\n\n"
+        "• /report - Скачать CSV со всеми измерениями\n"
+        "• /report csv.gz или /report parquet - Сжатый или табличный формат\n"
+        "• /chart - График давления\n"
+        "• /stats - Статистика: средние, утро и вечер, тренд\n\n"
+        "⏰ Напоминания:\n"
+        "• /reminders 08:00,21:00 - Свое время напоминаний\n"
+        "• /timezone Europe/Moscow - Свой часовой пояс\n\n"
         "ℹ️ Другое:\n"
         "• /help - Показать это сообщение\n\n"
         f"💡 Я буду напоминать измерять давление {get_reminder_times_text()}."
@@ -64,89 +201,286 @@ async def help_command(message: Message) -> None:
 
 
 @router.message(Command("report"))
-async def report_command(message: Message) -> None:
-    """Handle /report command - generate CSV report."""
-    db = get_database()
+async def report_command(message: Message, command: CommandObject) -> None:
+    """Handle /report [csv|csv.gz|parquet] command - generate a report file."""
+    report_format = parse_report_format(command.args)
+    if report_format is None:
+        await message.answer(f"❌ Неизвестный формат. Доступны: {', '.join(REPORT_FORMATS)}")
+        return
 
-    with db.get_session() as session:
-        user_repo, measurement_repo = get_repositories(session)
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
 
-        user = user_repo.get_by_telegram_id(message.from_user.id)
-        if not user:
+        user_id = await get_user_id(user_repo, message.from_user.id)
+        if user_id is None:
             await message.answer("Пожалуйста, используйте /start для регистрации.")
             return
 
-        measurements = measurement_repo.get_user_measurements(user.id)
-
-        if not measurements:
-            await message.answer("Измерения не найдены. Сначала запишите несколько показаний!")
-            return
-
-        report_generator = ReportGenerator()
-        csv_data = report_generator.generate_csv_report(measurements)
-
-        # Create file name with current date
-        filename = f"bp_report_{datetime.now().strftime('%Y%m%d')}.csv"
-
-        # Send CSV as document
-        from aiogram.types import BufferedInputFile
-
-        file = BufferedInputFile(csv_data.encode(), filename)
-
-        await message.answer_document(
-            document=file,
-            caption=f"📊 Ваш отчет по артериальному давлению ({len(measurements)} измерений)",
-        )
+    await send_report(
+        message,
+        user_id,
+        report_format,
+        filename=f"bp_report_{datetime.now().strftime('%Y%m%d')}.{report_format}",
+        title="📊 Ваш отчет по артериальному давлению",
+        empty_text="Измерения не найдены. Сначала запишите несколько показаний!",
+    )
 
 
-@router.message(F.text.regexp(r"^/report_(\d+)$"))
+@router.message(F.text.regexp(r"^/report_(\d+)(?:\s+(\S+))?$"))
 async def report_user_command(message: Message) -> None:
-    """Handle /report_<user_id> command - generate CSV report for another user."""
+    """Handle /report_<user_id> [format] command - generate a report for another user."""
     # Check if requester is authorized
     if message.from_user.id not in settings.authorized_requesters:
         await message.answer("❌ У вас нет прав для запроса отчетов других пользователей.")
         return
 
-    # Extract target user ID from command
-    match = re.match(r"^/report_(\d+)$", message.text)
+    # Extract target user ID and format from command
+    match = re.match(r"^/report_(\d+)(?:\s+(\S+))?$", message.text)
     if not match:
         await message.answer("❌ Неверный формат команды. Используйте /report_<telegram_id>")
         return
 
     target_telegram_id = int(match.group(1))
+    report_format = parse_report_format(match.group(2))
+    if report_format is None:
+        await message.answer(f"❌ Неизвестный формат. Доступны: {', '.join(REPORT_FORMATS)}")
+        return
 
-    db = get_database()
-
-    with db.get_session() as session:
-        user_repo, measurement_repo = get_repositories(session)
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
 
         # Find target user by telegram ID
-        target_user = user_repo.get_by_telegram_id(target_telegram_id)
-        if not target_user:
+        target_user_id = await get_user_id(user_repo, target_telegram_id)
+        if target_user_id is None:
             await message.answer(f"❌ Пользователь с ID {target_telegram_id} не найден.")
             return
 
-        measurements = measurement_repo.get_user_measurements(target_user.id)
+    await send_report(
+        message,
+        target_user_id,
+        report_format,
+        filename=(
+            f"bp_report_{target_telegram_id}_{datetime.now().strftime('%Y%m%d')}.{report_format}"
+        ),
+        title=f"📊 Отчет пользователя {target_telegram_id}",
+        empty_text=f"❌ У пользователя {target_telegram_id} нет измерений.",
+    )
+
+
+@router.message(Command("export_all"))
+async def export_all_command(message: Message, command: CommandObject) -> None:
+    """Handle /export_all [format] command - export every user's measurements in one file."""
+    if message.from_user.id not in settings.authorized_requesters:
+        await message.answer("❌ У вас нет прав для выгрузки всех измерений.")
+        return
+
+    report_format = parse_report_format(command.args or "csv.gz")
+    if report_format is None:
+        await message.answer(f"❌ Неизвестный формат. Доступны: {', '.join(REPORT_FORMATS)}")
+        return
+
+    if bulk_exporter.is_running:
+        await message.answer("⏳ Выгрузка уже идет. Дождитесь ее окончания.")
+        return
+
+    # The export can take minutes, so it is delivered by a task of its own
+    task = asyncio.create_task(deliver_export(message, report_format))
+    export_tasks.add(task)
+    task.add_done_callback(export_tasks.discard)
+    await message.answer(
+        "⏳ Выгрузка всех измерений запущена, я пришлю файл, когда она будет готова."
+    )
+
+
+async def deliver_export(message: Message, report_format: str) -> None:
+    """Run an all-users export and send the file to the requester."""
+    from aiogram.types import FSInputFile
+
+    try:
+        async with bulk_exporter.export(report_format) as export:
+            if not export.measurement_count:
+                await message.answer("❌ Измерений пока нет.")
+                return
+
+            if export.size > TELEGRAM_DOCUMENT_LIMIT:
+                await message.answer(
+                    "❌ Выгрузка слишком большая для Telegram. Попробуйте формат csv.gz или parquet."
+                )
+                return
+
+            filename = f"bp_export_{datetime.now().strftime('%Y%m%d')}.{report_format}"
+            await message.answer_document(
+                document=FSInputFile(export.path, filename),
+                caption=(
+                    f"📦 Все измерения: {export.measurement_count} измерений, "
+                    f"{export.user_count} пользователей"
+                ),
+            )
+    except ExportInProgressError:
+        await message.answer("⏳ Выгрузка уже идет. Дождитесь ее окончания.")
+    except Exception as e:
+        logger.error(f"Error exporting all measurements: {e}")
+        await message.answer("❌ Не удалось выгрузить измерения. Попробуйте позже.")
+
+
+@router.message(Command("chart"))
+async def chart_command(message: Message) -> None:
+    """Handle /chart command - send a chart of the user's readings."""
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
+        user = await user_repo.get_by_telegram_id(message.from_user.id)
+
+    if user is None:
+        await message.answer("Пожалуйста, используйте /start для регистрации.")
+        return
 
-        if not measurements:
-            await message.answer(f"❌ У пользователя {target_telegram_id} нет измерений.")
+    png = await chart_renderer.render(user.id, user.timezone or settings.reminder_timezone)
+    if png is None:
+        await message.answer("Измерения не найдены. Сначала запишите несколько показаний!")
+        return
+
+    from aiogram.types import BufferedInputFile
+
+    await message.answer_photo(
+        BufferedInputFile(png, f"bp_chart_{datetime.now().strftime('%Y%m%d')}.png"),
+        caption="📈 Ваше давление",
+    )
+
+
+def _pair(values) -> str:
+    return f"{values[0]:.0f}/{values[1]:.0f}"
+
+
+def format_stats(stats: UserStats, tz: ZoneInfo) -> str:
+    """Render a user's statistics as the /stats reply."""
+    first_at = stats.first_at.astimezone(tz).strftime("%d.%m.%Y")
+    last_at = stats.last_at.astimezone(tz).strftime("%d.%m.%Y")
+    lines = [
+        f"📈 Статистика: {stats.count} измерений ({first_at} – {last_at})",
+        "",
+        f"Среднее: {_pair(stats.mean)} mmHg",
+        f"Минимум: {_pair(stats.minimum)}, максимум: {_pair(stats.maximum)}",
+        f"Разброс (SD): ±{stats.sd[0]:.1f}/±{stats.sd[1]:.1f} "
+        f"(CV {stats.cv[0]:.1f}%/{stats.cv[1]:.1f}%)",
+        "",
+    ]
+    for label, mean, count in (
+        ("За 7 дней", stats.last_7, stats.last_7_count),
+        ("За 30 дней", stats.last_30, stats.last_30_count),
+        ("Утром", stats.morning, stats.morning_count),
+        ("Вечером", stats.evening, stats.evening_count),
+    ):
+        lines.append(f"{label}: {_pair(mean)} ({count})" if count else f"{label}: нет данных")
+
+    if stats.trend is not None:
+        lines.append(f"Тренд: {stats.trend[0]:+.1f}/{stats.trend[1]:+.1f} mmHg за 30 дней")
+
+    lines += ["", "Категории:"]
+    lines += [
+        f"• {name}: {count} ({count / stats.count:.0%})"
+        for name, count in zip(BP_CATEGORIES, stats.categories, strict=True)
+        if count
+    ]
+    return "\n".join(lines)
+
+
+@router.message(Command("stats"))
+async def stats_command(message: Message) -> None:
+    """Handle /stats command - summarize the user's readings."""
+    async with get_async_session() as session:
+        user_repo, measurement_repo = get_async_repositories(session)
+
+        user = await user_repo.get_by_telegram_id(message.from_user.id)
+        if user is None:
+            await message.answer("Пожалуйста, используйте /start для регистрации.")
             return
 
-        report_generator = ReportGenerator()
-        csv_data = report_generator.generate_csv_report(measurements)
+        series = await measurement_repo.get_user_reading_series(user.id)
 
-        # Create file name with user ID and current date
-        filename = f"bp_report_{target_telegram_id}_{datetime.now().strftime('%Y%m%d')}.csv"
+    if not series:
+        await message.answer("Измерения не найдены. Сначала запишите несколько показаний!")
+        return
 
-        # Send CSV as document
-        from aiogram.types import BufferedInputFile
+    tz = ZoneInfo(user.timezone or settings.reminder_timezone)
+    # Milliseconds even for long histories, but kept off the event loop all the same
+    stats = await asyncio.to_thread(lambda: compute_stats(ReadingArrays.from_series(series), tz))
+    await message.answer(format_stats(stats, tz))
 
-        file = BufferedInputFile(csv_data.encode(), filename)
 
-        await message.answer_document(
-            document=file,
-            caption=f"📊 Отчет пользователя {target_telegram_id} ({len(measurements)} измерений)",
+@router.message(Command("timezone"))
+async def timezone_command(
+    message: Message, command: CommandObject, scheduler: ReminderScheduler | None = None
+) -> None:
+    """Handle /timezone <IANA name> - set the time zone of the user's reminders."""
+    timezone = (command.args or "").strip()
+    if not timezone:
+        await message.answer(
+            "Укажите часовой пояс, например: /timezone Europe/Moscow\n"
+            "Чтобы вернуть часовой пояс по умолчанию: /timezone default"
+        )
+        return
+
+    if timezone.lower() == "default":
+        timezone = None
+    else:
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            await message.answer("❌ Неизвестный часовой пояс. Пример: /timezone Europe/Moscow")
+            return
+
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
+        user = await user_repo.set_timezone(message.from_user.id, timezone)
+
+    if user is None:
+        await message.answer("Пожалуйста, используйте /start для регистрации.")
+        return
+
+    if scheduler is not None:
+        scheduler.update_user(user.telegram_id, user.timezone, user.reminder_times)
+    schedule_text = get_reminder_times_text(user.timezone, user.reminder_times)
+    await message.answer(f"🕒 Напоминания будут приходить {schedule_text}.")
+
+
+@router.message(Command("reminders"))
+async def reminders_command(
+    message: Message, command: CommandObject, scheduler: ReminderScheduler | None = None
+) -> None:
+    """Handle /reminders HH:MM,... - set the user's reminder times."""
+    reminder_times = (command.args or "").strip()
+    if not reminder_times:
+        await message.answer(
+            "Укажите время напоминаний, например: /reminders 08:00,21:00\n"
+            "Чтобы вернуть время по умолчанию: /reminders default"
         )
+        return
+
+    if reminder_times.lower() == "default":
+        reminder_times = None
+    else:
+        try:
+            times = parse_reminder_times(reminder_times)
+        except ValueError:
+            await message.answer("❌ Неверный формат времени. Пример: /reminders 08:00,21:00")
+            return
+        if len(times) > MAX_REMINDER_TIMES:
+            await message.answer(f"❌ Можно указать не больше {MAX_REMINDER_TIMES} напоминаний.")
+            return
+        reminder_times = ",".join(t.strftime("%H:%M") for t in times)
+
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
+        user = await user_repo.set_reminder_times(message.from_user.id, reminder_times)
+
+    if user is None:
+        await message.answer("Пожалуйста, используйте /start для регистрации.")
+        return
+
+    if scheduler is not None:
+        scheduler.update_user(user.telegram_id, user.timezone, user.reminder_times)
+    schedule_text = get_reminder_times_text(user.timezone, user.reminder_times)
+    await message.answer(f"⏰ Напоминания будут приходить {schedule_text}.")
 
 
 def parse_blood_pressure(text: str) -> tuple[int, int] | None:
@@ -169,8 +503,6 @@ def parse_blood_pressure(text: str) -> tuple[int, int] | None:
 @router.message(F.text)
 async def handle_measurement(message: Message) -> None:
     """Handle blood pressure measurement input."""
-    db = get_database()
-
     # Try to parse blood pressure reading
     reading = parse_blood_pressure(message.text)
 
@@ -185,33 +517,44 @@ async def handle_measurement(message: Message) -> None:
 
     systolic, diastolic = reading
 
-    with db.get_session() as session:
-        user_repo, measurement_repo = get_repositories(session)
+    async with get_async_session() as session:
+        user_repo, _ = get_async_repositories(session)
+        user_id = await get_user_id(user_repo, message.from_user.id)
 
-        user = user_repo.get_by_telegram_id(message.from_user.id)
-        if not user:
-            await message.answer("Пожалуйста, используйте /start для регистрации.")
-            return
+    if user_id is None:
+        await message.answer("Пожалуйста, используйте /start для регистрации.")
+        return
 
-        # Save measurement
-        measurement = measurement_repo.create_measurement(
-            user_id=user.id, systolic=systolic, diastolic=diastolic
-        )
+    # Save measurement; the write-behind batch takes its own connection, so hold none meanwhile
+    if measurement_writer is not None:
+        measurement = await measurement_writer.write(user_id, systolic, diastolic)
+    else:
+        async with get_async_session() as session:
+            _, measurement_repo = get_async_repositories(session)
+            measurement = await measurement_repo.create_measurement(
+                user_id=user_id, systolic=systolic, diastolic=diastolic
+            )
 
-        # Check for daily measurement motivation
-        today = date.today()
-        daily_count = measurement_repo.get_daily_measurement_count(user.id, today)
+    await message.answer(
+        f"✅ Записано: {measurement.formatted_reading} mmHg"  # \n"
+        # f"📅 Время: {measurement.measured_at.strftime('%Y-%m-%d %H:%M')}\n"
+        # f"📊 Категория: {category}\n\n"
+        # f"Используйте /report для загрузки данных."
+    )
+
+    # Send motivational message if user measured 3 times today
+    if measurement.daily_count == 3:
+        await message.answer("🎉 Спасибо, что измерили давление 3 раза за день!")
 
-        await message.answer(
-            f"✅ Записано: {measurement.formatted_reading} mmHg"  # \n"
-            # f"📅 Время: {measurement.measured_at.strftime('%Y-%m-%d %H:%M')}\n"
-            # f"📊 Категория: {category}\n\n"
-            # f"Используйте /report для загрузки данных."
-        )
 
-        # Send motivational message if user measured 3 times today
-        if daily_count == 3:
-            await message.answer("🎉 Спасибо, что измерили давление 3 раза за день!")
+# Category names in the order of analytics.categorize
+BP_CATEGORIES = (
+    "Нормальное",
+    "Повышенное",
+    "Высокое АД 1-й степени",
+    "Высокое АД 2-й степени",
+    "Гипертонический криз",
+)
 
 
 def get_bp_category(systolic: int, diastolic: int) -> str:
@@ -0,0 +1,75 @@
+import logging
+import time
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+from aiogram import BaseMiddleware
+from aiogram.types import Message
+
+from ..database.database import get_async_session
+from ..database.repositories import get_async_repositories
+from ..services.cache import LRUCache
+from ..services.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+handler_seconds = registry.histogram(
+    "bp_handler_seconds", "Time spent in message handlers.", ["handler"]
+)
+handler_errors = registry.counter(
+    "bp_handler_errors_total", "Message handlers that raised an exception.", ["handler"]
+)
+
+
+class ReactivationMiddleware(BaseMiddleware):
+    """Marks a user reachable again as soon as they write to the bot.
+
+    Senders known to be active are cached, so an active user costs at most one
+    SELECT per cache TTL and only inactive users are written to. The reminder
+    outbox evicts users from ``active`` when their delivery fails, so a user
+    deactivated by this instance is reactivated by their next message.
+    """
+
+    def __init__(self, active: LRUCache[int, bool]):
+        self.active = active
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        sender = event.from_user
+        if sender is not None and self.active.get(sender.id) is None:
+            try:
+                async with get_async_session() as session:
+                    user_repo, _ = get_async_repositories(session)
+                    if await user_repo.is_active(sender.id) is False:
+                        if await user_repo.reactivate(sender.id):
+                            logger.info(f"User {sender.id} is reachable again")
+                self.active.set(sender.id, True)
+            except Exception as e:
+                logger.error(f"Failed to reactivate user {sender.id}: {e}")
+
+        return await handler(event, data)
+
+
+class MetricsMiddleware(BaseMiddleware):
+    """Times every message handler and counts the ones that fail."""
+
+    async def __call__(
+        self,
+        handler: Callable[[Message, dict[str, Any]], Awaitable[Any]],
+        event: Message,
+        data: dict[str, Any],
+    ) -> Any:
+        handler_object = data.get("handler")
+        name = handler_object.callback.__name__ if handler_object is not None else "unknown"
+        started = time.perf_counter()
+        try:
+            return await handler(event, data)
+        except Exception:
+            handler_errors.inc(handler=name)
+            raise
+        finally:
+            handler_seconds.observe(time.perf_counter() - started, handler=name)
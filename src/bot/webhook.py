@@ -0,0 +1,28 @@
+import logging
+
+from aiogram import Bot, Dispatcher
+from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+
+async def start_webhook_server(
+    bot: Bot,
+    dp: Dispatcher,
+    host: str,
+    port: int,
+    path: str,
+    secret: str | None = None,
+) -> web.AppRunner:
+    """Serve Telegram webhook updates with aiohttp; returns the runner for cleanup."""
+    app = web.Application()
+    SimpleRequestHandler(dispatcher=dp, bot=bot, secret_token=secret).register(app, path=path)
+    setup_application(app, dp, bot=bot)
+
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, host=host, port=port).start()
+
+    logger.info(f"Webhook server listening on {host}:{port}{path}")
+    return runner
@@ -1,5 +1,7 @@
 import os
+import socket
 from dataclasses import dataclass
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 from dotenv import load_dotenv
 
@@ -25,6 +27,76 @@ class Settings:
     # Application Settings
     debug: bool = False
 
+    # Time zone of REMINDER_TIMES for users without a personal schedule
+    reminder_timezone: str = "Europe/Moscow"
+
+    # SQLite performance profile (see PRAGMA docs)
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_cache_size_kb: int = 65_536
+    sqlite_mmap_size_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Connection pool (PostgreSQL and file-based SQLite)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+
+    # Reminder broadcast limits (Telegram allows ~30 messages per second)
+    broadcast_rate_limit: float = 30.0
+    broadcast_concurrency: int = 10
+    broadcast_max_retries: int = 3
+
+    # Reminder delivery outbox
+    outbox_batch_size: int = 100
+    outbox_lease: float = 300.0  # seconds a claimed batch stays hidden from other senders
+    outbox_retry_delay: float = 30.0  # first retry back-off, doubled per attempt
+    outbox_retention_days: int = 7
+    # Failed reminders in a row before a user is left out of broadcasts
+    inactive_after_failures: int = 3
+
+    # telegram_id -> user_id lookup cache
+    user_cache_size: int = 10_000
+    user_cache_ttl: float = 3600.0
+
+    # Report generation pool: "inline" (event loop), "thread" or "process"
+    report_executor: str = "thread"
+    report_workers: int = 2
+    report_queue_size: int = 8
+    # Generated report files kept on disk until the user's next measurement; 0 disables
+    # the cache. The directory defaults to the system temp directory
+    report_cache_size_mb: float = 256.0
+    report_cache_dir: str | None = None
+
+    # /chart rendering (in the REPORT_EXECUTOR mode) and its cache of PNGs per user
+    chart_workers: int = 1
+    chart_cache_size: int = 256
+
+    # Write-behind batching of measurement inserts
+    measurement_write_behind: bool = False
+    measurement_batch_delay: float = 0.005  # seconds a reading may wait for others
+    measurement_batch_size: int = 500
+
+    # Update delivery: "polling" or "webhook"
+    bot_mode: str = "polling"
+    webhook_url: str | None = None  # public base URL Telegram posts to
+    webhook_path: str = "/webhook"
+    webhook_host: str = "0.0.0.0"
+    webhook_port: int = 8000
+    webhook_secret: str | None = None
+
+    # Several instances: only the holder of a database lease dispatches reminders
+    reminder_leader_election: bool = False
+    reminder_lease_ttl: float = 30.0
+    reminder_schedule_refresh: float = 60.0  # seconds between reloads of personal schedules
+    instance_id: str = ""
+
+    # Prometheus /metrics endpoint; port 0 disables it
+    metrics_host: str = "127.0.0.1"
+    metrics_port: int = 0
+
     @classmethod
     def from_env(cls) -> "Settings":
         """Create settings from environment variables."""
@@ -36,9 +108,79 @@ class Settings:
 
         reminder_times_str = os.getenv("REMINDER_TIMES", "07:00,13:00,20:00")
         reminder_times = [time.strip() for time in reminder_times_str.split(",")]
+        reminder_timezone = os.getenv("REMINDER_TIMEZONE", "Europe/Moscow")
+        try:
+            ZoneInfo(reminder_timezone)
+        except (ZoneInfoNotFoundError, ValueError) as e:
+            raise ValueError("REMINDER_TIMEZONE must be an IANA time zone name") from e
 
         debug = os.getenv("DEBUG", "false").lower() == "true"
 
+        sqlite_journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "wal").lower()
+        if sqlite_journal_mode not in ("wal", "delete", "truncate", "persist", "memory", "off"):
+            raise ValueError(
+                "SQLITE_JOURNAL_MODE must be one of: wal, delete, truncate, persist, memory, off"
+            )
+        sqlite_synchronous = os.getenv("SQLITE_SYNCHRONOUS", "normal").lower()
+        if sqlite_synchronous not in ("off", "normal", "full", "extra"):
+            raise ValueError("SQLITE_SYNCHRONOUS must be one of: off, normal, full, extra")
+        sqlite_cache_size_kb = int(os.getenv("SQLITE_CACHE_SIZE_KB", "65536"))
+        sqlite_mmap_size_mb = int(os.getenv("SQLITE_MMAP_SIZE_MB", "256"))
+        sqlite_busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+
+        db_pool_size = int(os.getenv("DB_POOL_SIZE", "5"))
+        db_max_overflow = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+        db_pool_timeout = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+        db_pool_recycle = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+        db_pool_pre_ping = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+        broadcast_rate_limit = float(os.getenv("BROADCAST_RATE_LIMIT", "30"))
+        broadcast_concurrency = int(os.getenv("BROADCAST_CONCURRENCY", "10"))
+        broadcast_max_retries = int(os.getenv("BROADCAST_MAX_RETRIES", "3"))
+
+        outbox_batch_size = int(os.getenv("OUTBOX_BATCH_SIZE", "100"))
+        outbox_lease = float(os.getenv("OUTBOX_LEASE", "300"))
+        outbox_retry_delay = float(os.getenv("OUTBOX_RETRY_DELAY", "30"))
+        outbox_retention_days = int(os.getenv("OUTBOX_RETENTION_DAYS", "7"))
+        inactive_after_failures = int(os.getenv("INACTIVE_AFTER_FAILURES", "3"))
+
+        user_cache_size = int(os.getenv("USER_CACHE_SIZE", "10000"))
+        user_cache_ttl = float(os.getenv("USER_CACHE_TTL", "3600"))
+
+        report_executor = os.getenv("REPORT_EXECUTOR", "thread").lower()
+        if report_executor not in ("inline", "thread", "process"):
+            raise ValueError("REPORT_EXECUTOR must be one of: inline, thread, process")
+        report_workers = int(os.getenv("REPORT_WORKERS", "2"))
+        report_queue_size = int(os.getenv("REPORT_QUEUE_SIZE", "8"))
+        report_cache_size_mb = float(os.getenv("REPORT_CACHE_SIZE_MB", "256"))
+        report_cache_dir = os.getenv("REPORT_CACHE_DIR") or None
+
+        chart_workers = int(os.getenv("CHART_WORKERS", "1"))
+        chart_cache_size = int(os.getenv("CHART_CACHE_SIZE", "256"))
+
+        measurement_write_behind = os.getenv("MEASUREMENT_WRITE_BEHIND", "false").lower() == "true"
+        measurement_batch_delay = float(os.getenv("MEASUREMENT_BATCH_DELAY_MS", "5")) / 1000
+        measurement_batch_size = int(os.getenv("MEASUREMENT_BATCH_SIZE", "500"))
+
+        bot_mode = os.getenv("BOT_MODE", "polling").lower()
+        if bot_mode not in ("polling", "webhook"):
+            raise ValueError("BOT_MODE must be either polling or webhook")
+        webhook_url = os.getenv("WEBHOOK_URL") or None
+        if bot_mode == "webhook" and not webhook_url:
+            raise ValueError("WEBHOOK_URL environment variable is required in webhook mode")
+        webhook_path = os.getenv("WEBHOOK_PATH", "/webhook")
+        webhook_host = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+        webhook_port = int(os.getenv("WEBHOOK_PORT", "8000"))
+        webhook_secret = os.getenv("WEBHOOK_SECRET") or None
+
+        reminder_leader_election = os.getenv("REMINDER_LEADER_ELECTION", "false").lower() == "true"
+        reminder_lease_ttl = float(os.getenv("REMINDER_LEASE_TTL", "30"))
+        reminder_schedule_refresh = float(os.getenv("REMINDER_SCHEDULE_REFRESH", "60"))
+        instance_id = os.getenv("INSTANCE_ID") or f"{socket.gethostname()}:{os.getpid()}"
+
+        metrics_host = os.getenv("METRICS_HOST", "127.0.0.1")
+        metrics_port = int(os.getenv("METRICS_PORT", "0"))
+
         # Parse authorized requesters (comma-separated telegram IDs)
         authorized_requesters_str = os.getenv("AUTHORIZED_REQUESTERS", "")
         authorized_requesters = []
@@ -58,8 +200,51 @@ class Settings:
             telegram_token=telegram_token,
             database_url=database_url,
             reminder_times=reminder_times,
+            reminder_timezone=reminder_timezone,
             debug=debug,
             authorized_requesters=authorized_requesters,
+            sqlite_journal_mode=sqlite_journal_mode,
+            sqlite_synchronous=sqlite_synchronous,
+            sqlite_cache_size_kb=sqlite_cache_size_kb,
+            sqlite_mmap_size_mb=sqlite_mmap_size_mb,
+            sqlite_busy_timeout_ms=sqlite_busy_timeout_ms,
+            db_pool_size=db_pool_size,
+            db_max_overflow=db_max_overflow,
+            db_pool_timeout=db_pool_timeout,
+            db_pool_recycle=db_pool_recycle,
+            db_pool_pre_ping=db_pool_pre_ping,
+            broadcast_rate_limit=broadcast_rate_limit,
+            broadcast_concurrency=broadcast_concurrency,
+            broadcast_max_retries=broadcast_max_retries,
+            outbox_batch_size=outbox_batch_size,
+            outbox_lease=outbox_lease,
+            outbox_retry_delay=outbox_retry_delay,
+            outbox_retention_days=outbox_retention_days,
+            inactive_after_failures=inactive_after_failures,
+            user_cache_size=user_cache_size,
+            user_cache_ttl=user_cache_ttl,
+            report_executor=report_executor,
+            report_workers=report_workers,
+            report_queue_size=report_queue_size,
+            report_cache_size_mb=report_cache_size_mb,
+            report_cache_dir=report_cache_dir,
+            chart_workers=chart_workers,
+            chart_cache_size=chart_cache_size,
+            measurement_write_behind=measurement_write_behind,
+            measurement_batch_delay=measurement_batch_delay,
+            measurement_batch_size=measurement_batch_size,
+            bot_mode=bot_mode,
+            webhook_url=webhook_url,
+            webhook_path=webhook_path,
+            webhook_host=webhook_host,
+            webhook_port=webhook_port,
+            webhook_secret=webhook_secret,
+            reminder_leader_election=reminder_leader_election,
+            reminder_lease_ttl=reminder_lease_ttl,
+            reminder_schedule_refresh=reminder_schedule_refresh,
+            instance_id=instance_id,
+            metrics_host=metrics_host,
+            metrics_port=metrics_port,
         )
 
 
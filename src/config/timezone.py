@@ -0,0 +1,9 @@
+from datetime import UTC, date, datetime, timedelta, timezone
+
+# MSK timezone (UTC+3): reminders, daily counts and daily statistics follow the MSK day
+MSK_TZ = timezone(timedelta(hours=3))
+
+
+def msk_date(measured_at: datetime) -> date:
+    """Get the MSK calendar date of a naive UTC timestamp."""
+    return measured_at.replace(tzinfo=UTC).astimezone(MSK_TZ).date()
@@ -0,0 +1,38 @@
+"""Rebuild the daily measurement rollups from raw measurements.
+
+    python -m src.database.backfill [--user-id ID]
+"""
+
+import argparse
+import logging
+import os
+
+from dotenv import load_dotenv
+
+from .database import Database, to_sync_database_url
+from .repositories import DailyStatsRepository
+
+logger = logging.getLogger(__name__)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild daily measurement statistics.")
+    parser.add_argument("--user-id", type=int, help="Only rebuild this internal user ID")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    load_dotenv()
+
+    database_url = to_sync_database_url(os.getenv("DATABASE_URL", "sqlite:///blood_pressure.db"))
+    db = Database(database_url)
+    db.create_tables()
+
+    with db.get_session() as session:
+        written = DailyStatsRepository(session).rebuild(args.user_id, args.batch_size)
+
+    logger.info(f"Rebuilt {written} daily statistics rows")
+
+
+if __name__ == "__main__":
+    main()
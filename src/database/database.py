@@ -1,19 +1,127 @@
+import asyncio
 import os
-from collections.abc import Generator
-from contextlib import contextmanager
+from collections.abc import AsyncGenerator, Generator
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
 
-from sqlalchemy import create_engine
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import Engine, create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
 
+from ..services.metrics import instrument_engine
 from .models import Base
 
+if TYPE_CHECKING:
+    from ..config.settings import Settings
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "migrations")
+
+
+@dataclass
+class EngineOptions:
+    """Connection tuning: SQLite pragmas and connection pool sizing."""
+
+    # WAL lets readers run alongside the single writer; with synchronous=NORMAL a commit
+    # only fsyncs at checkpoints, which stays corruption-safe but may lose the last
+    # transactions on power loss
+    sqlite_journal_mode: str = "wal"
+    sqlite_synchronous: str = "normal"
+    sqlite_cache_size_kb: int = 65_536
+    sqlite_mmap_size_mb: int = 256
+    sqlite_busy_timeout_ms: int = 5000
+
+    # Connection pool (file-based SQLite and server databases)
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: float = 30.0
+    pool_recycle: int = 1800  # seconds; -1 keeps connections forever
+    pool_pre_ping: bool = True
+
+    @classmethod
+    def from_settings(cls, settings: "Settings") -> "EngineOptions":
+        """Take the engine options from application settings."""
+        return cls(
+            sqlite_journal_mode=settings.sqlite_journal_mode,
+            sqlite_synchronous=settings.sqlite_synchronous,
+            sqlite_cache_size_kb=settings.sqlite_cache_size_kb,
+            sqlite_mmap_size_mb=settings.sqlite_mmap_size_mb,
+            sqlite_busy_timeout_ms=settings.sqlite_busy_timeout_ms,
+            pool_size=settings.db_pool_size,
+            max_overflow=settings.db_max_overflow,
+            pool_timeout=settings.db_pool_timeout,
+            pool_recycle=settings.db_pool_recycle,
+            pool_pre_ping=settings.db_pool_pre_ping,
+        )
+
+    def sqlite_pragmas(self) -> list[str]:
+        """PRAGMA statements run on every new SQLite connection."""
+        return [
+            f"PRAGMA journal_mode={self.sqlite_journal_mode}",
+            f"PRAGMA synchronous={self.sqlite_synchronous}",
+            # Negative cache_size is in KiB rather than pages
+            f"PRAGMA cache_size=-{self.sqlite_cache_size_kb}",
+            f"PRAGMA mmap_size={self.sqlite_mmap_size_mb * 1024 * 1024}",
+            f"PRAGMA busy_timeout={self.sqlite_busy_timeout_ms}",
+            "PRAGMA temp_store=memory",
+        ]
+
+    def engine_kwargs(self, database_url: str, is_async: bool = False) -> dict:
+        """Keyword arguments for create_engine / create_async_engine."""
+        url = make_url(database_url)
+        if url.get_backend_name() == "sqlite":
+            if not url.database or url.database == ":memory:":
+                # In-memory databases live in a single connection; keep SQLAlchemy's default
+                return {}
+            # Connections are cheap to open but the pragmas and page cache are per connection,
+            # so keep a pool of them instead of reconnecting for every session
+            return {
+                "poolclass": AsyncAdaptedQueuePool if is_async else QueuePool,
+                "pool_size": self.pool_size,
+                "max_overflow": self.max_overflow,
+                "pool_timeout": self.pool_timeout,
+            }
+
+        return {
+            "pool_size": self.pool_size,
+            "max_overflow": self.max_overflow,
+            "pool_timeout": self.pool_timeout,
+            "pool_recycle": self.pool_recycle,
+            "pool_pre_ping": self.pool_pre_ping,
+        }
+
+    def configure(self, engine: Engine) -> None:
+        """Apply the SQLite pragmas to every connection the engine opens."""
+        if engine.dialect.name != "sqlite":
+            return
+
+        pragmas = self.sqlite_pragmas()
+
+        @event.listens_for(engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, _):
+            cursor = dbapi_connection.cursor()
+            try:
+                for pragma in pragmas:
+                    cursor.execute(pragma)
+            finally:
+                cursor.close()
+
 
 class Database:
     """Database connection and session management."""
 
-    def __init__(self, database_url: str):
-        self.engine = create_engine(database_url)
-        self.SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=self.engine)
+    def __init__(self, database_url: str, options: EngineOptions | None = None):
+        options = options or EngineOptions()
+        self.engine = create_engine(database_url, **options.engine_kwargs(database_url))
+        options.configure(self.engine)
+        instrument_engine(self.engine)
+        self.SessionLocal = sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine
+        )
 
     def create_tables(self) -> None:
         """Create all tables in the database."""
@@ -29,28 +137,110 @@ class Database:
             session.close()
 
 
+class AsyncDatabase:
+    """Asyncio-native database connection and session management."""
+
+    def __init__(self, database_url: str, options: EngineOptions | None = None):
+        options = options or EngineOptions()
+        self.engine = create_async_engine(
+            database_url, **options.engine_kwargs(database_url, is_async=True)
+        )
+        options.configure(self.engine.sync_engine)
+        instrument_engine(self.engine.sync_engine)
+        self.SessionLocal = async_sessionmaker(
+            autocommit=False, autoflush=False, expire_on_commit=False, bind=self.engine
+        )
+
+    async def create_tables(self) -> None:
+        """Create all tables in the database."""
+        async with self.engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+
+    @asynccontextmanager
+    async def get_session(self) -> AsyncGenerator[AsyncSession, None]:
+        """Get async database session with automatic cleanup."""
+        async with self.SessionLocal() as session:
+            yield session
+
+
 # Global database instance
-db_instance: Database = None
+db_instance: Database | AsyncDatabase = None
 
 
-def init_database(database_url: str) -> Database:
-    """Initialize global database instance."""
-    global db_instance
+def is_async_database_url(database_url: str) -> bool:
+    """Check whether the URL selects an asyncio driver (e.g. sqlite+aiosqlite, postgresql+asyncpg)."""
+    return make_url(database_url).get_dialect().is_async
 
-    # Ensure directory exists for SQLite databases (fallback support)
-    if database_url.startswith("sqlite:///"):
-        db_path = database_url.replace("sqlite:///", "", 1)
-        db_dir = os.path.dirname(db_path)
+
+def to_sync_database_url(database_url: str) -> str:
+    """Replace an asyncio driver in the URL with the dialect's default sync driver."""
+    url = make_url(database_url)
+    if url.get_dialect().is_async:
+        url = url.set(drivername=url.get_backend_name())
+    return url.render_as_string(hide_password=False)
+
+
+def _ensure_sqlite_directory(database_url: str) -> None:
+    """Ensure directory exists for SQLite databases (fallback support)."""
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite" and url.database:
+        db_dir = os.path.dirname(url.database)
         if db_dir:
             os.makedirs(db_dir, exist_ok=True)
 
-    db_instance = Database(database_url)
+
+def run_migrations(database_url: str) -> None:
+    """Upgrade an existing database schema to the latest Alembic revision."""
+    config = Config()
+    config.set_main_option("script_location", os.path.abspath(MIGRATIONS_DIR))
+    config.set_main_option("sqlalchemy.url", database_url.replace("%", "%%"))
+    command.upgrade(config, "head")
+
+
+def init_database(database_url: str, options: EngineOptions | None = None) -> Database:
+    """Initialize global database instance."""
+    global db_instance
+
+    _ensure_sqlite_directory(database_url)
+
+    db_instance = Database(database_url, options)
     db_instance.create_tables()
+    run_migrations(database_url)
     return db_instance
 
 
-def get_database() -> Database:
+async def init_async_database(
+    database_url: str, options: EngineOptions | None = None
+) -> AsyncDatabase:
+    """Initialize global database instance using an asyncio driver."""
+    global db_instance
+
+    _ensure_sqlite_directory(database_url)
+
+    db_instance = AsyncDatabase(database_url, options)
+    await db_instance.create_tables()
+    await asyncio.to_thread(run_migrations, database_url)
+    return db_instance
+
+
+def get_database() -> Database | AsyncDatabase:
     """Get the global database instance."""
     if db_instance is None:
         raise RuntimeError("Database not initialized. Call init_database() first.")
     return db_instance
+
+
+@asynccontextmanager
+async def get_async_session() -> AsyncGenerator[AsyncSession | Session, None]:
+    """Get a session for use in coroutines, whichever database mode is configured.
+
+    Pair with ``get_async_repositories``: in sync mode the repositories run their
+    queries in a worker thread so the event loop is never blocked.
+    """
+    db = get_database()
+    if isinstance(db, AsyncDatabase):
+        async with db.get_session() as session:
+            yield session
+    else:
+        with db.get_session() as session:
+            yield session
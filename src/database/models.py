@@ -1,6 +1,19 @@
 from datetime import datetime
+from typing import NamedTuple
 
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import (
+    BigInteger,
+    Boolean,
+    Column,
+    Date,
+    DateTime,
+    ForeignKey,
+    Index,
+    Integer,
+    String,
+    UniqueConstraint,
+    true,
+)
 from sqlalchemy.orm import DeclarativeBase, relationship
 
 
@@ -18,6 +31,16 @@ class User(Base):
     username = Column(String(255), nullable=True)
     first_name = Column(String(255), nullable=True)
     registered_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    # Personal reminder schedule; NULL falls back to REMINDER_TIMEZONE / REMINDER_TIMES
+    timezone = Column(String(64), nullable=True)
+    reminder_times = Column(String(255), nullable=True)  # comma-separated "HH:MM"
+    # Reachability: cleared when Telegram reports the chat as unreachable (bot blocked,
+    # account deleted) or after repeated failed reminders; set again when the user writes
+    is_active = Column(Boolean, default=True, server_default=true(), nullable=False)
+    consecutive_failures = Column(Integer, default=0, server_default="0", nullable=False)
+    last_failure_reason = Column(String(255), nullable=True)
+    # Bumped whenever measurements are added, so cached reports can tell they are stale
+    measurements_version = Column(Integer, default=0, server_default="0", nullable=False)
 
     measurements = relationship("Measurement", back_populates="user", cascade="all, delete-orphan")
 
@@ -26,16 +49,92 @@ class Measurement(Base):
     """Blood pressure measurement model."""
 
     __tablename__ = "measurements"
+    __table_args__ = (
+        # Serves per-user lookups ordered or ranged by time
+        Index("ix_measurements_user_id_measured_at", "user_id", "measured_at"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     systolic = Column(Integer, nullable=False)
     diastolic = Column(Integer, nullable=False)
     measured_at = Column(DateTime, default=datetime.utcnow, nullable=False)
 
     user = relationship("User", back_populates="measurements")
 
+    # Not a column: the user's readings on this one's MSK day, including it, as of when
+    # it was recorded
+    daily_count = None
+
     @property
     def formatted_reading(self) -> str:
         """Return formatted blood pressure reading."""
         return f"{self.systolic}/{self.diastolic}"
+
+
+class DailyMeasurementStats(Base):
+    """Per-user, per-MSK-day rollup of measurements, maintained on every insert."""
+
+    __tablename__ = "daily_measurement_stats"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False)
+    systolic_sum = Column(Integer, nullable=False)
+    systolic_min = Column(Integer, nullable=False)
+    systolic_max = Column(Integer, nullable=False)
+    diastolic_sum = Column(Integer, nullable=False)
+    diastolic_min = Column(Integer, nullable=False)
+    diastolic_max = Column(Integer, nullable=False)
+    first_measured_at = Column(DateTime, nullable=False)
+    last_measured_at = Column(DateTime, nullable=False)
+    # Reading taken at last_measured_at
+    last_systolic = Column(Integer, nullable=False)
+    last_diastolic = Column(Integer, nullable=False)
+
+
+class ReminderDelivery(Base):
+    """Outbox entry: one reminder for one user in one slot, kept until delivered."""
+
+    __tablename__ = "reminder_deliveries"
+    __table_args__ = (
+        UniqueConstraint("slot_at", "user_id", name="uq_reminder_deliveries_slot_at_user_id"),
+        # Serves claiming the next due pending deliveries
+        Index("ix_reminder_deliveries_status_next_attempt_at", "status", "next_attempt_at"),
+    )
+
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    slot_at = Column(DateTime, nullable=False)  # UTC time the reminder slot fell due
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    status = Column(String(16), nullable=False)  # pending, sent, failed or blocked
+    attempts = Column(Integer, nullable=False, default=0)
+    next_attempt_at = Column(DateTime, nullable=False)
+    last_error = Column(String(255), nullable=True)
+    sent_at = Column(DateTime, nullable=True)
+
+
+class ServiceLease(Base):
+    """Time-limited ownership of a singleton job, such as reminder dispatch, by one instance."""
+
+    __tablename__ = "service_leases"
+
+    name = Column(String(64), primary_key=True)
+    holder = Column(String(255), nullable=False)  # instance ID of the current owner
+    expires_at = Column(DateTime, nullable=False)  # UTC; anyone may take the lease after this
+
+
+class MeasurementRow(NamedTuple):
+    """Read-only measurement projection without ORM overhead, used for reports."""
+
+    systolic: int
+    diastolic: int
+    measured_at: datetime
+
+
+class ExportRow(NamedTuple):
+    """A reading with its owner's Telegram ID, used for all-users exports."""
+
+    telegram_id: int
+    systolic: int
+    diastolic: int
+    measured_at: datetime
@@ -1,10 +1,62 @@
-from datetime import date, datetime
+import asyncio
+from collections.abc import Callable, Iterable, Iterator
+from datetime import date, datetime, time, timedelta
+from typing import TypeVar
 
-from sqlalchemy import func
+from sqlalchemy import (
+    Float,
+    and_,
+    bindparam,
+    case,
+    cast,
+    delete,
+    extract,
+    func,
+    insert,
+    literal,
+    select,
+    update,
+)
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
-from .models import Measurement, User
+from ..config.timezone import msk_date
+from .models import (
+    DailyMeasurementStats,
+    ExportRow,
+    Measurement,
+    MeasurementRow,
+    ReminderDelivery,
+    ServiceLease,
+    User,
+)
+
+T = TypeVar("T")
+
+EPOCH = datetime(1970, 1, 1)
+
+
+def _dialect_insert(session: Session):
+    """Get the dialect-specific insert construct supporting ON CONFLICT, if any."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    return None
+
+
+def _epoch_seconds(session: Session, column):
+    """SQL expression for a naive UTC timestamp as float Unix seconds, if the dialect has one."""
+    dialect = session.get_bind().dialect.name
+    if dialect == "postgresql":
+        return cast(extract("epoch", column), Float)
+    if dialect == "sqlite":
+        # Julian day number of 1970-01-01 00:00 UTC
+        return (func.julianday(column) - 2440587.5) * 86400.0
+    return None
 
 
 class UserRepository:
@@ -16,22 +68,49 @@ class UserRepository:
     def create_user(
         self, telegram_id: int, username: str | None = None, first_name: str | None = None
     ) -> User | None:
-        """Create a new user or return existing one."""
-        existing_user = self.get_by_telegram_id(telegram_id)
-        if existing_user:
-            return existing_user
+        """Create a new user, or update the names of an existing one, and return it."""
+        dialect_insert = _dialect_insert(self.session)
+        if dialect_insert is None:
+            return self._create_or_update_user(telegram_id, username, first_name)
 
-        user = User(
+        # INSERT ... ON CONFLICT (telegram_id) DO UPDATE ... RETURNING: one round-trip whether
+        # or not the user is already registered
+        statement = dialect_insert(User).values(
             telegram_id=telegram_id,
             username=username,
             first_name=first_name,
             registered_at=datetime.utcnow(),
         )
+        statement = statement.on_conflict_do_update(
+            index_elements=[User.telegram_id],
+            set_={
+                "username": statement.excluded.username,
+                "first_name": statement.excluded.first_name,
+                # Coming back with /start makes a user reachable again
+                "is_active": True,
+                "consecutive_failures": 0,
+            },
+        ).returning(User)
 
-        try:
+        user = self.session.scalars(statement, execution_options={"populate_existing": True}).one()
+        self.session.commit()
+        return user
+
+    def _create_or_update_user(
+        self, telegram_id: int, username: str | None, first_name: str | None
+    ) -> User | None:
+        """Portable registration for dialects without ON CONFLICT."""
+        user = self.get_by_telegram_id(telegram_id)
+        if user is None:
+            user = User(telegram_id=telegram_id, registered_at=datetime.utcnow())
             self.session.add(user)
+        user.username = username
+        user.first_name = first_name
+        user.is_active = True
+        user.consecutive_failures = 0
+
+        try:
             self.session.commit()
-            self.session.refresh(user)
             return user
         except IntegrityError:
             self.session.rollback()
@@ -41,10 +120,57 @@ class UserRepository:
         """Get user by Telegram ID."""
         return self.session.query(User).filter(User.telegram_id == telegram_id).first()
 
+    def get_id_by_telegram_id(self, telegram_id: int) -> int | None:
+        """Get internal user ID by Telegram ID without loading the full user."""
+        return self.session.query(User.id).filter(User.telegram_id == telegram_id).scalar()
+
+    def is_active(self, telegram_id: int) -> bool | None:
+        """Whether the user receives reminders; None for an unknown user."""
+        return self.session.query(User.is_active).filter(User.telegram_id == telegram_id).scalar()
+
+    def get_measurements_version(self, user_id: int) -> int | None:
+        """Version stamp of a user's measurement history, bumped by every new reading."""
+        return self.session.query(User.measurements_version).filter(User.id == user_id).scalar()
+
     def get_all_users(self) -> list[User]:
         """Get all registered users."""
         return self.session.query(User).all()
 
+    def get_custom_reminder_schedules(self) -> list[tuple[int, str | None, str | None]]:
+        """Get (telegram_id, timezone, reminder_times) of users with a personal schedule."""
+        return (
+            self.session.query(User.telegram_id, User.timezone, User.reminder_times)
+            .filter((User.timezone.is_not(None)) | (User.reminder_times.is_not(None)))
+            .all()
+        )
+
+    def reactivate(self, telegram_id: int) -> bool:
+        """Mark an inactive user reachable again; returns whether they were inactive."""
+        reactivated = self.session.execute(
+            update(User)
+            .where(User.telegram_id == telegram_id, User.is_active.is_(False))
+            .values(is_active=True, consecutive_failures=0)
+        ).rowcount
+        self.session.commit()
+        return bool(reactivated)
+
+    def set_timezone(self, telegram_id: int, timezone: str | None) -> User | None:
+        """Set a user's reminder time zone (None for the default)."""
+        return self._update_user(telegram_id, timezone=timezone)
+
+    def set_reminder_times(self, telegram_id: int, reminder_times: str | None) -> User | None:
+        """Set a user's comma-separated reminder times (None for the defaults)."""
+        return self._update_user(telegram_id, reminder_times=reminder_times)
+
+    def _update_user(self, telegram_id: int, **values) -> User | None:
+        user = self.get_by_telegram_id(telegram_id)
+        if user is None:
+            return None
+        for name, value in values.items():
+            setattr(user, name, value)
+        self.session.commit()
+        return user
+
 
 class MeasurementRepository:
     """Repository for measurement data operations."""
@@ -63,11 +189,40 @@ class MeasurementRepository:
             measured_at=measured_at or datetime.utcnow(),
         )
 
+        # All columns are set client-side, so no refresh is needed after the commit
         self.session.add(measurement)
+        DailyStatsRepository(self.session).record_measurements([measurement])
+        self._bump_measurements_version([user_id])
         self.session.commit()
-        self.session.refresh(measurement)
         return measurement
 
+    def create_measurements(
+        self, readings: Iterable[tuple[int, int, int, datetime]]
+    ) -> list[Measurement]:
+        """Insert (user_id, systolic, diastolic, measured_at) readings in a single transaction."""
+        measurements = [
+            Measurement(user_id=user_id, systolic=systolic, diastolic=diastolic, measured_at=at)
+            for user_id, systolic, diastolic, at in readings
+        ]
+        if not measurements:
+            return measurements
+
+        # The unit of work emits these as one multi-row INSERT ... RETURNING id
+        self.session.add_all(measurements)
+        DailyStatsRepository(self.session).record_measurements(measurements)
+        self._bump_measurements_version({measurement.user_id for measurement in measurements})
+        self.session.commit()
+        return measurements
+
+    def _bump_measurements_version(self, user_ids: Iterable[int]) -> None:
+        """Mark the users' histories as changed; committed with the caller's transaction."""
+        self.session.execute(
+            update(User)
+            .where(User.id.in_(user_ids))
+            .values(measurements_version=User.measurements_version + 1)
+            .execution_options(synchronize_session=False)
+        )
+
     def get_user_measurements(self, user_id: int) -> list[Measurement]:
         """Get all measurements for a specific user."""
         return (
@@ -77,6 +232,78 @@ class MeasurementRepository:
             .all()
         )
 
+    def iter_user_measurement_rows(
+        self, user_id: int, batch_size: int = 1000, until: datetime | None = None
+    ) -> Iterator[MeasurementRow]:
+        """Stream a user's readings, most recent first, as plain rows fetched in batches.
+
+        With ``until``, only readings taken at or before it are included.
+        """
+        query = self.session.query(
+            Measurement.systolic, Measurement.diastolic, Measurement.measured_at
+        ).filter(Measurement.user_id == user_id)
+        if until is not None:
+            query = query.filter(Measurement.measured_at <= until)
+        query = query.order_by(Measurement.measured_at.desc()).yield_per(batch_size)
+        return map(MeasurementRow._make, query)
+
+    def iter_all_measurement_rows(self, batch_size: int = 10_000) -> Iterator[ExportRow]:
+        """Stream every user's readings, ordered by user and time, in one cursor pass.
+
+        yield_per runs the query on a server-side cursor where the driver has one
+        (PostgreSQL), so rows arrive a batch at a time; the (user_id, measured_at)
+        index provides the order without a sort.
+        """
+        query = (
+            self.session.query(
+                User.telegram_id,
+                Measurement.systolic,
+                Measurement.diastolic,
+                Measurement.measured_at,
+            )
+            .join(User, User.id == Measurement.user_id)
+            .order_by(Measurement.user_id, Measurement.measured_at)
+            .yield_per(batch_size)
+        )
+        return map(ExportRow._make, query)
+
+    def get_user_reading_series(
+        self, user_id: int, max_id: int | None = None
+    ) -> list[tuple[int, int, float]]:
+        """A user's readings, oldest first, as (systolic, diastolic, Unix seconds) tuples.
+
+        The timestamp is converted by the database and the rows are taken straight from
+        the DBAPI cursor: creating datetime and Row objects would cost several times the
+        query itself for long histories.
+        """
+        epoch = _epoch_seconds(self.session, Measurement.measured_at)
+        statement = (
+            select(
+                Measurement.systolic,
+                Measurement.diastolic,
+                Measurement.measured_at if epoch is None else epoch,
+            )
+            .where(Measurement.user_id == user_id)
+            .order_by(Measurement.measured_at)
+        )
+        if max_id is not None:
+            statement = statement.where(Measurement.id <= max_id)
+        result = self.session.connection().execute(statement)
+        try:
+            rows = result.cursor.fetchall()
+        finally:
+            result.close()
+
+        if epoch is None:
+            rows = [(s, d, (at - EPOCH).total_seconds()) for s, d, at in rows]
+        return rows
+
+    def get_latest_measurement_id(self, user_id: int) -> int | None:
+        """ID of the user's most recently recorded measurement, if any."""
+        return self.session.execute(
+            select(func.max(Measurement.id)).where(Measurement.user_id == user_id)
+        ).scalar()
+
     def get_recent_measurements(self, user_id: int, limit: int = 10) -> list[Measurement]:
         """Get recent measurements for a user."""
         return (
@@ -89,15 +316,663 @@ class MeasurementRepository:
 
     def get_daily_measurement_count(self, user_id: int, target_date: date) -> int:
         """Get count of measurements for a specific user on a given date."""
-        return (
-            self.session.query(Measurement)
-            .filter(
-                Measurement.user_id == user_id, func.date(Measurement.measured_at) == target_date
+        # Half-open timestamp range keeps the (user_id, measured_at) index usable
+        day_start = datetime.combine(target_date, time.min)
+        return self.count_measurements_between(user_id, day_start, day_start + timedelta(days=1))
+
+    def count_measurements_between(
+        self, user_id: int, start: datetime, end: datetime, max_id: int | None = None
+    ) -> int:
+        """Count a user's measurements in [start, end), optionally only up to a measurement ID."""
+        query = self.session.query(Measurement).filter(
+            Measurement.user_id == user_id,
+            Measurement.measured_at >= start,
+            Measurement.measured_at < end,
+        )
+        if max_id is not None:
+            query = query.filter(Measurement.id <= max_id)
+        return query.count()
+
+
+def _new_daily_stats(user_id: int, day: date, reading: Measurement | MeasurementRow) -> dict:
+    """Start a daily rollup from its first reading."""
+    return {
+        "user_id": user_id,
+        "day": day,
+        "count": 1,
+        "systolic_sum": reading.systolic,
+        "systolic_min": reading.systolic,
+        "systolic_max": reading.systolic,
+        "diastolic_sum": reading.diastolic,
+        "diastolic_min": reading.diastolic,
+        "diastolic_max": reading.diastolic,
+        "first_measured_at": reading.measured_at,
+        "last_measured_at": reading.measured_at,
+        "last_systolic": reading.systolic,
+        "last_diastolic": reading.diastolic,
+    }
+
+
+def _fold_daily_stats(values: dict, reading: Measurement | MeasurementRow) -> None:
+    """Add another reading of the same day to a rollup."""
+    values["count"] += 1
+    values["systolic_sum"] += reading.systolic
+    values["systolic_min"] = min(values["systolic_min"], reading.systolic)
+    values["systolic_max"] = max(values["systolic_max"], reading.systolic)
+    values["diastolic_sum"] += reading.diastolic
+    values["diastolic_min"] = min(values["diastolic_min"], reading.diastolic)
+    values["diastolic_max"] = max(values["diastolic_max"], reading.diastolic)
+    values["first_measured_at"] = min(values["first_measured_at"], reading.measured_at)
+    if reading.measured_at >= values["last_measured_at"]:
+        values["last_measured_at"] = reading.measured_at
+        values["last_systolic"] = reading.systolic
+        values["last_diastolic"] = reading.diastolic
+
+
+class DailyStatsRepository:
+    """Repository for per-user, per-MSK-day measurement rollups."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def record_measurements(self, measurements: Iterable[Measurement]) -> None:
+        """Fold new measurements into their days' rollups; committed with the caller's transaction.
+
+        Sets each measurement's ``daily_count`` from the count the rollup returns, so it
+        is right however many instances record readings for the user.
+        """
+        measurements = list(measurements)
+        rollups: dict[tuple[int, date], dict] = {}
+        for measurement in measurements:
+            key = (measurement.user_id, msk_date(measurement.measured_at))
+            values = rollups.get(key)
+            if values is None:
+                rollups[key] = _new_daily_stats(*key, measurement)
+            else:
+                _fold_daily_stats(values, measurement)
+
+        dialect_insert = _dialect_insert(self.session)
+        if dialect_insert is None:
+            counts = {key: self._merge(values) for key, values in rollups.items()}
+        else:
+            counts = self._upsert(dialect_insert, list(rollups.values()))
+
+        # Readings of a batch count in the order given, so the last one gets the day's total
+        for measurement in reversed(measurements):
+            key = (measurement.user_id, msk_date(measurement.measured_at))
+            measurement.daily_count = counts[key]
+            counts[key] -= 1
+
+    def _upsert(self, dialect_insert: Callable, rollups: list[dict]) -> dict[tuple[int, date], int]:
+        """Fold rollups in with one INSERT ... ON CONFLICT; returns each day's new count."""
+        stats = DailyMeasurementStats.__table__.c
+        statement = dialect_insert(DailyMeasurementStats)
+        new = statement.excluded
+        is_latest = new.last_measured_at >= stats.last_measured_at
+        statement = statement.on_conflict_do_update(
+            index_elements=[stats.user_id, stats.day],
+            set_={
+                "count": stats.count + new.count,
+                "systolic_sum": stats.systolic_sum + new.systolic_sum,
+                "systolic_min": case(
+                    (new.systolic_min < stats.systolic_min, new.systolic_min),
+                    else_=stats.systolic_min,
+                ),
+                "systolic_max": case(
+                    (new.systolic_max > stats.systolic_max, new.systolic_max),
+                    else_=stats.systolic_max,
+                ),
+                "diastolic_sum": stats.diastolic_sum + new.diastolic_sum,
+                "diastolic_min": case(
+                    (new.diastolic_min < stats.diastolic_min, new.diastolic_min),
+                    else_=stats.diastolic_min,
+                ),
+                "diastolic_max": case(
+                    (new.diastolic_max > stats.diastolic_max, new.diastolic_max),
+                    else_=stats.diastolic_max,
+                ),
+                "first_measured_at": case(
+                    (new.first_measured_at < stats.first_measured_at, new.first_measured_at),
+                    else_=stats.first_measured_at,
+                ),
+                "last_measured_at": case(
+                    (is_latest, new.last_measured_at), else_=stats.last_measured_at
+                ),
+                "last_systolic": case((is_latest, new.last_systolic), else_=stats.last_systolic),
+                "last_diastolic": case((is_latest, new.last_diastolic), else_=stats.last_diastolic),
+            },
+        )
+        statement = statement.returning(stats.user_id, stats.day, stats.count)
+        return {
+            (user_id, day): count
+            for user_id, day, count in self.session.execute(statement, rollups)
+        }
+
+    def _merge(self, values: dict) -> int:
+        """Read-modify-write fallback for dialects without ON CONFLICT; returns the new count."""
+        stats = self.session.get(
+            DailyMeasurementStats, (values["user_id"], values["day"]), with_for_update=True
+        )
+        if stats is None:
+            self.session.add(DailyMeasurementStats(**values))
+            return values["count"]
+
+        stats.count += values["count"]
+        stats.systolic_sum += values["systolic_sum"]
+        stats.systolic_min = min(stats.systolic_min, values["systolic_min"])
+        stats.systolic_max = max(stats.systolic_max, values["systolic_max"])
+        stats.diastolic_sum += values["diastolic_sum"]
+        stats.diastolic_min = min(stats.diastolic_min, values["diastolic_min"])
+        stats.diastolic_max = max(stats.diastolic_max, values["diastolic_max"])
+        stats.first_measured_at = min(stats.first_measured_at, values["first_measured_at"])
+        if values["last_measured_at"] >= stats.last_measured_at:
+            stats.last_measured_at = values["last_measured_at"]
+            stats.last_systolic = values["last_systolic"]
+            stats.last_diastolic = values["last_diastolic"]
+        return stats.count
+
+    def get_user_daily_stats(
+        self, user_id: int, since: date | None = None
+    ) -> list[DailyMeasurementStats]:
+        """Get a user's daily rollups, oldest day first."""
+        query = self.session.query(DailyMeasurementStats).filter(
+            DailyMeasurementStats.user_id == user_id
+        )
+        if since is not None:
+            query = query.filter(DailyMeasurementStats.day >= since)
+        return query.order_by(DailyMeasurementStats.day).all()
+
+    def rebuild(self, user_id: int | None = None, batch_size: int = 10_000) -> int:
+        """Recompute rollups from raw measurements in one ordered pass; returns days written."""
+        clear = delete(DailyMeasurementStats)
+        rows = self.session.query(
+            Measurement.user_id,
+            Measurement.systolic,
+            Measurement.diastolic,
+            Measurement.measured_at,
+        )
+        if user_id is not None:
+            clear = clear.where(DailyMeasurementStats.user_id == user_id)
+            rows = rows.filter(Measurement.user_id == user_id)
+        self.session.execute(clear)
+
+        pending: list[dict] = []
+        current: dict | None = None
+        written = 0
+
+        for row in rows.order_by(Measurement.user_id, Measurement.measured_at).yield_per(
+            batch_size
+        ):
+            day = msk_date(row.measured_at)
+            if current is None or current["user_id"] != row.user_id or current["day"] != day:
+                current = _new_daily_stats(row.user_id, day, row)
+                pending.append(current)
+            else:
+                _fold_daily_stats(current, row)
+
+            # Keep the day being accumulated; flush completed ones
+            if len(pending) > batch_size:
+                self.session.execute(insert(DailyMeasurementStats), pending[:-1])
+                written += len(pending) - 1
+                pending = pending[-1:]
+
+        if pending:
+            self.session.execute(insert(DailyMeasurementStats), pending)
+            written += len(pending)
+
+        self.session.commit()
+        return written
+
+
+class ReminderOutboxRepository:
+    """Repository for the durable reminder delivery outbox."""
+
+    PENDING = "pending"
+    SENT = "sent"
+    FAILED = "failed"
+    BLOCKED = "blocked"
+
+    # Telegram IDs per IN (...) list when enqueueing personal-schedule users
+    ENQUEUE_CHUNK = 500
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def enqueue(
+        self,
+        slot_at: datetime,
+        telegram_ids: Iterable[int] = (),
+        include_default: bool = False,
+        now: datetime | None = None,
+    ) -> int:
+        """Queue the slot's reminder for the given users and, optionally, all default-schedule
+        users; users already queued for the slot are skipped. Returns the number queued."""
+        now = now or datetime.utcnow()
+        conditions = []
+        if include_default:
+            conditions.append(and_(User.timezone.is_(None), User.reminder_times.is_(None)))
+
+        telegram_ids = list(telegram_ids)
+        chunks = [
+            telegram_ids[i : i + self.ENQUEUE_CHUNK]
+            for i in range(0, len(telegram_ids), self.ENQUEUE_CHUNK)
+        ]
+        conditions.extend(User.telegram_id.in_(chunk) for chunk in chunks)
+
+        queued = 0
+        for condition in conditions:
+            queued += self._enqueue_where(slot_at, now, condition)
+        self.session.commit()
+        return queued
+
+    def _enqueue_where(self, slot_at: datetime, now: datetime, condition) -> int:
+        """INSERT ... SELECT the matching active users in one statement."""
+        already_queued = (
+            select(ReminderDelivery.id)
+            .where(ReminderDelivery.slot_at == slot_at, ReminderDelivery.user_id == User.id)
+            .exists()
+        )
+        users = select(
+            User.id, literal(slot_at), literal(self.PENDING), literal(0), literal(now)
+        ).where(User.is_active.is_(True), condition, ~already_queued)
+
+        statement = insert(ReminderDelivery).from_select(
+            ["user_id", "slot_at", "status", "attempts", "next_attempt_at"], users
+        )
+        return self.session.execute(statement).rowcount
+
+    def claim(
+        self, limit: int, lease: float, now: datetime | None = None
+    ) -> list[tuple[int, int, int]]:
+        """Take up to ``limit`` due deliveries as (delivery_id, telegram_id, attempt).
+
+        Claimed rows are hidden for ``lease`` seconds; if the process dies before
+        recording the outcome they become due again and are retried.
+        """
+        now = now or datetime.utcnow()
+        rows = self.session.execute(
+            select(ReminderDelivery.id, User.telegram_id, ReminderDelivery.attempts)
+            .join(User, User.id == ReminderDelivery.user_id)
+            .where(
+                ReminderDelivery.status == self.PENDING,
+                ReminderDelivery.next_attempt_at <= now,
+            )
+            .order_by(ReminderDelivery.next_attempt_at)
+            .limit(limit)
+            .with_for_update(skip_locked=True, of=ReminderDelivery)
+        ).all()
+        if not rows:
+            self.session.rollback()
+            return []
+
+        self.session.execute(
+            update(ReminderDelivery)
+            .where(ReminderDelivery.id.in_([row.id for row in rows]))
+            .values(
+                attempts=ReminderDelivery.attempts + 1,
+                next_attempt_at=now + timedelta(seconds=lease),
+            )
+        )
+        self.session.commit()
+        return [(row.id, row.telegram_id, row.attempts + 1) for row in rows]
+
+    def complete(self, outcomes: list[dict], deactivate_after: int = 3) -> None:
+        """Record delivery outcomes and the reachability of their users.
+
+        Each outcome has ``id``, ``status``, ``next_attempt_at``, ``last_error`` and
+        ``sent_at``. A delivered reminder resets the user's failure streak; a blocked
+        one, or ``deactivate_after`` failed ones in a row, marks the user inactive.
+        """
+        if not outcomes:
+            return
+
+        self.session.execute(update(ReminderDelivery), outcomes)
+
+        sent = [outcome["id"] for outcome in outcomes if outcome["status"] == self.SENT]
+        if sent:
+            self.session.execute(
+                update(User)
+                .where(
+                    User.id.in_(
+                        select(ReminderDelivery.user_id).where(ReminderDelivery.id.in_(sent))
+                    ),
+                    User.consecutive_failures > 0,
+                )
+                .values(consecutive_failures=0)
+                .execution_options(synchronize_session=False)
+            )
+
+        failures = [
+            {
+                "delivery_id": outcome["id"],
+                "reason": outcome["last_error"],
+                "blocked": outcome["status"] == self.BLOCKED,
+            }
+            for outcome in outcomes
+            if outcome["status"] in (self.FAILED, self.BLOCKED)
+        ]
+        if failures:
+            users = User.__table__.c
+            failures_in_a_row = users.consecutive_failures + 1
+            self.session.execute(
+                update(User.__table__)
+                .where(
+                    users.id
+                    == select(ReminderDelivery.user_id)
+                    .where(ReminderDelivery.id == bindparam("delivery_id"))
+                    .scalar_subquery()
+                )
+                .values(
+                    consecutive_failures=failures_in_a_row,
+                    last_failure_reason=bindparam("reason"),
+                    is_active=case(
+                        (bindparam("blocked"), False),
+                        (failures_in_a_row >= deactivate_after, False),
+                        else_=users.is_active,
+                    ),
+                ),
+                failures,
             )
-            .count()
+        self.session.commit()
+
+    def count_pending(self) -> int:
+        """Number of deliveries not yet sent or given up on."""
+        return self.session.query(ReminderDelivery).filter_by(status=self.PENDING).count()
+
+    def prune(self, before: datetime) -> int:
+        """Delete finished deliveries of slots older than ``before``."""
+        deleted = self.session.execute(
+            delete(ReminderDelivery).where(
+                ReminderDelivery.status != self.PENDING, ReminderDelivery.slot_at < before
+            )
+        ).rowcount
+        self.session.commit()
+        return deleted
+
+
+class LeaseRepository:
+    """Repository for leases through which one instance owns a singleton job."""
+
+    def __init__(self, session: Session):
+        self.session = session
+
+    def acquire(self, name: str, holder: str, ttl: float, now: datetime | None = None) -> bool:
+        """Take or renew the lease unless another holder's lease is still valid."""
+        now = now or datetime.utcnow()
+        expires_at = now + timedelta(seconds=ttl)
+
+        renewed = self.session.execute(
+            update(ServiceLease)
+            .where(
+                ServiceLease.name == name,
+                (ServiceLease.holder == holder) | (ServiceLease.expires_at <= now),
+            )
+            .values(holder=holder, expires_at=expires_at)
+        ).rowcount
+        if renewed:
+            self.session.commit()
+            return True
+
+        # Nobody has held the lease yet; of several instances racing here one insert wins
+        values = {"name": name, "holder": holder, "expires_at": expires_at}
+        insert_ = _dialect_insert(self.session)
+        if insert_ is not None:
+            statement = insert_(ServiceLease).values(**values).on_conflict_do_nothing()
+            created = self.session.execute(statement).rowcount
+            self.session.commit()
+            return created == 1
+
+        try:
+            self.session.execute(insert(ServiceLease).values(**values))
+            self.session.commit()
+        except IntegrityError:
+            self.session.rollback()
+            return False
+        return True
+
+    def release(self, name: str, holder: str) -> None:
+        """Give up the lease so another instance can take over at once."""
+        self.session.execute(
+            delete(ServiceLease).where(ServiceLease.name == name, ServiceLease.holder == holder)
         )
+        self.session.commit()
 
 
 def get_repositories(session: Session) -> tuple[UserRepository, MeasurementRepository]:
     """Get repository instances for the session."""
     return UserRepository(session), MeasurementRepository(session)
+
+
+class _AsyncRepository:
+    """Base for async repository variants.
+
+    Query logic lives in the sync repositories; async variants run it through
+    ``AsyncSession.run_sync`` (asyncio drivers) or a worker thread (sync drivers).
+    """
+
+    def __init__(self, session: AsyncSession | Session):
+        self.session = session
+
+    async def _run(self, operation: Callable[[Session], T]) -> T:
+        if isinstance(self.session, AsyncSession):
+            return await self.session.run_sync(operation)
+        return await asyncio.to_thread(operation, self.session)
+
+
+class AsyncUserRepository(_AsyncRepository):
+    """Async repository for user data operations."""
+
+    async def create_user(
+        self, telegram_id: int, username: str | None = None, first_name: str | None = None
+    ) -> User | None:
+        """Create a new user or return existing one."""
+        return await self._run(
+            lambda session: UserRepository(session).create_user(telegram_id, username, first_name)
+        )
+
+    async def get_by_telegram_id(self, telegram_id: int) -> User | None:
+        """Get user by Telegram ID."""
+        return await self._run(
+            lambda session: UserRepository(session).get_by_telegram_id(telegram_id)
+        )
+
+    async def get_id_by_telegram_id(self, telegram_id: int) -> int | None:
+        """Get internal user ID by Telegram ID without loading the full user."""
+        return await self._run(
+            lambda session: UserRepository(session).get_id_by_telegram_id(telegram_id)
+        )
+
+    async def is_active(self, telegram_id: int) -> bool | None:
+        """Whether the user receives reminders; None for an unknown user."""
+        return await self._run(lambda session: UserRepository(session).is_active(telegram_id))
+
+    async def get_measurements_version(self, user_id: int) -> int | None:
+        """Version stamp of a user's measurement history, bumped by every new reading."""
+        return await self._run(
+            lambda session: UserRepository(session).get_measurements_version(user_id)
+        )
+
+    async def get_all_users(self) -> list[User]:
+        """Get all registered users."""
+        return await self._run(lambda session: UserRepository(session).get_all_users())
+
+    async def get_custom_reminder_schedules(self) -> list[tuple[int, str | None, str | None]]:
+        """Get (telegram_id, timezone, reminder_times) of users with a personal schedule."""
+        return await self._run(
+            lambda session: UserRepository(session).get_custom_reminder_schedules()
+        )
+
+    async def reactivate(self, telegram_id: int) -> bool:
+        """Mark an inactive user reachable again; returns whether they were inactive."""
+        return await self._run(lambda session: UserRepository(session).reactivate(telegram_id))
+
+    async def set_timezone(self, telegram_id: int, timezone: str | None) -> User | None:
+        """Set a user's reminder time zone (None for the default)."""
+        return await self._run(
+            lambda session: UserRepository(session).set_timezone(telegram_id, timezone)
+        )
+
+    async def set_reminder_times(self, telegram_id: int, reminder_times: str | None) -> User | None:
+        """Set a user's comma-separated reminder times (None for the defaults)."""
+        return await self._run(
+            lambda session: UserRepository(session).set_reminder_times(telegram_id, reminder_times)
+        )
+
+
+class AsyncMeasurementRepository(_AsyncRepository):
+    """Async repository for measurement data operations."""
+
+    async def create_measurement(
+        self, user_id: int, systolic: int, diastolic: int, measured_at: datetime | None = None
+    ) -> Measurement:
+        """Create a new blood pressure measurement."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).create_measurement(
+                user_id, systolic, diastolic, measured_at
+            )
+        )
+
+    async def create_measurements(
+        self, readings: Iterable[tuple[int, int, int, datetime]]
+    ) -> list[Measurement]:
+        """Insert (user_id, systolic, diastolic, measured_at) readings in a single transaction."""
+        readings = list(readings)
+        return await self._run(
+            lambda session: MeasurementRepository(session).create_measurements(readings)
+        )
+
+    async def get_user_measurements(self, user_id: int) -> list[Measurement]:
+        """Get all measurements for a specific user."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).get_user_measurements(user_id)
+        )
+
+    async def stream_user_measurement_rows(
+        self,
+        user_id: int,
+        consume: Callable[[Iterator[MeasurementRow]], T],
+        until: datetime | None = None,
+    ) -> T:
+        """Pass a user's readings, most recent first, to ``consume`` as a lazy stream.
+
+        ``consume`` runs synchronously next to the open cursor, so it must not await.
+        """
+        return await self._run(
+            lambda session: consume(
+                MeasurementRepository(session).iter_user_measurement_rows(user_id, until=until)
+            )
+        )
+
+    async def get_user_reading_series(
+        self, user_id: int, max_id: int | None = None
+    ) -> list[tuple[int, int, float]]:
+        """A user's readings, oldest first, as (systolic, diastolic, Unix seconds) tuples."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).get_user_reading_series(user_id, max_id)
+        )
+
+    async def get_latest_measurement_id(self, user_id: int) -> int | None:
+        """ID of the user's most recently recorded measurement, if any."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).get_latest_measurement_id(user_id)
+        )
+
+    async def get_recent_measurements(self, user_id: int, limit: int = 10) -> list[Measurement]:
+        """Get recent measurements for a user."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).get_recent_measurements(user_id, limit)
+        )
+
+    async def get_daily_measurement_count(self, user_id: int, target_date: date) -> int:
+        """Get count of measurements for a specific user on a given date."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).get_daily_measurement_count(
+                user_id, target_date
+            )
+        )
+
+    async def count_measurements_between(
+        self, user_id: int, start: datetime, end: datetime, max_id: int | None = None
+    ) -> int:
+        """Count a user's measurements in [start, end), optionally only up to a measurement ID."""
+        return await self._run(
+            lambda session: MeasurementRepository(session).count_measurements_between(
+                user_id, start, end, max_id
+            )
+        )
+
+
+class AsyncDailyStatsRepository(_AsyncRepository):
+    """Async repository for per-user, per-MSK-day measurement rollups."""
+
+    async def get_user_daily_stats(
+        self, user_id: int, since: date | None = None
+    ) -> list[DailyMeasurementStats]:
+        """Get a user's daily rollups, oldest day first."""
+        return await self._run(
+            lambda session: DailyStatsRepository(session).get_user_daily_stats(user_id, since)
+        )
+
+
+class AsyncReminderOutboxRepository(_AsyncRepository):
+    """Async repository for the durable reminder delivery outbox."""
+
+    async def enqueue(
+        self,
+        slot_at: datetime,
+        telegram_ids: Iterable[int] = (),
+        include_default: bool = False,
+        now: datetime | None = None,
+    ) -> int:
+        """Queue the slot's reminder for the given and, optionally, default-schedule users."""
+        telegram_ids = list(telegram_ids)
+        return await self._run(
+            lambda session: ReminderOutboxRepository(session).enqueue(
+                slot_at, telegram_ids, include_default, now
+            )
+        )
+
+    async def claim(
+        self, limit: int, lease: float, now: datetime | None = None
+    ) -> list[tuple[int, int, int]]:
+        """Take up to ``limit`` due deliveries as (delivery_id, telegram_id, attempt)."""
+        return await self._run(
+            lambda session: ReminderOutboxRepository(session).claim(limit, lease, now)
+        )
+
+    async def complete(self, outcomes: list[dict], deactivate_after: int = 3) -> None:
+        """Record delivery outcomes and the reachability of their users."""
+        await self._run(
+            lambda session: ReminderOutboxRepository(session).complete(outcomes, deactivate_after)
+        )
+
+    async def count_pending(self) -> int:
+        """Number of deliveries not yet sent or given up on."""
+        return await self._run(lambda session: ReminderOutboxRepository(session).count_pending())
+
+    async def prune(self, before: datetime) -> int:
+        """Delete finished deliveries of slots older than ``before``."""
+        return await self._run(lambda session: ReminderOutboxRepository(session).prune(before))
+
+
+class AsyncLeaseRepository(_AsyncRepository):
+    """Async repository for singleton job leases."""
+
+    async def acquire(
+        self, name: str, holder: str, ttl: float, now: datetime | None = None
+    ) -> bool:
+        """Take or renew the lease unless another holder's lease is still valid."""
+        return await self._run(
+            lambda session: LeaseRepository(session).acquire(name, holder, ttl, now)
+        )
+
+    async def release(self, name: str, holder: str) -> None:
+        """Give up the lease so another instance can take over at once."""
+        await self._run(lambda session: LeaseRepository(session).release(name, holder))
+
+
+def get_async_repositories(
+    session: AsyncSession | Session,
+) -> tuple[AsyncUserRepository, AsyncMeasurementRepository]:
+    """Get async repository instances for the session."""
+    return AsyncUserRepository(session), AsyncMeasurementRepository(session)
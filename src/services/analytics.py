@@ -0,0 +1,178 @@
+from collections.abc import Sequence
+from dataclasses import dataclass
+from datetime import UTC, datetime, tzinfo
+from itertools import chain
+
+import numpy as np
+
+DAY = 86_400.0
+
+# Local time of day, [start, end) hours
+MORNING_HOURS = (4, 12)
+EVENING_HOURS = (17, 24)
+
+# Readings considered for the trend slope, counted back from the latest one
+TREND_DAYS = 90
+
+# Index order of UserStats.categories, following the AHA thresholds used elsewhere
+CATEGORY_COUNT = 5
+
+
+@dataclass
+class ReadingArrays:
+    """A user's readings as contiguous arrays, oldest first.
+
+    Systolic and diastolic share one (2, n) array so every statistic is computed
+    for both in the same vectorized operation.
+    """
+
+    values: np.ndarray  # float64, shape (2, n): systolic, diastolic
+    times: np.ndarray  # float64, shape (n,): Unix seconds (UTC)
+
+    @classmethod
+    def from_series(cls, series: Sequence[tuple[int, int, float]]) -> "ReadingArrays":
+        """Build from (systolic, diastolic, Unix seconds) tuples ordered by time."""
+        flat = np.fromiter(
+            chain.from_iterable(series), dtype=np.float64, count=3 * len(series)
+        ).reshape(-1, 3)
+        return cls(np.ascontiguousarray(flat[:, :2].T), np.ascontiguousarray(flat[:, 2]))
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+
+@dataclass
+class UserStats:
+    """Statistics of a user's readings; pairs are (systolic, diastolic)."""
+
+    count: int
+    first_at: datetime
+    last_at: datetime
+    mean: np.ndarray
+    minimum: np.ndarray
+    maximum: np.ndarray
+    sd: np.ndarray
+    cv: np.ndarray  # percent
+    # Average over the window ending at each reading, shape (2, n)
+    rolling_7: np.ndarray
+    rolling_30: np.ndarray
+    # Averages over the last 7 / 30 days up to now, with their number of readings
+    last_7: np.ndarray | None
+    last_7_count: int
+    last_30: np.ndarray | None
+    last_30_count: int
+    morning: np.ndarray | None
+    morning_count: int
+    evening: np.ndarray | None
+    evening_count: int
+    categories: np.ndarray  # readings per category: normal, elevated, stage 1, stage 2, crisis
+    trend: np.ndarray | None  # mmHg per 30 days over the last TREND_DAYS
+
+
+def rolling_mean(values: np.ndarray, times: np.ndarray, window: float) -> np.ndarray:
+    """Mean of the readings in (t - window, t] for every reading time t."""
+    sums = np.zeros((values.shape[0], len(times) + 1))
+    np.cumsum(values, axis=1, out=sums[:, 1:])
+    start = np.searchsorted(times, times - window, side="right")
+    return (sums[:, 1:] - sums[:, start]) / (np.arange(1, len(times) + 1) - start)
+
+
+def categorize(values: np.ndarray) -> np.ndarray:
+    """AHA category index of every reading."""
+    systolic, diastolic = values
+    return np.select(
+        [
+            (systolic <= 120) & (diastolic <= 80),
+            (systolic <= 130) & (diastolic <= 80),
+            (systolic <= 140) | (diastolic <= 90),
+            (systolic <= 180) | (diastolic <= 120),
+        ],
+        [0, 1, 2, 3],
+        default=4,
+    )
+
+
+def local_times(times: np.ndarray, tz: tzinfo) -> np.ndarray:
+    """Shift Unix seconds to local wall-clock seconds, following the zone's offset day by day."""
+    days = np.floor(times / DAY)
+    # Times are sorted, so each distinct day starts where the day number changes
+    starts = np.flatnonzero(np.diff(days, prepend=days[0] - 1))
+    offsets = np.array(
+        [
+            datetime.fromtimestamp(days[i] * DAY + DAY / 2, UTC)
+            .astimezone(tz)
+            .utcoffset()
+            .total_seconds()
+            for i in starts
+        ]
+    )
+    return times + np.repeat(offsets, np.diff(np.append(starts, len(times))))
+
+
+def local_hours(times: np.ndarray, tz: tzinfo) -> np.ndarray:
+    """Local hour of day of every reading."""
+    return (local_times(times, tz) % DAY) // 3600
+
+
+def _window_mean(values: np.ndarray, mask: np.ndarray) -> tuple[np.ndarray | None, int]:
+    count = int(np.count_nonzero(mask))
+    return (values[:, mask].mean(axis=1) if count else None), count
+
+
+def compute_stats(
+    readings: ReadingArrays, tz: tzinfo = UTC, now: datetime | None = None
+) -> UserStats | None:
+    """All statistics of a user's readings in one batched pass; None without readings."""
+    if not len(readings):
+        return None
+
+    values, times = readings.values, readings.times
+    now_ts = (now or datetime.now(UTC)).timestamp()
+
+    mean = values.mean(axis=1)
+    sd = values.std(axis=1, ddof=1) if len(times) > 1 else np.zeros(2)
+
+    recent_7 = np.searchsorted(times, now_ts - 7 * DAY, side="right")
+    recent_30 = np.searchsorted(times, now_ts - 30 * DAY, side="right")
+    last_7 = values[:, recent_7:]
+    last_30 = values[:, recent_30:]
+
+    hours = local_hours(times, tz)
+    morning, morning_count = _window_mean(
+        values, (hours >= MORNING_HOURS[0]) & (hours < MORNING_HOURS[1])
+    )
+    evening, evening_count = _window_mean(
+        values, (hours >= EVENING_HOURS[0]) & (hours < EVENING_HOURS[1])
+    )
+
+    # Least-squares slope of both series against time
+    trend = None
+    trend_start = np.searchsorted(times, times[-1] - TREND_DAYS * DAY)
+    x = times[trend_start:]
+    if len(x) >= 3 and x[-1] - x[0] >= DAY:
+        x = x - x.mean()
+        y = values[:, trend_start:]
+        trend = (y - y.mean(axis=1, keepdims=True)) @ x / (x @ x) * 30 * DAY
+
+    return UserStats(
+        count=len(times),
+        first_at=datetime.fromtimestamp(times[0], UTC),
+        last_at=datetime.fromtimestamp(times[-1], UTC),
+        mean=mean,
+        minimum=values.min(axis=1),
+        maximum=values.max(axis=1),
+        sd=sd,
+        cv=sd / mean * 100,
+        rolling_7=rolling_mean(values, times, 7 * DAY),
+        rolling_30=rolling_mean(values, times, 30 * DAY),
+        last_7=last_7.mean(axis=1) if last_7.shape[1] else None,
+        last_7_count=last_7.shape[1],
+        last_30=last_30.mean(axis=1) if last_30.shape[1] else None,
+        last_30_count=last_30.shape[1],
+        morning=morning,
+        morning_count=morning_count,
+        evening=evening,
+        evening_count=evening_count,
+        categories=np.bincount(categorize(values), minlength=CATEGORY_COUNT),
+        trend=trend,
+    )
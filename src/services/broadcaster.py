@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass, field
+from enum import Enum
+
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+flood_waits = registry.counter(
+    "bp_telegram_flood_waits_total", "Times Telegram asked the bot to slow down."
+)
+
+# Errors worth retrying later; anything else (blocked bot, deleted chat) is permanent
+TRANSIENT_ERRORS = (TelegramNetworkError, TelegramServerError)
+
+
+def is_unreachable(error: Exception) -> bool:
+    """Whether the chat can no longer be messaged (bot blocked, user deactivated, chat gone)."""
+    if isinstance(error, TelegramForbiddenError):
+        return True
+    return isinstance(error, TelegramBadRequest) and "chat not found" in str(error).lower()
+
+
+class DeliveryStatus(Enum):
+    """Outcome of a single delivery attempt."""
+
+    SENT = "sent"
+    RETRY = "retry"
+    FAILED = "failed"
+    BLOCKED = "blocked"
+
+
+@dataclass
+class Delivery:
+    """Outcome of delivering to one chat, with the error that prevented it."""
+
+    status: DeliveryStatus
+    error: str | None = None
+
+
+@dataclass
+class BroadcastResult:
+    """Delivery statistics for one broadcast."""
+
+    sent: int = 0
+    failed: int = 0
+    blocked: int = 0  # included in failed
+    retried: int = 0
+    flood_waits: int = 0
+    started_at: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+
+    @property
+    def throughput(self) -> float:
+        """Delivered messages per second."""
+        return self.sent / self.duration if self.duration > 0 else 0.0
+
+
+class TokenBucket:
+    """Token bucket limiting the global message rate."""
+
+    def __init__(self, rate: float, capacity: float = 1.0):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and take it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+    def pause(self, seconds: float) -> None:
+        """Stop handing out tokens for the given number of seconds."""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+        self._tokens = 0
+
+
+class ChatRateLimiter:
+    """Minimum interval between messages to the same chat.
+
+    Only chats contacted within the last interval are remembered, so memory stays
+    bounded by the global rate rather than by the number of recipients.
+    """
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._last_sent: dict[int, float] = {}
+
+    async def wait(self, chat_id: int) -> None:
+        """Wait until the chat may receive another message."""
+        last_sent = self._last_sent.get(chat_id)
+        if last_sent is not None:
+            delay = last_sent + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+
+        now = time.monotonic()
+        self._last_sent[chat_id] = now
+
+        if len(self._last_sent) > 1024:
+            self._last_sent = {
+                cid: sent for cid, sent in self._last_sent.items() if now - sent < self.interval
+            }
+
+
+class Broadcaster:
+    """Rate-limited message delivery; ``concurrency`` bounds the sends in flight."""
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate_limit: float = 30.0,
+        concurrency: int = 10,
+        per_chat_interval: float = 1.0,
+        max_retries: int = 3,
+    ):
+        self.bot = bot
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.bucket = TokenBucket(rate_limit)
+        self.chat_limiter = ChatRateLimiter(per_chat_interval)
+
+    async def deliver(self, chat_id: int, text: str, result: BroadcastResult) -> Delivery:
+        """Send one message, waiting out flood control when Telegram asks to."""
+        for _ in range(self.max_retries + 1):
+            await self.chat_limiter.wait(chat_id)
+            await self.bucket.acquire()
+
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text)
+                return Delivery(DeliveryStatus.SENT)
+            except TelegramRetryAfter as e:
+                logger.warning(f"Flood control hit, pausing for {e.retry_after}s")
+                result.flood_waits += 1
+                flood_waits.inc()
+                self.bucket.pause(e.retry_after)
+            except TRANSIENT_ERRORS as e:
+                logger.warning(f"Transient error sending to {chat_id}: {e}")
+                return Delivery(DeliveryStatus.RETRY, str(e))
+            except Exception as e:
+                if is_unreachable(e):
+                    logger.info(f"Chat {chat_id} is unreachable: {e}")
+                    return Delivery(DeliveryStatus.BLOCKED, str(e))
+                logger.error(f"Failed to send message to {chat_id}: {e}")
+                return Delivery(DeliveryStatus.FAILED, str(e))
+
+        return Delivery(DeliveryStatus.RETRY, "flood control")
@@ -0,0 +1,147 @@
+import asyncio
+import io
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from ..database.database import EngineOptions, get_async_session
+from ..database.repositories import MeasurementRepository, get_async_repositories
+from .analytics import DAY, ReadingArrays, local_times
+from .cache import LRUCache
+from .metrics import registry
+from .workers import InFlight, WorkerPool, get_worker_database
+
+# Points drawn per series; longer histories are averaged down to this many
+MAX_POINTS = 500
+
+chart_seconds = registry.histogram(
+    "bp_chart_seconds", "Time to load and render a chart, including the queue wait.", ["mode"]
+)
+chart_requests = registry.counter(
+    "bp_chart_requests_total", "Chart requests by cache outcome.", ["result"]
+)
+
+
+def downsample(readings: ReadingArrays, max_points: int = MAX_POINTS) -> ReadingArrays:
+    """Average consecutive readings into at most max_points buckets of equal size."""
+    if len(readings) <= max_points:
+        return readings
+    starts = np.linspace(0, len(readings), max_points, endpoint=False).astype(np.intp)
+    sizes = np.diff(np.append(starts, len(readings)))
+    return ReadingArrays(
+        np.add.reduceat(readings.values, starts, axis=1) / sizes,
+        np.add.reduceat(readings.times, starts) / sizes,
+    )
+
+
+def render_chart(series: list[tuple[int, int, float]], timezone: str) -> bytes:
+    """Plot systolic and diastolic readings over time as a PNG."""
+    # Imported here: matplotlib is only needed by chart workers and takes a while to load
+    from matplotlib.dates import AutoDateLocator, ConciseDateFormatter
+    from matplotlib.figure import Figure
+
+    readings = downsample(ReadingArrays.from_series(series))
+    # Matplotlib dates are days since 1970-01-01; shifting by the offset draws local time
+    days = local_times(readings.times, ZoneInfo(timezone)) / DAY
+
+    # A Figure without pyplot keeps no global state, so workers can render concurrently
+    figure = Figure(figsize=(10, 5), dpi=100, layout="constrained")
+    axes = figure.add_subplot()
+    marker = "o" if len(readings) <= 60 else None
+    axes.plot(days, readings.values[0], color="tab:red", marker=marker, label="Систолическое")
+    axes.plot(days, readings.values[1], color="tab:blue", marker=marker, label="Диастолическое")
+    for threshold, color in ((130, "tab:red"), (80, "tab:blue")):
+        axes.axhline(threshold, color=color, linestyle="--", linewidth=0.8, alpha=0.5)
+
+    locator = AutoDateLocator()
+    axes.xaxis.set_major_locator(locator)
+    axes.xaxis.set_major_formatter(ConciseDateFormatter(locator))
+    axes.set_ylabel("mmHg")
+    axes.set_title("Артериальное давление")
+    axes.grid(alpha=0.3)
+    axes.legend(loc="upper left")
+
+    buffer = io.BytesIO()
+    figure.savefig(buffer, format="png")
+    return buffer.getvalue()
+
+
+def build_user_chart(
+    database_url: str,
+    user_id: int,
+    max_id: int,
+    timezone: str,
+    options: EngineOptions | None = None,
+) -> bytes:
+    """Load a user's readings up to a measurement and render them, in a pool worker."""
+    db = get_worker_database(database_url, options)
+    with db.get_session() as session:
+        series = MeasurementRepository(session).get_user_reading_series(user_id, max_id)
+    return render_chart(series, timezone)
+
+
+class ChartRenderer:
+    """Renders users' charts off the event loop and caches the PNGs.
+
+    A cached chart stays valid until the user records a new measurement (or changes
+    time zone), so repeated /chart requests cost one indexed lookup.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        mode: str = "thread",
+        workers: int = 1,
+        cache_size: int = 256,
+        engine_options: EngineOptions | None = None,
+    ):
+        self.pool = WorkerPool(mode, workers, "chart")
+        self.database_url = database_url
+        self.mode = mode
+        self.workers = workers
+        self.engine_options = engine_options
+        # Keyed by the user's latest measurement, so a new reading misses and the
+        # superseded chart ages out of the LRU
+        self.cache: LRUCache[tuple[int, int, str], bytes] = LRUCache(cache_size)
+        self._in_flight: InFlight[tuple[int, int, str], bytes] = InFlight()
+
+    async def render(self, user_id: int, timezone: str) -> bytes | None:
+        """A user's chart as PNG, or None without measurements."""
+        async with get_async_session() as session:
+            _, measurement_repo = get_async_repositories(session)
+            latest_id = await measurement_repo.get_latest_measurement_id(user_id)
+        if latest_id is None:
+            return None
+
+        key = (user_id, latest_id, timezone)
+        png = self.cache.get(key)
+        if png is not None:
+            chart_requests.inc(result="hit")
+            return png
+        chart_requests.inc(result="miss")
+
+        png = await self._in_flight.join(key, lambda: self._render(user_id, latest_id, timezone))
+        self.cache.set(key, png)
+        return png
+
+    async def _render(self, user_id: int, max_id: int, timezone: str) -> bytes:
+        with chart_seconds.time(mode=self.mode):
+            if self.mode == "inline":
+                async with get_async_session() as session:
+                    _, measurement_repo = get_async_repositories(session)
+                    series = await measurement_repo.get_user_reading_series(user_id, max_id)
+                # Drawing is CPU-bound even here, so it still leaves the event loop
+                return await asyncio.to_thread(render_chart, series, timezone)
+
+            return await self.pool.run(
+                build_user_chart,
+                self.database_url,
+                user_id,
+                max_id,
+                timezone,
+                self.engine_options,
+            )
+
+    def shutdown(self) -> None:
+        """Stop the worker pool."""
+        self.pool.shutdown()
@@ -0,0 +1,109 @@
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from collections.abc import AsyncIterator
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..database.database import EngineOptions
+from ..database.repositories import MeasurementRepository
+from .metrics import registry
+from .report_generator import REPORT_FORMATS, ReportGenerator
+from .workers import WorkerPool, get_worker_database
+
+logger = logging.getLogger(__name__)
+
+export_seconds = registry.histogram(
+    "bp_export_seconds",
+    "Time to export every user's measurements.",
+    buckets=(1, 5, 15, 60, 300, 900, 3600),
+)
+
+
+@dataclass
+class ExportResult:
+    """An all-users export file."""
+
+    measurement_count: int
+    user_count: int
+    size: int
+    path: str
+
+
+class ExportInProgressError(Exception):
+    """Raised when an export is requested while another one is running."""
+
+
+def build_export(
+    database_url: str,
+    path: str,
+    report_format: str = "csv.gz",
+    options: EngineOptions | None = None,
+) -> ExportResult:
+    """Stream every user's readings to a file in one cursor pass over a blocking connection."""
+    db = get_worker_database(database_url, options)
+
+    with db.get_session() as session:
+        rows = MeasurementRepository(session).iter_all_measurement_rows()
+        counter = ReportGenerator().write_export(rows, path, report_format)
+
+    return ExportResult(counter.measurements, counter.users, os.path.getsize(path), path)
+
+
+class BulkExporter:
+    """Exports all users' measurements in a background thread, one export at a time.
+
+    The export holds a single database connection for the whole pass and runs outside
+    the report pool, so users' own reports are not held up behind it.
+    """
+
+    def __init__(self, database_url: str, engine_options: EngineOptions | None = None):
+        self.database_url = database_url
+        self.engine_options = engine_options
+        self.pool = WorkerPool("thread", 1, "export")
+        self._running = False
+        self._directory: str | None = None
+
+    @property
+    def is_running(self) -> bool:
+        """Whether an export is in progress."""
+        return self._running
+
+    @asynccontextmanager
+    async def export(self, report_format: str = "csv.gz") -> AsyncIterator[ExportResult]:
+        """The export file for the duration of the block; it is removed afterwards."""
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {report_format}")
+        if self._running:
+            raise ExportInProgressError("An export is already running")
+
+        self._running = True
+        path = os.path.join(self._get_directory(), f"export-{uuid.uuid4().hex}.{report_format}")
+        try:
+            with export_seconds.time():
+                result = await self.pool.run(
+                    build_export, self.database_url, path, report_format, self.engine_options
+                )
+            logger.info(
+                f"Exported {result.measurement_count} measurements of {result.user_count} users "
+                f"({result.size} bytes)"
+            )
+            yield result
+        finally:
+            self._running = False
+            Path(path).unlink(missing_ok=True)
+
+    def _get_directory(self) -> str:
+        if self._directory is None:
+            self._directory = tempfile.mkdtemp(prefix="bp-exports-")
+        return self._directory
+
+    def shutdown(self) -> None:
+        """Stop the export thread and remove export files."""
+        self.pool.shutdown()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
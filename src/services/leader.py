@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+
+from ..database.database import get_async_session
+from ..database.repositories import AsyncLeaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class LeaderLease:
+    """Holds a database lease so that one of several instances runs a singleton job.
+
+    The lease is renewed every third of its TTL. An instance considers itself the
+    leader only until its last successful renewal expires, measured from before
+    the renewal was sent, so it steps down before anyone else can take over.
+    """
+
+    def __init__(self, name: str, holder: str, ttl: float = 30.0):
+        self.name = name
+        self.holder = holder
+        self.ttl = ttl
+        self.renew_interval = ttl / 3
+        self._valid_until = 0.0
+        self._changed = asyncio.Event()
+
+    @property
+    def is_leader(self) -> bool:
+        return time.monotonic() < self._valid_until
+
+    async def run(self) -> None:
+        """Take and renew the lease until cancelled."""
+        while True:
+            requested_at = time.monotonic()
+            try:
+                async with get_async_session() as session:
+                    acquired = await AsyncLeaseRepository(session).acquire(
+                        self.name, self.holder, self.ttl
+                    )
+            except Exception as e:
+                logger.error(f"Error renewing lease {self.name}: {e}")
+                acquired = False
+
+            # A lease that is not renewed simply runs out; wait_lost() notices that
+            if acquired:
+                was_leader = self.is_leader
+                self._valid_until = requested_at + self.ttl
+                if not was_leader:
+                    self._changed.set()
+            await asyncio.sleep(self.renew_interval)
+
+    async def wait_acquired(self) -> None:
+        """Wait until this instance holds the lease."""
+        while not self.is_leader:
+            self._changed.clear()
+            await self._changed.wait()
+
+    async def wait_lost(self) -> None:
+        """Wait until this instance no longer holds the lease."""
+        while self.is_leader:
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(
+                    self._changed.wait(), max(0.0, self._valid_until - time.monotonic())
+                )
+            except TimeoutError:
+                pass
+
+    async def release(self) -> None:
+        """Hand the lease over so another instance need not wait for it to expire."""
+        self._valid_until = 0.0
+        try:
+            async with get_async_session() as session:
+                await AsyncLeaseRepository(session).release(self.name, self.holder)
+        except Exception as e:
+            logger.error(f"Error releasing lease {self.name}: {e}")
@@ -0,0 +1,142 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime
+
+from ..database.database import get_async_session
+from ..database.models import Measurement
+from ..database.repositories import get_async_repositories
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+measurement_batch_size = registry.histogram(
+    "bp_measurement_batch_size",
+    "Readings committed per write-behind batch.",
+    buckets=(1, 2, 5, 10, 50, 100, 500),
+)
+measurement_flush_seconds = registry.histogram(
+    "bp_measurement_flush_seconds", "Time to commit one write-behind batch."
+)
+measurement_failed_batches = registry.counter(
+    "bp_measurement_failed_batches_total", "Write-behind batches that failed to commit."
+)
+
+Reading = tuple[int, int, int, datetime]
+
+
+@dataclass
+class WriterStats:
+    """Batch size and flush latency totals, for tests and the shutdown log."""
+
+    batches: int = 0
+    measurements: int = 0
+    failed_batches: int = 0
+    max_batch_size: int = 0
+    flush_seconds: float = 0.0
+    max_flush_seconds: float = 0.0
+
+    def record(self, size: int, seconds: float) -> None:
+        """Account for one committed batch."""
+        self.batches += 1
+        self.measurements += size
+        self.max_batch_size = max(self.max_batch_size, size)
+        self.flush_seconds += seconds
+        self.max_flush_seconds = max(self.max_flush_seconds, seconds)
+
+    @property
+    def avg_batch_size(self) -> float:
+        return self.measurements / self.batches if self.batches else 0.0
+
+    @property
+    def avg_flush_seconds(self) -> float:
+        return self.flush_seconds / self.batches if self.batches else 0.0
+
+
+class MeasurementWriter:
+    """Write-behind buffer that commits measurements in batches.
+
+    Readings arriving within ``max_delay`` seconds of each other share one
+    multi-row INSERT and one commit. ``write`` only returns once the reading's
+    batch is committed, so a user is never acknowledged for a lost reading.
+    """
+
+    def __init__(self, max_delay: float = 0.005, max_batch: int = 500):
+        self.max_delay = max_delay
+        self.max_batch = max_batch
+        self.stats = WriterStats()
+        self._pending: list[tuple[Reading, asyncio.Future[Measurement]]] = []
+        self._batch_full = asyncio.Event()
+        self._flusher: asyncio.Task | None = None
+
+    async def write(
+        self, user_id: int, systolic: int, diastolic: int, measured_at: datetime | None = None
+    ) -> Measurement:
+        """Queue a reading and wait until its batch is committed."""
+        future = asyncio.get_running_loop().create_future()
+        reading = (user_id, systolic, diastolic, measured_at or datetime.utcnow())
+        self._pending.append((reading, future))
+
+        if len(self._pending) >= self.max_batch:
+            self._batch_full.set()
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_pending())
+
+        # Shield so that a cancelled handler does not drop a reading that is being written
+        return await asyncio.shield(future)
+
+    async def _flush_pending(self) -> None:
+        while self._pending:
+            if len(self._pending) < self.max_batch:
+                try:
+                    await asyncio.wait_for(self._batch_full.wait(), self.max_delay)
+                except TimeoutError:
+                    pass
+
+            batch = self._pending[: self.max_batch]
+            del self._pending[: self.max_batch]
+            if len(self._pending) < self.max_batch:
+                self._batch_full.clear()
+
+            await self._flush(batch)
+
+    async def _flush(self, batch: list[tuple[Reading, asyncio.Future[Measurement]]]) -> None:
+        started = time.perf_counter()
+        try:
+            async with get_async_session() as session:
+                _, measurement_repo = get_async_repositories(session)
+                measurements = await measurement_repo.create_measurements(
+                    reading for reading, _ in batch
+                )
+        except Exception as e:
+            self.stats.failed_batches += 1
+            measurement_failed_batches.inc()
+            logger.error(f"Failed to write batch of {len(batch)} measurements: {e}")
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        elapsed = time.perf_counter() - started
+        self.stats.record(len(batch), elapsed)
+        measurement_batch_size.observe(len(batch))
+        measurement_flush_seconds.observe(elapsed)
+        logger.debug(f"Committed {len(batch)} measurements in {elapsed * 1000:.1f} ms")
+
+        for (_, future), measurement in zip(batch, measurements, strict=True):
+            if not future.done():
+                future.set_result(measurement)
+
+    async def close(self) -> None:
+        """Flush readings that are still buffered."""
+        if self._flusher is not None:
+            self._batch_full.set()
+            await self._flusher
+            self._flusher = None
+        logger.info(
+            f"Measurement writer: {self.stats.measurements} readings in "
+            f"{self.stats.batches} batches (avg {self.stats.avg_batch_size:.1f}, "
+            f"max {self.stats.max_batch_size}), avg flush "
+            f"{self.stats.avg_flush_seconds * 1000:.1f} ms"
+        )
@@ -0,0 +1,205 @@
+import asyncio
+import logging
+import time
+from collections.abc import Iterable
+from datetime import datetime, timedelta
+
+from ..database.database import get_async_session
+from ..database.repositories import AsyncReminderOutboxRepository, ReminderOutboxRepository
+from .broadcaster import Broadcaster, BroadcastResult, DeliveryStatus
+from .cache import LRUCache
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+REMINDER_MESSAGE = "🩺 Время измерить артериальное давление!"
+
+reminder_deliveries = registry.counter(
+    "bp_reminder_deliveries_total", "Reminder delivery attempts by outcome.", ["outcome"]
+)
+outbox_batch_seconds = registry.histogram(
+    "bp_reminder_outbox_batch_seconds", "Time to send one claimed batch of reminders."
+)
+outbox_pending = registry.gauge(
+    "bp_reminder_outbox_pending", "Reminders waiting in the outbox at the last check."
+)
+
+
+class ReminderOutbox:
+    """Delivers reminders through the durable reminder_deliveries table.
+
+    Slots are written to the outbox first and then drained in batches by a pool
+    of concurrent senders, so a restart resumes with whatever is still pending.
+    Transient failures are retried with exponential back-off. Users whose chat is
+    unreachable, or whose reminders failed ``deactivate_after`` times in a row, are
+    marked inactive and skipped in later slots. Users whose delivery failed are
+    evicted from ``active_users``, the cache of senders known to be active.
+    """
+
+    def __init__(
+        self,
+        broadcaster: Broadcaster,
+        batch_size: int = 100,
+        lease: float = 300.0,
+        max_attempts: int = 4,
+        retry_delay: float = 30.0,
+        retention: timedelta = timedelta(days=7),
+        poll_interval: float = 5.0,
+        deactivate_after: int = 3,
+        active_users: LRUCache[int, bool] | None = None,
+    ):
+        self.broadcaster = broadcaster
+        self.batch_size = batch_size
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self.retention = retention
+        self.poll_interval = poll_interval
+        self.deactivate_after = deactivate_after
+        self.active_users = active_users
+        # Counters of the current drain, from the first claimed batch until the outbox is empty
+        self.result: BroadcastResult | None = None
+        self._wakeup = asyncio.Event()
+        self._pruned_at: datetime | None = None
+
+    async def enqueue(
+        self, slot_at: datetime, telegram_ids: Iterable[int] = (), include_default: bool = False
+    ) -> int:
+        """Write a slot's reminders to the outbox and wake the senders."""
+        async with get_async_session() as session:
+            queued = await AsyncReminderOutboxRepository(session).enqueue(
+                slot_at, telegram_ids, include_default
+            )
+        self._wakeup.set()
+        return queued
+
+    def wake(self) -> None:
+        """Check the outbox now instead of at the next poll."""
+        self._wakeup.set()
+
+    async def run(self) -> None:
+        """Drain the outbox until cancelled."""
+        while True:
+            self._wakeup.clear()
+            try:
+                delivered = await self.drain_once()
+            except Exception as e:
+                logger.error(f"Error draining reminder outbox: {e}")
+                delivered = 0
+
+            if delivered:
+                continue
+
+            self._log_round()
+            await self._update_pending()
+            await self._prune()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+            except TimeoutError:
+                pass
+
+    async def drain_once(self) -> int:
+        """Claim and deliver one batch of due reminders; returns the batch size."""
+        async with get_async_session() as session:
+            claimed = await AsyncReminderOutboxRepository(session).claim(
+                self.batch_size, self.lease
+            )
+        if not claimed:
+            return 0
+        if self.result is None:
+            self.result = BroadcastResult()
+
+        started = time.perf_counter()
+        slots = asyncio.Semaphore(self.broadcaster.concurrency)
+
+        async def send(delivery_id: int, telegram_id: int, attempt: int) -> dict:
+            async with slots:
+                delivery = await self.broadcaster.deliver(
+                    telegram_id, REMINDER_MESSAGE, self.result
+                )
+            return self._outcome(delivery_id, attempt, delivery.status, delivery.error)
+
+        outcomes = await asyncio.gather(*(send(*claim) for claim in claimed))
+        outbox_batch_seconds.observe(time.perf_counter() - started)
+
+        async with get_async_session() as session:
+            await AsyncReminderOutboxRepository(session).complete(outcomes, self.deactivate_after)
+
+        if self.active_users is not None:
+            failed = (ReminderOutboxRepository.FAILED, ReminderOutboxRepository.BLOCKED)
+            for (_, telegram_id, _), outcome in zip(claimed, outcomes, strict=True):
+                if outcome["status"] in failed:
+                    self.active_users.invalidate(telegram_id)
+        return len(claimed)
+
+    def _outcome(
+        self, delivery_id: int, attempt: int, status: DeliveryStatus, error: str | None
+    ) -> dict:
+        """Row update for a delivery attempt."""
+        now = datetime.utcnow()
+        outcome = {
+            "id": delivery_id,
+            "status": ReminderOutboxRepository.PENDING,
+            "next_attempt_at": now,
+            "last_error": error[:255] if error else None,
+            "sent_at": None,
+        }
+
+        if status is DeliveryStatus.SENT:
+            self.result.sent += 1
+            reminder_deliveries.inc(outcome="sent")
+            outcome.update(status=ReminderOutboxRepository.SENT, sent_at=now)
+        elif status is DeliveryStatus.BLOCKED:
+            self.result.failed += 1
+            self.result.blocked += 1
+            reminder_deliveries.inc(outcome="blocked")
+            outcome["status"] = ReminderOutboxRepository.BLOCKED
+        elif status is DeliveryStatus.RETRY and attempt < self.max_attempts:
+            self.result.retried += 1
+            reminder_deliveries.inc(outcome="retry")
+            outcome["next_attempt_at"] = now + timedelta(
+                seconds=self.retry_delay * 2 ** (attempt - 1)
+            )
+        else:
+            self.result.failed += 1
+            reminder_deliveries.inc(outcome="failed")
+            outcome["status"] = ReminderOutboxRepository.FAILED
+        return outcome
+
+    def _log_round(self) -> None:
+        """Log and reset the counters once the outbox runs dry."""
+        result = self.result
+        if result is None:
+            return
+
+        result.duration = time.monotonic() - result.started_at
+        logger.info(
+            f"Reminder outbox drained: sent {result.sent}, failed: {result.failed} "
+            f"(blocked: {result.blocked}), retries scheduled: {result.retried}, "
+            f"flood waits: {result.flood_waits}; {result.throughput:.1f} msg/s"
+        )
+        self.result = None
+
+    async def _update_pending(self) -> None:
+        """Publish the outbox backlog once it stops draining."""
+        try:
+            async with get_async_session() as session:
+                outbox_pending.set(await AsyncReminderOutboxRepository(session).count_pending())
+        except Exception as e:
+            logger.error(f"Error counting pending reminders: {e}")
+
+    async def _prune(self) -> None:
+        """Drop finished deliveries past the retention period, at most once an hour."""
+        now = datetime.utcnow()
+        if self._pruned_at is not None and now - self._pruned_at < timedelta(hours=1):
+            return
+        self._pruned_at = now
+
+        try:
+            async with get_async_session() as session:
+                deleted = await AsyncReminderOutboxRepository(session).prune(now - self.retention)
+        except Exception as e:
+            logger.error(f"Error pruning reminder outbox: {e}")
+            return
+        if deleted:
+            logger.info(f"Pruned {deleted} finished reminder deliveries")
@@ -0,0 +1,123 @@
+import itertools
+import logging
+import os
+import shutil
+import tempfile
+from collections import OrderedDict
+from collections.abc import Hashable
+from pathlib import Path
+
+from .metrics import registry
+
+logger = logging.getLogger(__name__)
+
+report_cache_requests = registry.counter(
+    "bp_report_cache_requests_total", "Report cache lookups by outcome.", ["result"]
+)
+report_cache_bytes = registry.gauge("bp_report_cache_bytes", "Size of the cached report files.")
+
+
+def link_file(source: str | Path, target: str | Path) -> None:
+    """Give a file a second name, copying it where the file system has no hard links."""
+    try:
+        os.link(source, target)
+    except OSError:
+        shutil.copyfile(source, target)
+
+
+class ReportCache:
+    """Generated report files, valid while the user's measurements version is unchanged.
+
+    Keys identify a report, such as a (user_id, format) pair; each key holds one
+    version, so storing a newer report replaces the old one. Reports stay on disk,
+    up to ``max_bytes`` in total, least recently used first out, and are never read
+    into memory: a stored report is a hard link to the generated file.
+    """
+
+    def __init__(self, max_bytes: int, directory: str | None = None):
+        self.max_bytes = max_bytes
+        # Where report files are created; generate them here so linking them is free
+        self.directory = directory
+        self.hits = 0
+        self.misses = 0
+        # key -> (version, size, measurement count, file)
+        self._entries: OrderedDict[Hashable, tuple[int, int, int, Path]] = OrderedDict()
+        self._bytes = 0
+        self._file_names = itertools.count()
+        # A private directory, so instances sharing one never see each other's files
+        self._path = Path(tempfile.mkdtemp(prefix="reports-", dir=directory))
+
+    def get(self, key: Hashable, version: int) -> tuple[Path, int] | None:
+        """The cached (file, measurement count) of this version of a report.
+
+        A later ``set`` may evict the file, so link it elsewhere before a slow read.
+        """
+        entry = self._entries.get(key)
+        if entry is None or entry[0] != version:
+            self.misses += 1
+            report_cache_requests.inc(result="miss")
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        report_cache_requests.inc(result="hit")
+        return entry[3], entry[2]
+
+    def set(
+        self, key: Hashable, version: int, path: str, size: int, measurement_count: int
+    ) -> None:
+        """Store a report file, replacing any other version of it; the caller keeps its file."""
+        self.invalidate(key)
+        if size > self.max_bytes:
+            return
+
+        target = self._path / f"{next(self._file_names)}.report"
+        try:
+            link_file(path, target)
+        except OSError as e:
+            logger.warning(f"Error caching report {key}: {e}")
+            return
+
+        self._entries[key] = (version, size, measurement_count, target)
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+        self._update_gauges()
+
+    def invalidate(self, key: Hashable) -> None:
+        """Forget a report."""
+        self._drop(key)
+        self._update_gauges()
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> dict[str, float]:
+        """Counters and sizes for logs and diagnostics."""
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hit_rate,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+        }
+
+    def close(self) -> None:
+        """Remove the cached reports."""
+        shutil.rmtree(self._path, ignore_errors=True)
+        self._entries.clear()
+        self._bytes = 0
+        self._update_gauges()
+
+    def _drop(self, key: Hashable) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry[1]
+        entry[3].unlink(missing_ok=True)
+
+    def _update_gauges(self) -> None:
+        report_cache_bytes.set(self._bytes)
@@ -1,99 +1,333 @@
+import csv
+import gzip
 import io
+from collections.abc import Iterable, Iterator
 from datetime import datetime
+from itertools import islice
+from typing import TextIO
 
-import pandas as pd
+from ..database.models import DailyMeasurementStats, ExportRow, Measurement, MeasurementRow
 
-from ..database.models import Measurement
+# Reports only read systolic, diastolic and measured_at, so plain rows work as well
+MeasurementData = Measurement | MeasurementRow
+
+CSV_HEADERS = ["Date", "Time", "Systolic (mmHg)", "Diastolic (mmHg)", "Reading", "Category"]
+EXPORT_HEADERS = ["Telegram ID", *CSV_HEADERS]
+
+# Number of measurement rows buffered before a chunk is yielded
+CHUNK_ROWS = 1000
+
+# File formats reports can be written in, named by their extension
+REPORT_FORMATS = ("csv", "csv.gz", "parquet")
+
+# Measurement rows per Parquet row group
+PARQUET_BATCH_ROWS = 16_384
+
+
+class ReportSummary:
+    """Summary statistics accumulated in a single pass over measurements."""
+
+    def __init__(self):
+        self.count = 0
+        self.systolic_sum = 0
+        self.diastolic_sum = 0
+        self.systolic_max = 0
+        self.diastolic_max = 0
+        self.systolic_min = 0
+        self.diastolic_min = 0
+        self.first: MeasurementData | None = None
+        self.earliest: datetime | None = None
+        self.latest: datetime | None = None
+
+    def add(self, measurement: MeasurementData) -> None:
+        """Include a measurement in the statistics."""
+        systolic = measurement.systolic
+        diastolic = measurement.diastolic
+        measured_at = measurement.measured_at
+
+        if self.count == 0:
+            self.first = measurement
+            self.systolic_max = self.systolic_min = systolic
+            self.diastolic_max = self.diastolic_min = diastolic
+            self.earliest = self.latest = measured_at
+        else:
+            self.systolic_max = max(self.systolic_max, systolic)
+            self.systolic_min = min(self.systolic_min, systolic)
+            self.diastolic_max = max(self.diastolic_max, diastolic)
+            self.diastolic_min = min(self.diastolic_min, diastolic)
+            self.earliest = min(self.earliest, measured_at)
+            self.latest = max(self.latest, measured_at)
+
+        self.count += 1
+        self.systolic_sum += systolic
+        self.diastolic_sum += diastolic
+
+    @classmethod
+    def from_daily_stats(cls, daily_stats: Iterable[DailyMeasurementStats]) -> "ReportSummary":
+        """Build the summary from daily rollups in O(days) instead of O(readings)."""
+        summary = cls()
+        for stats in daily_stats:
+            if summary.count == 0:
+                summary.systolic_min, summary.systolic_max = stats.systolic_min, stats.systolic_max
+                summary.diastolic_min = stats.diastolic_min
+                summary.diastolic_max = stats.diastolic_max
+                summary.earliest = stats.first_measured_at
+                summary.latest = stats.last_measured_at
+            else:
+                summary.systolic_min = min(summary.systolic_min, stats.systolic_min)
+                summary.systolic_max = max(summary.systolic_max, stats.systolic_max)
+                summary.diastolic_min = min(summary.diastolic_min, stats.diastolic_min)
+                summary.diastolic_max = max(summary.diastolic_max, stats.diastolic_max)
+                summary.earliest = min(summary.earliest, stats.first_measured_at)
+                summary.latest = max(summary.latest, stats.last_measured_at)
+
+            if summary.latest == stats.last_measured_at:
+                summary.first = MeasurementRow(
+                    stats.last_systolic, stats.last_diastolic, stats.last_measured_at
+                )
+
+            summary.count += stats.count
+            summary.systolic_sum += stats.systolic_sum
+            summary.diastolic_sum += stats.diastolic_sum
+
+        return summary
+
+    def as_dict(self) -> dict:
+        """Return the statistics in report order."""
+        if self.count == 0:
+            return {}
+
+        return {
+            "Average Systolic": f"{self.systolic_sum / self.count:.1f}",
+            "Average Diastolic": f"{self.diastolic_sum / self.count:.1f}",
+            "Highest Systolic": self.systolic_max,
+            "Highest Diastolic": self.diastolic_max,
+            "Lowest Systolic": self.systolic_min,
+            "Lowest Diastolic": self.diastolic_min,
+            "Most Recent Reading": f"{self.first.systolic}/{self.first.diastolic}",
+            "Most Recent Date": self.first.measured_at.strftime("%Y-%m-%d %H:%M"),
+            "Date Range (Days)": (
+                (self.latest.date() - self.earliest.date()).days if self.count >= 2 else 0
+            ),
+        }
+
+
+class ExportCounter:
+    """Counts readings and users while all-users export rows stream through."""
+
+    def __init__(self, rows: Iterable[ExportRow]):
+        self.rows = rows
+        self.measurements = 0
+        self.users = 0
+
+    def __iter__(self) -> Iterator[ExportRow]:
+        last_telegram_id = None
+        for row in self.rows:
+            # Rows come ordered by user, so each user starts where the ID changes
+            if row.telegram_id != last_telegram_id:
+                last_telegram_id = row.telegram_id
+                self.users += 1
+            self.measurements += 1
+            yield row
 
 
 class ReportGenerator:
     """Service for generating CSV reports from blood pressure measurements."""
 
-    def generate_csv_report(self, measurements: list[Measurement]) -> str:
+    def generate_csv_report(self, measurements: list[MeasurementData]) -> str:
         """Generate CSV report from measurements."""
         if not measurements:
             return self._empty_csv()
 
-        # Convert measurements to DataFrame
-        data = []
-        for measurement in measurements:
-            data.append(
-                {
-                    "Date": measurement.measured_at.strftime("%Y-%m-%d"),
-                    "Time": measurement.measured_at.strftime("%H:%M:%S"),
-                    "Systolic (mmHg)": measurement.systolic,
-                    "Diastolic (mmHg)": measurement.diastolic,
-                    "Reading": measurement.formatted_reading,
-                    "Category": self._get_bp_category(measurement.systolic, measurement.diastolic),
-                    "Timestamp": measurement.measured_at.isoformat(),
-                }
-            )
+        # Sort by date/time (most recent first)
+        ordered = sorted(measurements, key=lambda m: m.measured_at, reverse=True)
+        return "".join(self.iter_csv_report(ordered))
 
-        df = pd.DataFrame(data)
+    def write_csv_report(
+        self,
+        measurements: Iterable[MeasurementData],
+        output: TextIO,
+        summary: ReportSummary | None = None,
+    ) -> int:
+        """Write CSV report incrementally to output and return the number of measurements.
 
-        # Sort by date/time (most recent first)
-        df = df.sort_values("Timestamp", ascending=False)
+        A precomputed ``summary``, e.g. one built from daily rollups, is written as is
+        instead of being accumulated from the rows.
+        """
+        if summary is None:
+            chunks = self.iter_csv_report(measurements, summary := ReportSummary())
+        else:
+            chunks = self.iter_csv_report(measurements, summary, accumulate=False)
+        for chunk in chunks:
+            output.write(chunk)
+        return summary.count
 
-        # Drop the timestamp column from final output
-        df = df.drop("Timestamp", axis=1)
+    def write_report(
+        self,
+        measurements: Iterable[MeasurementData],
+        path: str,
+        report_format: str = "csv",
+        summary: ReportSummary | None = None,
+    ) -> int:
+        """Stream a report in one of REPORT_FORMATS to a file; returns the measurement count.
 
-        # Add summary statistics
-        summary_data = self._calculate_summary(measurements)
+        ``summary`` is a precomputed summary for CSV reports; Parquet reports have none.
+        """
+        if report_format == "csv":
+            with open(path, "w", encoding="utf-8", newline="") as output:
+                return self.write_csv_report(measurements, output, summary)
+        if report_format == "csv.gz":
+            with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as output:
+                return self.write_csv_report(measurements, output, summary)
+        if report_format == "parquet":
+            return self.write_parquet_report(measurements, path)
+        raise ValueError(f"Unknown report format: {report_format}")
 
-        # Convert to CSV string
-        csv_buffer = io.StringIO()
+    def write_export(
+        self, rows: Iterable[ExportRow], path: str, report_format: str = "csv.gz"
+    ) -> ExportCounter:
+        """Stream all users' readings, ordered by user, into one table in a REPORT_FORMATS file.
 
-        # Write measurements
-        df.to_csv(csv_buffer, index=False)
+        There is no summary section; the returned counter holds the totals.
+        """
+        counter = ExportCounter(rows)
+        if report_format == "csv":
+            with open(path, "w", encoding="utf-8", newline="") as output:
+                self._write_export_csv(counter, output)
+        elif report_format == "csv.gz":
+            with gzip.open(path, "wt", encoding="utf-8", newline="", compresslevel=6) as output:
+                self._write_export_csv(counter, output)
+        elif report_format == "parquet":
+            self.write_parquet_report(counter, path, with_telegram_id=True)
+        else:
+            raise ValueError(f"Unknown report format: {report_format}")
+        return counter
 
-        # Add summary section
-        csv_buffer.write("\n\nSUMMARY STATISTICS\n")
-        csv_buffer.write("Metric,Value\n")
+    def write_parquet_report(
+        self, measurements: Iterable[MeasurementData], path: str, with_telegram_id: bool = False
+    ) -> int:
+        """Write readings as a Parquet table, one row group at a time.
 
-        for key, value in summary_data.items():
-            csv_buffer.write(f"{key},{value}\n")
+        Holds a single row group in memory; the summary section of the CSV report is
+        left out, as any tool reading Parquet computes it directly.
+        """
+        # Imported here: pyarrow is large and only report workers need it
+        import pyarrow as pa
+        import pyarrow.parquet as pq
 
-        # Add generation info
-        csv_buffer.write(f'\nReport generated on,{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\n')
-        csv_buffer.write(f"Total measurements,{len(measurements)}\n")
+        fields = [
+            ("measured_at", pa.timestamp("us")),
+            ("systolic", pa.int16()),
+            ("diastolic", pa.int16()),
+            ("category", pa.string()),
+        ]
+        if with_telegram_id:
+            fields.insert(0, ("telegram_id", pa.int64()))
+        schema = pa.schema(fields)
 
-        return csv_buffer.getvalue()
+        count = 0
+        rows = iter(measurements)
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            while batch := list(islice(rows, PARQUET_BATCH_ROWS)):
+                systolic = [measurement.systolic for measurement in batch]
+                diastolic = [measurement.diastolic for measurement in batch]
+                columns = [
+                    [measurement.measured_at for measurement in batch],
+                    systolic,
+                    diastolic,
+                    list(map(self._get_bp_category, systolic, diastolic)),
+                ]
+                if with_telegram_id:
+                    columns.insert(0, [row.telegram_id for row in batch])
+                writer.write_batch(pa.record_batch(columns, schema=schema))
+                count += len(batch)
+        return count
 
-    def _empty_csv(self) -> str:
-        """Return empty CSV with headers."""
-        headers = ["Date", "Time", "Systolic (mmHg)", "Diastolic (mmHg)", "Reading", "Category"]
-        return ",".join(headers) + "\n"
+    def _write_export_csv(self, rows: Iterable[ExportRow], output: TextIO) -> None:
+        writer = csv.writer(output, lineterminator="\n")
+        writer.writerow(EXPORT_HEADERS)
+        for row in rows:
+            timestamp = row.measured_at.isoformat(" ")
+            writer.writerow(
+                (
+                    row.telegram_id,
+                    timestamp[:10],
+                    timestamp[11:19],
+                    row.systolic,
+                    row.diastolic,
+                    f"{row.systolic}/{row.diastolic}",
+                    self._get_bp_category(row.systolic, row.diastolic),
+                )
+            )
 
-    def _calculate_summary(self, measurements: list[Measurement]) -> dict:
-        """Calculate summary statistics for measurements."""
-        if not measurements:
-            return {}
+    def iter_csv_report(
+        self,
+        measurements: Iterable[MeasurementData],
+        summary: ReportSummary | None = None,
+        accumulate: bool = True,
+    ) -> Iterator[str]:
+        """Yield CSV report chunks for measurements ordered most recent first.
 
-        systolic_values = [m.systolic for m in measurements]
-        diastolic_values = [m.diastolic for m in measurements]
+        Rows are consumed lazily, so measurements can be streamed from the database.
+        Without ``accumulate``, ``summary`` already covers the rows and is not added to.
+        """
+        if summary is None:
+            summary = ReportSummary()
 
-        return {
-            "Average Systolic": f"{sum(systolic_values) / len(systolic_values):.1f}",
-            "Average Diastolic": f"{sum(diastolic_values) / len(diastolic_values):.1f}",
-            "Highest Systolic": max(systolic_values),
-            "Highest Diastolic": max(diastolic_values),
-            "Lowest Systolic": min(systolic_values),
-            "Lowest Diastolic": min(diastolic_values),
-            "Most Recent Reading": f"{measurements[0].systolic}/{measurements[0].diastolic}",
-            "Most Recent Date": measurements[0].measured_at.strftime("%Y-%m-%d %H:%M"),
-            "Date Range (Days)": self._calculate_date_range_days(measurements),
-        }
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(CSV_HEADERS)
 
-    def _calculate_date_range_days(self, measurements: list[Measurement]) -> int:
-        """Calculate the range of dates in days."""
-        if len(measurements) < 2:
-            return 0
+        rows = 0
+        for measurement in measurements:
+            # isoformat is "YYYY-MM-DD HH:MM:SS[.ffffff]"; slicing beats two strftime calls
+            timestamp = measurement.measured_at.isoformat(" ")
+            writer.writerow(
+                (
+                    timestamp[:10],
+                    timestamp[11:19],
+                    measurement.systolic,
+                    measurement.diastolic,
+                    f"{measurement.systolic}/{measurement.diastolic}",
+                    self._get_bp_category(measurement.systolic, measurement.diastolic),
+                )
+            )
+            if accumulate:
+                summary.add(measurement)
 
-        sorted_measurements = sorted(measurements, key=lambda m: m.measured_at)
-        first_date = sorted_measurements[0].measured_at.date()
-        last_date = sorted_measurements[-1].measured_at.date()
+            rows += 1
+            if rows % CHUNK_ROWS == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
 
-        return (last_date - first_date).days
+        if summary.count == 0:
+            yield buffer.getvalue()
+            return
+
+        # Add summary section
+        buffer.write("\n\nSUMMARY STATISTICS\n")
+        buffer.write("Metric,Value\n")
+
+        for key, value in summary.as_dict().items():
+            buffer.write(f"{key},{value}\n")
+
+        # Add generation info
+        buffer.write(f'\nReport generated on,{datetime.now().strftime("%Y-%m-%d %H:%M:%S")}\n')
+        buffer.write(f"Total measurements,{summary.count}\n")
+
+        yield buffer.getvalue()
+
+    def _empty_csv(self) -> str:
+        """Return empty CSV with headers."""
+        return ",".join(CSV_HEADERS) + "\n"
+
+    def _calculate_summary(self, measurements: Iterable[MeasurementData]) -> dict:
+        """Calculate summary statistics for measurements ordered most recent first."""
+        summary = ReportSummary()
+        for measurement in measurements:
+            summary.add(measurement)
+        return summary.as_dict()
 
     def _get_bp_category(self, systolic: int, diastolic: int) -> str:
         """Get blood pressure category based on AHA guidelines."""
@@ -0,0 +1,289 @@
+import asyncio
+import logging
+import os
+import shutil
+import tempfile
+import uuid
+from collections.abc import AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from ..database.database import EngineOptions, get_async_session
+from ..database.repositories import (
+    AsyncDailyStatsRepository,
+    DailyStatsRepository,
+    MeasurementRepository,
+    get_async_repositories,
+)
+from .metrics import registry
+from .report_cache import ReportCache, link_file
+from .report_generator import REPORT_FORMATS, ReportGenerator, ReportSummary
+from .workers import InFlight, WorkerPool, get_worker_database, share
+
+logger = logging.getLogger(__name__)
+
+# Report formats with a summary section, which is built from the daily rollups
+SUMMARY_FORMATS = ("csv", "csv.gz")
+
+report_seconds = registry.histogram(
+    "bp_report_seconds", "Time to generate a report, including the queue wait.", ["mode"]
+)
+report_bytes = registry.histogram(
+    "bp_report_bytes",
+    "Size of generated report files.",
+    buckets=(1e3, 1e4, 1e5, 1e6, 1e7, 5e7),
+)
+report_rows = registry.histogram(
+    "bp_report_rows",
+    "Measurements in generated reports.",
+    buckets=(10, 100, 1e3, 1e4, 1e5, 1e6),
+)
+reports_rejected = registry.counter(
+    "bp_reports_rejected_total", "Report requests turned away because the queue was full."
+)
+
+
+@dataclass
+class ReportResult:
+    """A report file, generated or linked from the cache."""
+
+    measurement_count: int
+    size: int
+    path: str
+
+
+class ReportQueueFullError(Exception):
+    """Raised when too many reports are already queued."""
+
+
+def build_user_report(
+    database_url: str,
+    user_id: int,
+    path: str,
+    report_format: str = "csv",
+    options: EngineOptions | None = None,
+) -> ReportResult:
+    """Stream a user's report to a file with a blocking database connection.
+
+    The CSV summary comes from the daily rollups, and only readings up to the latest
+    one they cover are written, so rows and summary agree. Runs in a pool worker, so
+    it must stay a picklable module-level function.
+    """
+    db = get_worker_database(database_url, options)
+
+    with db.get_session() as session:
+        summary = None
+        if report_format in SUMMARY_FORMATS:
+            daily_stats = DailyStatsRepository(session).get_user_daily_stats(user_id)
+            summary = ReportSummary.from_daily_stats(daily_stats)
+
+        if summary is not None and summary.count == 0:
+            rows = ()
+        else:
+            rows = MeasurementRepository(session).iter_user_measurement_rows(
+                user_id, until=summary and summary.latest
+            )
+        measurement_count = ReportGenerator().write_report(rows, path, report_format, summary)
+
+    return ReportResult(measurement_count, os.path.getsize(path), path=path)
+
+
+class ReportExecutor:
+    """Runs report generation off the event loop with a bounded queue.
+
+    Reports are streamed to temporary files, so memory use does not grow with the
+    history. Concurrent requests for the same report share a single in-flight job,
+    whose file is removed once the last of them is done with it. With a cache, a
+    report is generated again only once the user's measurements change; cached
+    reports stay on disk like generated ones.
+    """
+
+    def __init__(
+        self,
+        database_url: str,
+        mode: str = "thread",
+        workers: int = 2,
+        queue_size: int = 8,
+        engine_options: EngineOptions | None = None,
+        cache: ReportCache | None = None,
+    ):
+        self.pool = WorkerPool(mode, workers, "report")
+        self.database_url = database_url
+        self.mode = mode
+        self.workers = workers
+        self.queue_size = queue_size
+        self.engine_options = engine_options
+        self.cache = cache
+        self._slots: asyncio.Semaphore | None = None
+        self._directory: str | None = None
+        self._in_flight: InFlight[tuple[int, str], ReportResult] = InFlight()
+        # Requesters still using each job's result
+        self._holders: dict[asyncio.Future[ReportResult], int] = {}
+
+    @property
+    def is_busy(self) -> bool:
+        """Whether a new report would have to wait for a free worker."""
+        return len(self._in_flight) >= self.workers
+
+    def is_in_flight(self, user_id: int, report_format: str = "csv") -> bool:
+        """Whether a report for the user is already queued or running."""
+        return (user_id, report_format) in self._in_flight
+
+    @asynccontextmanager
+    async def report(
+        self,
+        user_id: int,
+        report_format: str = "csv",
+        on_wait: Callable[[], Awaitable[object]] | None = None,
+    ) -> AsyncIterator[ReportResult]:
+        """A user's report for the duration of the block, joining an in-flight job.
+
+        ``on_wait`` is awaited when the report has to be generated and will wait for a
+        job already running or for a free worker; never for a cached report.
+        """
+        if report_format not in REPORT_FORMATS:
+            raise ValueError(f"Unknown report format: {report_format}")
+
+        key = (user_id, report_format)
+        version = None
+        if self.cache is not None:
+            async with get_async_session() as session:
+                user_repo, _ = get_async_repositories(session)
+                version = await user_repo.get_measurements_version(user_id)
+            cached = self.cache.get(key, version) if version is not None else None
+            if cached is not None:
+                async with self._checkout(cached, user_id, report_format) as report:
+                    if report is not None:
+                        yield report
+                        return
+
+        job = self._in_flight.get(key)
+        waits = job is not None or self.is_busy
+        if job is None:
+            if len(self._in_flight) >= self.workers + self.queue_size:
+                reports_rejected.inc()
+                raise ReportQueueFullError(f"{len(self._in_flight)} reports already queued")
+
+            job = self._in_flight.start(key, lambda: self._run(user_id, report_format, version))
+
+        self._holders[job] = self._holders.get(job, 0) + 1
+        try:
+            if waits and on_wait is not None:
+                await on_wait()
+            yield await share(job)
+        finally:
+            self._release(job)
+
+    def _release(self, job: asyncio.Future[ReportResult]) -> None:
+        self._holders[job] -= 1
+        if self._holders[job]:
+            return
+        if job.done():
+            del self._holders[job]
+            self._remove_file(job)
+        else:
+            # Every requester went away early; clean up once the job finishes
+            job.add_done_callback(self._remove_unheld_file)
+
+    def _remove_unheld_file(self, job: asyncio.Future[ReportResult]) -> None:
+        if self._holders.get(job) == 0:
+            del self._holders[job]
+            self._remove_file(job)
+
+    @staticmethod
+    def _remove_file(job: asyncio.Future[ReportResult]) -> None:
+        if not job.cancelled() and job.exception() is None:
+            Path(job.result().path).unlink(missing_ok=True)
+
+    @asynccontextmanager
+    async def _checkout(
+        self, cached: tuple[Path, int], user_id: int, report_format: str
+    ) -> AsyncIterator[ReportResult | None]:
+        """A cached report under a name of its own, which outlives an eviction meanwhile."""
+        cached_path, measurement_count = cached
+        path = self._new_path(user_id, report_format)
+        try:
+            await asyncio.to_thread(link_file, cached_path, path)
+        except OSError as e:
+            logger.warning(f"Error reading cached report of user {user_id}: {e}")
+            self.cache.invalidate((user_id, report_format))
+            yield None
+            return
+        try:
+            yield ReportResult(measurement_count, os.path.getsize(path), path)
+        finally:
+            Path(path).unlink(missing_ok=True)
+
+    def _new_path(self, user_id: int, report_format: str) -> str:
+        return os.path.join(self._get_directory(), f"{user_id}-{uuid.uuid4().hex}.{report_format}")
+
+    async def _run(self, user_id: int, report_format: str, version: int | None) -> ReportResult:
+        path = self._new_path(user_id, report_format)
+        try:
+            with report_seconds.time(mode=self.mode):
+                result = await self._generate(user_id, report_format, path)
+        except BaseException:
+            Path(path).unlink(missing_ok=True)
+            raise
+        report_bytes.observe(result.size)
+        report_rows.observe(result.measurement_count)
+
+        # The version was read before generating: a reading added meanwhile only makes
+        # this entry miss
+        if self.cache is not None and version is not None:
+            self.cache.set(
+                (user_id, report_format), version, path, result.size, result.measurement_count
+            )
+        return result
+
+    async def _generate(self, user_id: int, report_format: str, path: str) -> ReportResult:
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+
+        async with self._slots:
+            if self.mode == "inline":
+                return await self._run_inline(user_id, report_format, path)
+
+            return await self.pool.run(
+                build_user_report,
+                self.database_url,
+                user_id,
+                path,
+                report_format,
+                self.engine_options,
+            )
+
+    async def _run_inline(self, user_id: int, report_format: str, path: str) -> ReportResult:
+        """Generate the report with the application's own session."""
+        generator = ReportGenerator()
+        async with get_async_session() as session:
+            summary = None
+            if report_format in SUMMARY_FORMATS:
+                daily_stats = await AsyncDailyStatsRepository(session).get_user_daily_stats(user_id)
+                summary = ReportSummary.from_daily_stats(daily_stats)
+
+            if summary is not None and summary.count == 0:
+                measurement_count = generator.write_report((), path, report_format, summary)
+            else:
+                _, measurement_repo = get_async_repositories(session)
+                measurement_count = await measurement_repo.stream_user_measurement_rows(
+                    user_id,
+                    lambda rows: generator.write_report(rows, path, report_format, summary),
+                    until=summary and summary.latest,
+                )
+        return ReportResult(measurement_count, os.path.getsize(path), path=path)
+
+    def _get_directory(self) -> str:
+        if self._directory is None:
+            # Next to the cache, so caching a report is a hard link rather than a copy
+            directory = self.cache.directory if self.cache is not None else None
+            self._directory = tempfile.mkdtemp(prefix="bp-reports-", dir=directory)
+        return self._directory
+
+    def shutdown(self) -> None:
+        """Stop the worker pool and remove report files."""
+        self.pool.shutdown()
+        if self._directory is not None:
+            shutil.rmtree(self._directory, ignore_errors=True)
+            self._directory = None
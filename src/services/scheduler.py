@@ -1,121 +1,398 @@
 import asyncio
+import heapq
 import logging
-from datetime import datetime, time, timedelta, timezone
+from collections.abc import Iterable
+from dataclasses import dataclass
+from datetime import UTC, datetime, time, timedelta
+from zoneinfo import ZoneInfo
 
 from aiogram import Bot
 
 from ..config.settings import settings
-from ..database.database import get_database
-from ..database.repositories import get_repositories
+from ..database.database import get_async_session
+from ..database.repositories import get_async_repositories
+from .broadcaster import Broadcaster
+from .cache import LRUCache
+from .leader import LeaderLease
+from .metrics import registry
+from .outbox import ReminderOutbox
 
 logger = logging.getLogger(__name__)
 
+# A reminder slot: local reminder time in an IANA time zone, shared by every user on it
+Slot = tuple[str, time]
+
+# Upper bound on a single sleep, so wall-clock adjustments are picked up
+MAX_SLEEP = 60.0
+
+scheduler_drift_seconds = registry.histogram(
+    "bp_scheduler_drift_seconds", "How late the reminder timer woke up for a due slot."
+)
+slot_lateness_seconds = registry.histogram(
+    "bp_reminder_slot_lateness_seconds",
+    "Delay between a slot falling due and its reminders queued.",
+)
+reminders_queued = registry.counter(
+    "bp_reminders_queued_total", "Reminders written to the delivery outbox."
+)
+
+# Most reminder times a user can set; users.reminder_times holds up to 255 characters
+MAX_REMINDER_TIMES = 24
+
+
+def parse_reminder_times(value: str) -> list[time]:
+    """Parse comma- or space-separated "HH:MM" times, raising ValueError on bad input."""
+    times = set()
+    for part in value.replace(",", " ").split():
+        hour, minute = map(int, part.split(":"))
+        times.add(time(hour, minute))
+    if not times:
+        raise ValueError("No reminder times given")
+    return sorted(times)
+
+
+def format_reminder_times(times: Iterable[time]) -> str:
+    """Format times as "HH:MM, HH:MM"."""
+    return ", ".join(t.strftime("%H:%M") for t in sorted(times))
+
+
+def next_occurrence(slot: Slot, after: datetime) -> datetime:
+    """Next UTC instant strictly after ``after`` at which the slot's local time occurs."""
+    timezone_name, local_time = slot
+    tz = ZoneInfo(timezone_name)
+    local_now = after.astimezone(tz)
+    candidate = datetime.combine(local_now.date(), local_time, tzinfo=tz)
+    if candidate <= local_now:
+        candidate = datetime.combine(local_now.date() + timedelta(days=1), local_time, tzinfo=tz)
+    return candidate.astimezone(UTC)
+
+
+class ReminderSchedule:
+    """Reminder slots ordered by their next due time in a heap.
+
+    Users without a personal schedule are not held in memory: the default slots
+    are queued for those users with a single query. Users with a
+    personal time zone or times are kept as members of their slots.
+    """
+
+    def __init__(self, default_timezone: str, default_times: Iterable[time]):
+        self.default_timezone = default_timezone
+        self.default_times = sorted(default_times)
+        self.default_slots: set[Slot] = {(default_timezone, t) for t in self.default_times}
+        self.members: dict[Slot, set[int]] = {}
+        self._user_slots: dict[int, set[Slot]] = {}
+        self._heap: list[tuple[datetime, Slot]] = []
+        self._scheduled: set[Slot] = set()
+
+    def user_slots(self, timezone: str | None, reminder_times: str | None) -> set[Slot]:
+        """Effective slots of a user, falling back to the defaults."""
+        times = parse_reminder_times(reminder_times) if reminder_times else self.default_times
+        return {(timezone or self.default_timezone, t) for t in times}
+
+    def set_user(
+        self, telegram_id: int, timezone: str | None, reminder_times: str | None, now: datetime
+    ) -> None:
+        """Move a user to the slots of their (possibly reset) personal schedule."""
+        for slot in self._user_slots.pop(telegram_id, ()):
+            members = self.members[slot]
+            members.discard(telegram_id)
+            if not members:
+                del self.members[slot]
+
+        if timezone is None and reminder_times is None:
+            return
+
+        slots = self.user_slots(timezone, reminder_times)
+        self._user_slots[telegram_id] = slots
+        for slot in slots:
+            self.members.setdefault(slot, set()).add(telegram_id)
+            self.schedule(slot, now)
+
+    def user_ids(self) -> set[int]:
+        """Users with a personal schedule."""
+        return set(self._user_slots)
+
+    def clear(self) -> None:
+        """Forget every user and queued slot."""
+        self.members.clear()
+        self._user_slots.clear()
+        self._heap.clear()
+        self._scheduled.clear()
+
+    def schedule(self, slot: Slot, now: datetime) -> None:
+        """Queue the slot's next occurrence unless it is already queued."""
+        if slot not in self._scheduled:
+            self._scheduled.add(slot)
+            heapq.heappush(self._heap, (next_occurrence(slot, now), slot))
+
+    def next_due(self) -> datetime | None:
+        """When the earliest queued slot is due."""
+        return self._heap[0][0] if self._heap else None
+
+    def pop_due(self, now: datetime) -> list[tuple[datetime, Slot]]:
+        """Take every slot due by ``now`` and queue the next occurrence of those still in use."""
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            due_at, slot = heapq.heappop(self._heap)
+            self._scheduled.discard(slot)
+            if slot in self.default_slots or slot in self.members:
+                due.append((due_at, slot))
+                self.schedule(slot, now)
+        return due
+
+    def __len__(self) -> int:
+        return len(self._user_slots)
+
+
+@dataclass
+class SchedulerStats:
+    """Timer accuracy: drift is how late the scheduler woke up, lateness how late slots went out."""
+
+    wakeups: int = 0
+    slots_dispatched: int = 0
+    drift_total: float = 0.0
+    max_drift: float = 0.0
+    lateness_total: float = 0.0
+    max_lateness: float = 0.0
+
+    def record_wakeup(self, drift: float) -> None:
+        self.wakeups += 1
+        self.drift_total += drift
+        self.max_drift = max(self.max_drift, drift)
+
+    def record_dispatch(self, lateness: float) -> None:
+        self.slots_dispatched += 1
+        self.lateness_total += lateness
+        self.max_lateness = max(self.max_lateness, lateness)
+
+    @property
+    def avg_drift(self) -> float:
+        return self.drift_total / self.wakeups if self.wakeups else 0.0
+
+    @property
+    def avg_lateness(self) -> float:
+        return self.lateness_total / self.slots_dispatched if self.slots_dispatched else 0.0
+
 
 class ReminderScheduler:
-    """Service for scheduling and sending blood pressure measurement reminders."""
+    """Service for scheduling and sending blood pressure measurement reminders.
+
+    A single timer waits for the earliest due slot in the schedule heap and
+    writes the reminders of every slot due at that moment to the outbox, which
+    delivers them in the background.
 
-    def __init__(self, bot: Bot):
+    With a ``lease``, several bot instances may run a scheduler but only the
+    lease holder dispatches reminders. Dispatch includes draining the outbox, so
+    the bot-wide Telegram rate limit is enforced in one place. Personal
+    schedules changed through other instances are picked up by reloading them
+    every ``schedule_refresh`` seconds. ``active_users`` is handed to the outbox.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        lease: LeaderLease | None = None,
+        schedule_refresh: float = 60.0,
+        active_users: LRUCache[int, bool] | None = None,
+    ):
         self.bot = bot
+        self.lease = lease
+        self.schedule_refresh = schedule_refresh
         self.running = False
-        # MSK timezone (UTC+3)
-        self.msk_tz = timezone(timedelta(hours=3))
+        self.broadcaster = Broadcaster(
+            bot,
+            rate_limit=settings.broadcast_rate_limit,
+            concurrency=settings.broadcast_concurrency,
+            max_retries=settings.broadcast_max_retries,
+        )
+        self.outbox = ReminderOutbox(
+            self.broadcaster,
+            batch_size=settings.outbox_batch_size,
+            lease=settings.outbox_lease,
+            max_attempts=settings.broadcast_max_retries + 1,
+            retry_delay=settings.outbox_retry_delay,
+            retention=timedelta(days=settings.outbox_retention_days),
+            deactivate_after=settings.inactive_after_failures,
+            active_users=active_users,
+        )
+        self.schedule = ReminderSchedule(settings.reminder_timezone, self._default_times())
+        self.stats = SchedulerStats()
+        self._changed = asyncio.Event()
+        self._dispatches: set[asyncio.Task] = set()
+        self._loaded_at: datetime | None = None
+
+    @staticmethod
+    def _default_times() -> list[time]:
+        times = []
+        for reminder_time in settings.reminder_times:
+            try:
+                times.extend(parse_reminder_times(reminder_time))
+            except ValueError:
+                logger.error(f"Invalid reminder time format: {reminder_time}")
+        return times
+
+    @staticmethod
+    def _now() -> datetime:
+        return datetime.now(UTC)
 
     async def start(self) -> None:
         """Start the reminder scheduler."""
         self.running = True
-        logger.info("Reminder scheduler started")
+        if self.lease is None:
+            try:
+                await self._dispatch()
+            except asyncio.CancelledError:
+                logger.info("Reminder scheduler cancelled")
+            return
 
-        # Create tasks for each reminder time
-        tasks = []
-        for reminder_time in settings.reminder_times:
-            task = asyncio.create_task(self._schedule_daily_reminder(reminder_time))
-            tasks.append(task)
+        renewal = asyncio.create_task(self.lease.run())
+        try:
+            while self.running:
+                await self.lease.wait_acquired()
+                logger.info(f"Instance {self.lease.holder} took over reminder dispatch")
+                # Slots that fell due while nobody held the lease are sent late rather than
+                # skipped; the outbox ignores reminders the previous holder already queued
+                dispatch = asyncio.create_task(self._dispatch(catch_up=self.lease.ttl))
+                lost = asyncio.create_task(self.lease.wait_lost())
+                await asyncio.wait({dispatch, lost}, return_when=asyncio.FIRST_COMPLETED)
+                for task in (dispatch, lost):
+                    task.cancel()
+                await asyncio.gather(dispatch, lost, return_exceptions=True)
+                if self.running:
+                    logger.warning(f"Instance {self.lease.holder} lost reminder dispatch")
+        except asyncio.CancelledError:
+            logger.info("Reminder scheduler cancelled")
+        finally:
+            renewal.cancel()
+            await asyncio.gather(renewal, return_exceptions=True)
+            await self.lease.release()
+
+    async def _dispatch(self, catch_up: float = 0.0) -> None:
+        """Run the timer and the outbox senders until stopped or cancelled."""
+        since = self._now() - timedelta(seconds=catch_up)
+        self.schedule.clear()
+        for slot in self.schedule.default_slots:
+            self.schedule.schedule(slot, since)
+        await self._load_user_schedules(since)
 
-        # Wait for all tasks (they run forever until stopped)
-        await asyncio.gather(*tasks, return_exceptions=True)
+        logger.info(
+            f"Reminder scheduler started: {format_reminder_times(self.schedule.default_times)} "
+            f"({self.schedule.default_timezone}) by default, "
+            f"{len(self.schedule)} personal schedules"
+        )
+
+        # Deliveries left pending by a previous run are picked up straight away
+        outbox = asyncio.create_task(self.outbox.run())
+        try:
+            await self._run()
+        finally:
+            outbox.cancel()
+            await asyncio.gather(outbox, return_exceptions=True)
 
     def stop(self) -> None:
         """Stop the reminder scheduler."""
         self.running = False
+        self._changed.set()
         logger.info("Reminder scheduler stopped")
 
-    async def _schedule_daily_reminder(self, reminder_time: str) -> None:
-        """Schedule daily reminders for a specific time."""
-        try:
-            hour, minute = map(int, reminder_time.split(":"))
-            target_time = time(hour, minute)
-        except ValueError:
-            logger.error(f"Invalid reminder time format: {reminder_time}")
-            return
-
-        logger.info(f"Scheduled daily reminder for {reminder_time} MSK")
+    def update_user(
+        self, telegram_id: int, timezone: str | None, reminder_times: str | None
+    ) -> None:
+        """Apply a user's changed reminder schedule."""
+        self.schedule.set_user(telegram_id, timezone, reminder_times, self._now())
+        self._changed.set()
 
-        while self.running:
-            # Get current time in MSK
-            now_msk = datetime.now(self.msk_tz)
-
-            # Create target datetime in MSK
-            target_datetime_msk = datetime.combine(now_msk.date(), target_time, tzinfo=self.msk_tz)
-
-            # If target time has passed today, schedule for tomorrow
-            if target_datetime_msk <= now_msk:
-                tomorrow_msk = now_msk.date() + timedelta(days=1)
-                target_datetime_msk = datetime.combine(
-                    tomorrow_msk, target_time, tzinfo=self.msk_tz
-                )
-
-            # Calculate sleep duration
-            sleep_duration = (target_datetime_msk - now_msk).total_seconds()
-
-            logger.debug(f"Next reminder at {target_datetime_msk} MSK (sleeping {sleep_duration}s)")
+    async def _load_user_schedules(self, now: datetime) -> None:
+        """Sync personal schedules with the database, dropping users who reset theirs."""
+        async with get_async_session() as session:
+            user_repo, _ = get_async_repositories(session)
+            schedules = await user_repo.get_custom_reminder_schedules()
+        self._loaded_at = self._now()
 
+        stale = self.schedule.user_ids()
+        for telegram_id, timezone, reminder_times in schedules:
+            stale.discard(telegram_id)
             try:
-                await asyncio.sleep(sleep_duration)
-                if self.running:  # Check if still running after sleep
-                    await self._send_reminders()
-            except asyncio.CancelledError:
-                logger.info(f"Reminder task for {reminder_time} cancelled")
-                break
-            except Exception as e:
-                logger.error(f"Error in reminder scheduler: {e}")
-                await asyncio.sleep(60)  # Wait 1 minute before retrying
-
-    async def _send_reminders(self) -> None:
-        """Send reminder messages to all registered users."""
-        logger.info("Sending reminder messages")
+                self.schedule.set_user(telegram_id, timezone, reminder_times, now)
+            except (ValueError, KeyError) as e:
+                logger.error(f"Skipping invalid reminder schedule of {telegram_id}: {e}")
+        for telegram_id in stale:
+            self.schedule.set_user(telegram_id, None, None, now)
 
+    async def _refresh_user_schedules(self) -> None:
+        """Reload personal schedules that other instances may have changed."""
+        if self.lease is None or self._loaded_at is None:
+            return
+        now = self._now()
+        if (now - self._loaded_at).total_seconds() < self.schedule_refresh:
+            return
         try:
-            db = get_database()
-
-            with db.get_session() as session:
-                user_repo, _ = get_repositories(session)
-                users = user_repo.get_all_users()
+            await self._load_user_schedules(now)
+        except Exception as e:
+            logger.error(f"Error reloading reminder schedules: {e}")
 
-                reminder_message = (
-                    "🩺 Время измерить артериальное давление!"  # \n\n"
-                    # "Пожалуйста, измерьте артериальное давление и отправьте мне результат.\n"
-                    # "Формат: 120/80"
-                )
+    async def _run(self) -> None:
+        while self.running:
+            await self._refresh_user_schedules()
+            due_at = self.schedule.next_due()
+            timeout = MAX_SLEEP
+            if due_at is not None:
+                timeout = min(MAX_SLEEP, max(0.0, (due_at - self._now()).total_seconds()))
 
-                sent_count = 0
-                failed_count = 0
+            # Wake early when a personal schedule adds a slot that may be due sooner
+            self._changed.clear()
+            try:
+                await asyncio.wait_for(self._changed.wait(), timeout)
+                continue
+            except TimeoutError:
+                pass
 
-                for user in users:
-                    try:
-                        await self.bot.send_message(chat_id=user.telegram_id, text=reminder_message)
-                        sent_count += 1
+            now = self._now()
+            due = self.schedule.pop_due(now)
+            if not due:
+                continue
 
-                        # Small delay to avoid hitting rate limits
-                        await asyncio.sleep(0.1)
+            drift = (now - due[0][0]).total_seconds()
+            self.stats.record_wakeup(drift)
+            scheduler_drift_seconds.observe(drift)
+            # Queueing runs on its own, so a slow database does not hold back the timer
+            task = asyncio.create_task(self._send_reminders(due))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
 
-                    except Exception as e:
-                        logger.error(f"Failed to send reminder to user {user.telegram_id}: {e}")
-                        failed_count += 1
+    async def _send_reminders(self, due: list[tuple[datetime, Slot]]) -> None:
+        """Queue reminders for everyone on the due slots in the outbox."""
+        now = self._now()
+        by_due_at: dict[datetime, list[Slot]] = {}
+        for due_at, slot in due:
+            lateness = (now - due_at).total_seconds()
+            self.stats.record_dispatch(lateness)
+            slot_lateness_seconds.observe(lateness)
+            by_due_at.setdefault(due_at, []).append(slot)
 
-                logger.info(f"Reminders sent: {sent_count}, failed: {failed_count}")
+        for due_at, slots in by_due_at.items():
+            slot_names = ", ".join(f"{t:%H:%M} {tz}" for tz, t in slots)
+            members = {
+                telegram_id for slot in slots for telegram_id in self.schedule.members.get(slot, ())
+            }
+            try:
+                queued = await self.outbox.enqueue(
+                    due_at.astimezone(UTC).replace(tzinfo=None),
+                    members,
+                    include_default=any(slot in self.schedule.default_slots for slot in slots),
+                )
+            except Exception as e:
+                logger.error(f"Error queueing reminders for {slot_names}: {e}")
+                continue
+            reminders_queued.inc(queued)
 
-        except Exception as e:
-            logger.error(f"Error sending reminders: {e}")
+            logger.info(
+                f"Queued {queued} reminders for {slot_names}; "
+                f"drift avg {self.stats.avg_drift * 1000:.0f} ms / "
+                f"max {self.stats.max_drift * 1000:.0f} ms, "
+                f"lateness avg {self.stats.avg_lateness * 1000:.0f} ms / "
+                f"max {self.stats.max_lateness * 1000:.0f} ms"
+            )
 
     async def send_test_reminder(self, telegram_id: int) -> bool:
         """Send a test reminder to a specific user."""
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import threading
+from collections.abc import Awaitable, Callable, Hashable
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Generic, TypeVar
+
+from ..database.database import Database, EngineOptions, to_sync_database_url
+
+logger = logging.getLogger(__name__)
+
+# Where blocking jobs run: "inline" (event loop), "thread" or "process" pool
+WORKER_MODES = ("inline", "thread", "process")
+
+K = TypeVar("K", bound=Hashable)
+T = TypeVar("T")
+
+# Sync databases used by pool workers (one per URL and worker process, shared by threads)
+_worker_databases: dict[str, Database] = {}
+_worker_database_lock = threading.Lock()
+
+
+def get_worker_database(database_url: str, options: EngineOptions | None = None) -> Database:
+    """The blocking database a pool worker uses for the URL, created on first use."""
+    with _worker_database_lock:
+        db = _worker_databases.get(database_url)
+        if db is None:
+            db = _worker_databases[database_url] = Database(
+                to_sync_database_url(database_url), options
+            )
+        return db
+
+
+class WorkerPool:
+    """A thread or process pool for blocking jobs, started on first use.
+
+    Jobs submitted to a process pool must be picklable module-level functions.
+    """
+
+    def __init__(self, mode: str, workers: int, name: str):
+        if mode not in WORKER_MODES:
+            raise ValueError(f"Unknown {name} executor mode: {mode}")
+
+        self.mode = mode
+        self.workers = workers
+        self.name = name
+        self._executor: Executor | None = None
+
+    async def run(self, func: Callable[..., T], *args) -> T:
+        """Run a blocking function in the pool."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._get_executor(), func, *args)
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            if self.mode == "process":
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            else:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.workers, thread_name_prefix=self.name
+                )
+            logger.info(f"Started {self.mode} pool with {self.workers} {self.name} workers")
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Stop the pool; it is started again by the next job."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+class InFlight(Generic[K, T]):
+    """Running jobs by key, so concurrent requests for the same result share one job."""
+
+    def __init__(self):
+        self._jobs: dict[K, asyncio.Future[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self._jobs)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._jobs
+
+    def get(self, key: K) -> asyncio.Future[T] | None:
+        """The running job for the key, if any."""
+        return self._jobs.get(key)
+
+    def start(self, key: K, run: Callable[[], Awaitable[T]]) -> asyncio.Future[T]:
+        """The running job for the key, starting ``run()`` when there is none."""
+        job = self._jobs.get(key)
+        if job is None:
+            job = self._jobs[key] = asyncio.ensure_future(run())
+            job.add_done_callback(lambda _: self._jobs.pop(key, None))
+        return job
+
+    async def join(self, key: K, run: Callable[[], Awaitable[T]]) -> T:
+        """Wait for the key's result, joining the running job or starting one."""
+        return await share(self.start(key, run))
+
+
+def share(job: asyncio.Future[T]) -> Awaitable[T]:
+    """Wait for a shared job without one requester going away cancelling it for all."""
+    return asyncio.shield(job)
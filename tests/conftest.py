@@ -0,0 +1,55 @@
+from datetime import datetime
+
+import pytest
+from aiogram.methods import SendMessage
+
+from src.database import database
+from src.database.database import Database
+from src.database.repositories import get_repositories
+
+
+class FakeBot:
+    """Bot stub recording sent messages and raising scripted errors."""
+
+    def __init__(self, errors: dict[int, list[Exception]] | None = None):
+        self.errors = errors or {}
+        self.sent: list[int] = []
+
+    async def send_message(self, chat_id: int, text: str) -> None:
+        pending = self.errors.get(chat_id)
+        if pending:
+            raise pending.pop(0)
+        self.sent.append(chat_id)
+
+
+def send_message_method(chat_id: int) -> SendMessage:
+    """The API call a scripted Telegram error is raised for."""
+    return SendMessage(chat_id=chat_id, text="test")
+
+
+@pytest.fixture
+def sqlite_url(tmp_path) -> str:
+    """URL of a SQLite database file in the test's temporary directory."""
+    return f"sqlite:///{tmp_path / 'test.db'}"
+
+
+@pytest.fixture
+def db(sqlite_url, monkeypatch):
+    """Provide an empty SQLite database, installed as the application's database."""
+    instance = Database(sqlite_url)
+    instance.create_tables()
+    monkeypatch.setattr(database, "db_instance", instance)
+    yield instance
+    instance.engine.dispose()
+
+
+@pytest.fixture
+def database_url(db, sqlite_url) -> str:
+    """Provide a database where user 42 has two measurements and user 43 none."""
+    with db.get_session() as session:
+        user_repo, measurement_repo = get_repositories(session)
+        user = user_repo.create_user(telegram_id=42)
+        user_repo.create_user(telegram_id=43)
+        measurement_repo.create_measurement(user.id, 120, 80, datetime(2023, 12, 1, 10, 0))
+        measurement_repo.create_measurement(user.id, 130, 85, datetime(2023, 12, 2, 10, 0))
+    return sqlite_url
@@ -0,0 +1,99 @@
+import random
+from datetime import UTC, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from src.bot.handlers import BP_CATEGORIES, format_stats, get_bp_category
+from src.services.analytics import (
+    DAY,
+    ReadingArrays,
+    categorize,
+    compute_stats,
+    local_hours,
+    rolling_mean,
+)
+
+START = datetime(2024, 3, 1, tzinfo=UTC)
+
+
+def make_readings(readings: list[tuple[int, int, datetime]]) -> ReadingArrays:
+    return ReadingArrays.from_series([(s, d, at.timestamp()) for s, d, at in readings])
+
+
+class TestAnalytics:
+    """Test the vectorized statistics against straightforward Python."""
+
+    def test_rolling_mean_matches_naive_window(self):
+        """Test that every rolling average covers exactly the readings in (t - window, t]."""
+        rng = random.Random(1)
+        times = np.cumsum([rng.uniform(0, 2 * DAY) for _ in range(200)])
+        values = np.array(
+            [[rng.randint(100, 170) for _ in times], [rng.randint(60, 100) for _ in times]]
+        )
+
+        result = rolling_mean(values, times, 7 * DAY)
+
+        for i, t in enumerate(times):
+            window = (times > t - 7 * DAY) & (times <= t)
+            np.testing.assert_allclose(result[:, i], values[:, window].mean(axis=1))
+
+    def test_categories_match_single_reading_category(self):
+        """Test that categorize follows the same thresholds as get_bp_category."""
+        readings = [(s, d) for s in range(90, 200, 5) for d in range(50, 130, 5)]
+        values = np.array(readings, dtype=float).T
+
+        for (systolic, diastolic), index in zip(readings, categorize(values), strict=True):
+            assert get_bp_category(systolic, diastolic).startswith(BP_CATEGORIES[index])
+
+    def test_local_hours_follow_daylight_saving(self):
+        """Test that local hours use the offset in effect on each day."""
+        berlin = ZoneInfo("Europe/Berlin")
+        winter = datetime(2024, 3, 30, 8, tzinfo=berlin)
+        summer = datetime(2024, 3, 31, 8, tzinfo=berlin)
+        times = np.array([winter.timestamp(), summer.timestamp()])
+
+        assert local_hours(times, berlin).tolist() == [8, 8]
+
+    def test_compute_stats(self):
+        """Test summary, recent windows, morning vs evening and trend on a known series."""
+        readings = []
+        for day in range(60):
+            # Morning readings rise by 1 mmHg a day, evening ones stay flat
+            readings.append((120 + day, 80, START + timedelta(days=day, hours=7)))
+            readings.append((110, 70, START + timedelta(days=day, hours=20)))
+        now = START + timedelta(days=60)
+
+        stats = compute_stats(make_readings(readings), now=now)
+
+        assert stats.count == 120
+        assert stats.first_at == START + timedelta(hours=7)
+        assert stats.last_at == START + timedelta(days=59, hours=20)
+        np.testing.assert_allclose(stats.mean, [(149.5 + 110) / 2, 75])
+        np.testing.assert_allclose(stats.minimum, [110, 70])
+        np.testing.assert_allclose(stats.maximum, [179, 80])
+        assert stats.last_7_count == 14
+        np.testing.assert_allclose(stats.last_7, [(176 + 110) / 2, 75])
+        assert stats.morning_count == stats.evening_count == 60
+        np.testing.assert_allclose(stats.morning, [149.5, 80])
+        np.testing.assert_allclose(stats.evening, [110, 70])
+        times = np.array([at.timestamp() for _, _, at in readings]) / (30 * DAY)
+        expected = [np.polyfit(times, [r[i] for r in readings], 1)[0] for i in (0, 1)]
+        np.testing.assert_allclose(stats.trend, expected)
+        assert stats.categories.sum() == 120
+        np.testing.assert_allclose(stats.cv, stats.sd / stats.mean * 100)
+
+    def test_no_readings(self):
+        """Test that an empty history has no statistics."""
+        assert compute_stats(ReadingArrays.from_series([])) is None
+
+    def test_format_single_reading(self):
+        """Test that a lone reading is reported without a trend."""
+        stats = compute_stats(make_readings([(125, 82, START)]), now=START)
+
+        text = format_stats(stats, ZoneInfo("Europe/Moscow"))
+
+        assert "1 измерений" in text
+        assert "Среднее: 125/82" in text
+        assert "Тренд" not in text
+        assert f"• {BP_CATEGORIES[2]}: 1 (100%)" in text
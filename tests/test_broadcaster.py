@@ -0,0 +1,69 @@
+import time
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError, TelegramRetryAfter
+
+from src.services.broadcaster import Broadcaster, BroadcastResult, DeliveryStatus, TokenBucket
+from tests.conftest import FakeBot
+from tests.conftest import send_message_method as _method
+
+
+class TestBroadcaster:
+    """Test single-message delivery."""
+
+    @pytest.mark.asyncio
+    async def test_delivers(self):
+        """Test that a message is sent and counted as delivered."""
+        bot = FakeBot()
+        delivery = await Broadcaster(bot, rate_limit=1000).deliver(1, "reminder", BroadcastResult())
+
+        assert delivery.status is DeliveryStatus.SENT
+        assert bot.sent == [1]
+
+    @pytest.mark.asyncio
+    async def test_transient_errors_are_retryable(self):
+        """Test that network errors are reported for a later retry."""
+        bot = FakeBot({3: [TelegramNetworkError(_method(3), "timeout")]})
+        delivery = await Broadcaster(bot, rate_limit=1000).deliver(3, "reminder", BroadcastResult())
+
+        assert delivery.status is DeliveryStatus.RETRY
+        assert bot.sent == []
+
+    @pytest.mark.asyncio
+    async def test_blocked_chats_are_permanent(self):
+        """Test that a chat that blocked the bot is reported as blocked."""
+        bot = FakeBot({2: [TelegramForbiddenError(_method(2), "bot was blocked by the user")]})
+        delivery = await Broadcaster(bot, rate_limit=1000).deliver(2, "reminder", BroadcastResult())
+
+        assert delivery.status is DeliveryStatus.BLOCKED
+        assert "blocked" in delivery.error
+
+    @pytest.mark.asyncio
+    async def test_retry_after_is_honoured(self):
+        """Test that flood control pauses sending and then delivers."""
+        bot = FakeBot({1: [TelegramRetryAfter(_method(1), "flood", retry_after=0.2)]})
+        broadcaster = Broadcaster(bot, rate_limit=1000, per_chat_interval=0)
+        result = BroadcastResult()
+
+        started = time.monotonic()
+        delivery = await broadcaster.deliver(1, "reminder", result)
+
+        assert delivery.status is DeliveryStatus.SENT
+        assert bot.sent == [1]
+        assert result.flood_waits == 1
+        assert time.monotonic() - started >= 0.2
+
+
+class TestTokenBucket:
+    """Test global rate limiting."""
+
+    @pytest.mark.asyncio
+    async def test_rate_is_enforced(self):
+        """Test that acquiring tokens is paced at the configured rate."""
+        bucket = TokenBucket(rate=100)
+
+        started = time.monotonic()
+        for _ in range(11):
+            await bucket.acquire()
+
+        assert time.monotonic() - started >= 0.09
@@ -0,0 +1,41 @@
+import time
+
+from src.services.cache import LRUCache
+
+
+class TestLRUCache:
+    """Test the bounded LRU/TTL cache."""
+
+    def test_hits_and_misses(self):
+        """Test that lookups are counted."""
+        cache: LRUCache[int, int] = LRUCache(max_size=10)
+
+        assert cache.get(1) is None
+        cache.set(1, 100)
+        assert cache.get(1) == 100
+
+        assert cache.hits == 1
+        assert cache.misses == 1
+        assert cache.hit_rate == 0.5
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest unused entry is evicted when full."""
+        cache: LRUCache[int, int] = LRUCache(max_size=2)
+        cache.set(1, 100)
+        cache.set(2, 200)
+        cache.get(1)
+        cache.set(3, 300)
+
+        assert cache.get(2) is None
+        assert cache.get(1) == 100
+        assert cache.get(3) == 300
+        assert len(cache) == 2
+
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are not returned."""
+        cache: LRUCache[int, int] = LRUCache(max_size=10, ttl=0.01)
+        cache.set(1, 100)
+        time.sleep(0.02)
+
+        assert cache.get(1) is None
+        assert len(cache) == 0
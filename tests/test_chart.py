@@ -0,0 +1,102 @@
+import asyncio
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from src.database import database
+from src.database.repositories import get_repositories
+from src.services import chart
+from src.services.analytics import ReadingArrays
+from src.services.chart import ChartRenderer, downsample
+
+
+@pytest.fixture
+def renders(monkeypatch):
+    """Record the series and time zone of every chart drawn, instead of drawing it."""
+    calls = []
+
+    def render_chart(series, timezone):
+        calls.append((series, timezone))
+        return f"png:{len(series)}:{timezone}".encode()
+
+    monkeypatch.setattr(chart, "render_chart", render_chart)
+    return calls
+
+
+class TestDownsample:
+    """Test reducing long histories to a drawable number of points."""
+
+    def test_short_series_is_kept(self):
+        """Test that histories within the limit are drawn point by point."""
+        readings = ReadingArrays(np.array([[120.0, 130.0], [80.0, 85.0]]), np.array([0.0, 1.0]))
+        assert downsample(readings, max_points=2) is readings
+
+    def test_buckets_are_averaged(self):
+        """Test that consecutive readings are averaged into equal buckets."""
+        times = np.arange(10, dtype=float)
+        readings = ReadingArrays(np.vstack([times + 100, times + 60]), times)
+
+        result = downsample(readings, max_points=5)
+
+        np.testing.assert_allclose(result.times, [0.5, 2.5, 4.5, 6.5, 8.5])
+        np.testing.assert_allclose(
+            result.values, [[100.5, 102.5, 104.5, 106.5, 108.5], [60.5, 62.5, 64.5, 66.5, 68.5]]
+        )
+
+
+class TestChartRenderer:
+    """Test chart rendering off the event loop and its cache."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    async def test_caches_until_new_measurement(self, database_url, renders, mode):
+        """Test that charts are redrawn only for new measurements or another time zone."""
+        renderer = ChartRenderer(database_url, mode=mode)
+        try:
+            first = await renderer.render(1, "Europe/Moscow")
+            again = await renderer.render(1, "Europe/Moscow")
+            assert first == again == b"png:2:Europe/Moscow"
+            assert len(renders) == 1
+
+            with database.db_instance.get_session() as session:
+                _, measurement_repo = get_repositories(session)
+                measurement_repo.create_measurement(1, 140, 90, datetime(2023, 12, 3, 10, 0))
+
+            assert await renderer.render(1, "Europe/Moscow") == b"png:3:Europe/Moscow"
+            assert await renderer.render(1, "UTC") == b"png:3:UTC"
+            assert len(renders) == 3
+            assert renderer.cache.hits == 1
+        finally:
+            renderer.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_deduplicates_in_flight_charts(self, database_url, renders):
+        """Test that concurrent requests for one chart share a single render."""
+        renderer = ChartRenderer(database_url, mode="thread")
+        try:
+            first, second = await asyncio.gather(
+                renderer.render(1, "UTC"), renderer.render(1, "UTC")
+            )
+        finally:
+            renderer.shutdown()
+
+        assert first == second
+        assert len(renders) == 1
+
+    @pytest.mark.asyncio
+    async def test_no_measurements(self, database_url, renders):
+        """Test that users without readings get no chart."""
+        renderer = ChartRenderer(database_url, mode="inline")
+        assert await renderer.render(2, "UTC") is None
+        assert not renders
+
+
+def test_render_chart_png():
+    """Test that a long history is drawn as a PNG image."""
+    pytest.importorskip("matplotlib")
+    series = [(120 + i % 20, 80 + i % 10, 1.7e9 + i * 3600.0) for i in range(5_000)]
+
+    png = chart.render_chart(series, "Europe/Moscow")
+
+    assert png.startswith(b"\x89PNG\r\n\x1a\n")
@@ -0,0 +1,107 @@
+import asyncio
+import csv
+import gzip
+import os
+from datetime import datetime
+
+import pytest
+
+from src.database.repositories import get_repositories
+from src.services.exporter import BulkExporter, ExportInProgressError
+
+
+@pytest.fixture
+def database_url(db, sqlite_url):
+    """Provide a database with three users, one of them without measurements."""
+    with db.get_session() as session:
+        user_repo, measurement_repo = get_repositories(session)
+        first = user_repo.create_user(telegram_id=42)
+        user_repo.create_user(telegram_id=43)
+        second = user_repo.create_user(telegram_id=44)
+        measurement_repo.create_measurements(
+            [
+                (second.id, 140, 90, datetime(2023, 12, 1, 9, 0)),
+                (first.id, 130, 85, datetime(2023, 12, 2, 10, 0)),
+                (first.id, 120, 80, datetime(2023, 12, 1, 10, 0)),
+            ]
+        )
+    return sqlite_url
+
+
+class TestBulkExporter:
+    """Test exporting every user's measurements in one file."""
+
+    @pytest.mark.asyncio
+    async def test_exports_all_users_in_order(self, database_url):
+        """Test that readings are grouped by user, oldest first, and the file is removed after."""
+        exporter = BulkExporter(database_url)
+        try:
+            async with exporter.export("csv.gz") as export:
+                assert (export.measurement_count, export.user_count) == (3, 2)
+                with gzip.open(export.path, "rt", encoding="utf-8") as file:
+                    rows = list(csv.reader(file))
+                path = export.path
+
+            assert not os.path.exists(path)
+            assert rows[0][:3] == ["Telegram ID", "Date", "Time"]
+            assert [(row[0], row[1], row[5]) for row in rows[1:]] == [
+                ("42", "2023-12-01", "120/80"),
+                ("42", "2023-12-02", "130/85"),
+                ("44", "2023-12-01", "140/90"),
+            ]
+        finally:
+            exporter.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_parquet_export_has_telegram_ids(self, database_url):
+        """Test that Parquet exports carry each reading's Telegram ID."""
+        parquet = pytest.importorskip("pyarrow.parquet")
+        exporter = BulkExporter(database_url)
+        try:
+            async with exporter.export("parquet") as export:
+                table = parquet.read_table(export.path)
+        finally:
+            exporter.shutdown()
+
+        assert table.column_names[:2] == ["telegram_id", "measured_at"]
+        assert table.column("telegram_id").to_pylist() == [42, 42, 44]
+
+    @pytest.mark.asyncio
+    async def test_one_export_at_a_time(self, database_url):
+        """Test that an export requested while one runs is turned away."""
+        exporter = BulkExporter(database_url)
+        started = asyncio.Event()
+        finish = asyncio.Event()
+
+        async def hold():
+            async with exporter.export("csv"):
+                started.set()
+                await finish.wait()
+
+        try:
+            task = asyncio.create_task(hold())
+            await started.wait()
+            assert exporter.is_running
+            with pytest.raises(ExportInProgressError):
+                async with exporter.export("csv"):
+                    pass
+            finish.set()
+            await task
+            assert not exporter.is_running
+        finally:
+            exporter.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_empty_export(self, db, sqlite_url):
+        """Test that an export without measurements holds only the header."""
+        exporter = BulkExporter(sqlite_url)
+        try:
+            async with exporter.export("csv") as export:
+                with open(export.path, encoding="utf-8") as file:
+                    content = file.read()
+        finally:
+            exporter.shutdown()
+
+        assert (export.measurement_count, export.user_count) == (0, 0)
+        assert content.startswith("Telegram ID,Date,Time,")
+        assert content.count("\n") == 1
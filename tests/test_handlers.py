@@ -1,6 +1,8 @@
 from datetime import date
 
-from src.bot.handlers import get_bp_category, parse_blood_pressure
+import pytest
+
+from src.bot.handlers import get_bp_category, parse_blood_pressure, parse_report_format
 
 
 class TestBloodPressureParsing:
@@ -33,6 +35,17 @@ class TestBloodPressureParsing:
         assert parse_blood_pressure("250/150") == (250, 150)  # Maximum valid
 
 
+class TestReportFormat:
+    """Test the /report format argument."""
+
+    def test_formats(self):
+        """Test that CSV is the default and known formats are accepted in any case."""
+        assert parse_report_format(None) == "csv"
+        assert parse_report_format(" CSV.GZ ") == "csv.gz"
+        assert parse_report_format("parquet") == "parquet"
+        assert parse_report_format("xlsx") is None
+
+
 class TestBloodPressureCategories:
     """Test blood pressure category classification."""
 
@@ -85,3 +98,34 @@ class TestDailyMeasurementCount:
         # Verify it returns a count
         assert isinstance(count, int)
         assert count == 2
+
+
+class TestRemindersCommand:
+    """Test setting personal reminder times."""
+
+    @pytest.mark.asyncio
+    async def test_caps_number_of_times(self, db):
+        """Test that more times than fit the column are refused and fewer are stored."""
+        from types import SimpleNamespace
+        from unittest.mock import AsyncMock
+
+        from src.bot.handlers import reminders_command
+        from src.database.repositories import get_repositories
+        from src.services.scheduler import MAX_REMINDER_TIMES
+
+        with db.get_session() as session:
+            user_repo, _ = get_repositories(session)
+            user_repo.create_user(telegram_id=1)
+
+        message = SimpleNamespace(from_user=SimpleNamespace(id=1), answer=AsyncMock())
+        too_many = " ".join(f"{hour:02d}:{minute:02d}" for hour in range(24) for minute in (0, 30))
+        await reminders_command(message, SimpleNamespace(args=too_many))
+        assert str(MAX_REMINDER_TIMES) in message.answer.call_args.args[0]
+
+        hourly = " ".join(f"{hour:02d}:00" for hour in range(MAX_REMINDER_TIMES))
+        await reminders_command(message, SimpleNamespace(args=hourly))
+
+        with db.get_session() as session:
+            user_repo, _ = get_repositories(session)
+            stored = user_repo.get_by_telegram_id(1).reminder_times
+        assert stored.split(",") == hourly.split()
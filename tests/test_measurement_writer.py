@@ -0,0 +1,116 @@
+import asyncio
+from datetime import datetime
+from types import SimpleNamespace
+from unittest.mock import AsyncMock
+
+import pytest
+from sqlalchemy.exc import OperationalError
+
+from src.bot import handlers
+from src.database import database
+from src.database.database import Database, EngineOptions
+from src.database.repositories import MeasurementRepository, get_repositories
+from src.services.cache import LRUCache
+from src.services.measurement_writer import (
+    MeasurementWriter,
+    measurement_batch_size,
+    measurement_failed_batches,
+    measurement_flush_seconds,
+)
+
+
+@pytest.fixture
+def db(db):
+    """Register three users."""
+    with db.get_session() as session:
+        user_repo, _ = get_repositories(session)
+        for telegram_id in (1, 2, 3):
+            user_repo.create_user(telegram_id=telegram_id)
+    return db
+
+
+@pytest.fixture
+def small_pool_db(db, sqlite_url, monkeypatch):
+    """Install the database behind a two-connection pool that gives up quickly."""
+    instance = Database(sqlite_url, EngineOptions(pool_size=2, max_overflow=0, pool_timeout=1))
+    monkeypatch.setattr(database, "db_instance", instance)
+    yield instance
+    instance.engine.dispose()
+
+
+class TestMeasurementWriter:
+    """Test write-behind batching of measurement inserts."""
+
+    @pytest.mark.asyncio
+    async def test_concurrent_writes_share_one_commit(self, db):
+        """Test that readings arriving together are committed as one batch."""
+        batches, flushes = measurement_batch_size.count(), measurement_flush_seconds.count()
+        writer = MeasurementWriter(max_delay=0.05)
+        measurements = await asyncio.gather(
+            *(writer.write(user_id, 120 + user_id, 80) for user_id in (1, 2, 3))
+        )
+
+        assert [m.user_id for m in measurements] == [1, 2, 3]
+        assert all(m.id is not None for m in measurements)
+        assert writer.stats.batches == 1
+        assert writer.stats.max_batch_size == 3
+        assert measurement_batch_size.count() == batches + 1
+        assert measurement_flush_seconds.count() == flushes + 1
+
+        # Durable by the time the writer acknowledges
+        with db.get_session() as session:
+            _, measurement_repo = get_repositories(session)
+            assert measurement_repo.get_recent_measurements(2)[0].systolic == 122
+
+    @pytest.mark.asyncio
+    async def test_full_batch_flushes_without_waiting(self, db):
+        """Test that a full batch is written before the delay expires."""
+        writer = MeasurementWriter(max_delay=10, max_batch=2)
+        measured_at = datetime(2023, 12, 1, 10, 0)
+        await asyncio.wait_for(
+            asyncio.gather(*(writer.write(1, 120, 80, measured_at) for _ in range(4))),
+            timeout=1,
+        )
+
+        assert writer.stats.batches == 2
+        assert writer.stats.avg_batch_size == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_batch_is_reported_to_every_writer(self, db, monkeypatch):
+        """Test that no reading is acknowledged when its batch fails."""
+
+        def fail(self, readings):
+            raise OperationalError("INSERT", {}, Exception("disk I/O error"))
+
+        monkeypatch.setattr(MeasurementRepository, "create_measurements", fail)
+        failures = measurement_failed_batches.value()
+        writer = MeasurementWriter(max_delay=0.01)
+
+        results = await asyncio.gather(
+            writer.write(1, 120, 80), writer.write(2, 130, 85), return_exceptions=True
+        )
+
+        assert all(isinstance(result, OperationalError) for result in results)
+        assert writer.stats.failed_batches == 1
+        assert measurement_failed_batches.value() == failures + 1
+
+    @pytest.mark.asyncio
+    async def test_handler_holds_no_connection_while_waiting(self, small_pool_db, monkeypatch):
+        """Test that cold-cache senders leave the pool free for the batch they wait on."""
+        monkeypatch.setattr(handlers, "measurement_writer", MeasurementWriter(max_delay=0.05))
+        monkeypatch.setattr(handlers, "user_id_cache", LRUCache(max_size=10))
+        messages = [
+            SimpleNamespace(
+                text="120/80", from_user=SimpleNamespace(id=telegram_id), answer=AsyncMock()
+            )
+            for telegram_id in (1, 2, 3)
+        ]
+
+        await asyncio.wait_for(
+            asyncio.gather(*(handlers.handle_measurement(message) for message in messages)),
+            timeout=5,
+        )
+
+        for message in messages:
+            message.answer.assert_awaited_once_with("✅ Записано: 120/80 mmHg")
+        assert handlers.measurement_writer.stats.batches == 1
@@ -0,0 +1,89 @@
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import text
+
+from src.bot.middlewares import MetricsMiddleware, handler_errors, handler_seconds
+from src.database.database import Database
+from src.services.metrics import (
+    MetricsRegistry,
+    db_pool_checked_out,
+    db_pool_checkouts,
+    db_query_seconds,
+)
+
+
+class TestMetricsRegistry:
+    """Test the Prometheus text exposition."""
+
+    def test_renders_counters_and_histograms(self):
+        """Test that labelled counters and cumulative histogram buckets are rendered."""
+        registry = MetricsRegistry()
+        sent = registry.counter("sent_total", "Messages sent.", ["outcome"])
+        latency = registry.histogram("latency_seconds", "Latency.", buckets=(0.1, 1.0))
+
+        sent.inc(outcome="ok")
+        sent.inc(2, outcome="ok")
+        sent.inc(outcome='bad "quote"')
+        for value in (0.05, 0.1, 0.5, 3.0):
+            latency.observe(value)
+
+        assert registry.render().splitlines() == [
+            "# HELP sent_total Messages sent.",
+            "# TYPE sent_total counter",
+            'sent_total{outcome="bad \\"quote\\""} 1',
+            'sent_total{outcome="ok"} 3',
+            "# HELP latency_seconds Latency.",
+            "# TYPE latency_seconds histogram",
+            'latency_seconds_bucket{le="0.1"} 2',
+            'latency_seconds_bucket{le="1"} 3',
+            'latency_seconds_bucket{le="+Inf"} 4',
+            "latency_seconds_sum 3.65",
+            "latency_seconds_count 4",
+        ]
+
+    def test_rejects_wrong_labels(self):
+        """Test that observations must carry exactly the declared labels."""
+        counter = MetricsRegistry().counter("requests_total", "Requests.", ["handler"])
+        with pytest.raises(ValueError):
+            counter.inc(command="start")
+
+    def test_instruments_queries_and_pool(self, tmp_path):
+        """Test that engine events time queries and track checked-out connections."""
+        db = Database(f"sqlite:///{tmp_path / 'test.db'}")
+        selects = db_query_seconds.count(operation="select")
+        checkouts = db_pool_checkouts.value()
+
+        with db.engine.connect() as connection:
+            connection.execute(text("SELECT 1"))
+            assert db_pool_checked_out.value() >= 1
+
+        assert db_query_seconds.count(operation="select") == selects + 1
+        assert db_pool_checkouts.value() == checkouts + 1
+        db.engine.dispose()
+
+
+class TestMetricsMiddleware:
+    """Test handler timing."""
+
+    @pytest.mark.asyncio
+    async def test_times_handlers_and_counts_errors(self):
+        """Test that each handler call is timed under its name and failures are counted."""
+        middleware = MetricsMiddleware()
+
+        async def echo_handler(event, data):
+            return "ok"
+
+        async def failing_handler(event, data):
+            raise RuntimeError("boom")
+
+        before = handler_seconds.count(handler="echo_handler")
+        data = {"handler": SimpleNamespace(callback=echo_handler)}
+        assert await middleware(echo_handler, SimpleNamespace(), data) == "ok"
+        assert handler_seconds.count(handler="echo_handler") == before + 1
+
+        errors = handler_errors.value(handler="failing_handler")
+        data = {"handler": SimpleNamespace(callback=failing_handler)}
+        with pytest.raises(RuntimeError):
+            await middleware(failing_handler, SimpleNamespace(), data)
+        assert handler_errors.value(handler="failing_handler") == errors + 1
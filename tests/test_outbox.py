@@ -0,0 +1,180 @@
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+from aiogram.exceptions import TelegramForbiddenError, TelegramNetworkError
+from sqlalchemy import event
+
+from src.bot.middlewares import ReactivationMiddleware
+from src.database.database import Database
+from src.database.models import ReminderDelivery, User
+from src.database.repositories import ReminderOutboxRepository, get_repositories
+from src.services.broadcaster import Broadcaster
+from src.services.cache import LRUCache
+from src.services.outbox import ReminderOutbox
+from tests.conftest import FakeBot
+from tests.conftest import send_message_method as _method
+
+SLOT_AT = datetime(2024, 3, 9, 17, 0)
+
+
+@pytest.fixture
+def db(db):
+    """Register five users."""
+    with db.get_session() as session:
+        user_repo, _ = get_repositories(session)
+        for telegram_id in range(1, 6):
+            user_repo.create_user(telegram_id=telegram_id)
+    return db
+
+
+def _statuses(db: Database) -> dict[int, tuple[str, int]]:
+    with db.get_session() as session:
+        rows = (
+            session.query(User.telegram_id, ReminderDelivery.status, ReminderDelivery.attempts)
+            .join(User)
+            .all()
+        )
+    return {telegram_id: (status, attempts) for telegram_id, status, attempts in rows}
+
+
+class TestReminderOutbox:
+    """Test durable reminder delivery."""
+
+    @pytest.mark.asyncio
+    async def test_drains_and_marks_outcomes(self, db):
+        """Test that reminders are delivered, retried or marked unreachable."""
+        bot = FakeBot(
+            {
+                2: [TelegramForbiddenError(_method(2), "bot was blocked by the user")],
+                3: [TelegramNetworkError(_method(3), "timeout")],
+            }
+        )
+        outbox = ReminderOutbox(Broadcaster(bot, rate_limit=1000), retry_delay=0)
+        assert await outbox.enqueue(SLOT_AT, include_default=True) == 5
+
+        while await outbox.drain_once():
+            pass
+
+        assert sorted(bot.sent) == [1, 3, 4, 5]
+        assert _statuses(db) == {
+            1: ("sent", 1),
+            2: ("blocked", 1),
+            3: ("sent", 2),
+            4: ("sent", 1),
+            5: ("sent", 1),
+        }
+        assert (outbox.result.sent, outbox.result.blocked, outbox.result.retried) == (4, 1, 1)
+
+        # The blocked user is skipped in the next slot until they come back with /start
+        assert await outbox.enqueue(SLOT_AT + timedelta(hours=3), include_default=True) == 4
+        with db.get_session() as session:
+            get_repositories(session)[0].create_user(telegram_id=2)
+        assert await outbox.enqueue(SLOT_AT + timedelta(hours=6), include_default=True) == 5
+
+    @pytest.mark.asyncio
+    async def test_gives_up_after_max_attempts(self, db):
+        """Test that a chat failing transiently on every attempt ends up failed."""
+        bot = FakeBot({1: [TelegramNetworkError(_method(1), "timeout") for _ in range(3)]})
+        outbox = ReminderOutbox(Broadcaster(bot, rate_limit=1000), max_attempts=3, retry_delay=0)
+        await outbox.enqueue(SLOT_AT, telegram_ids=[1])
+
+        while await outbox.drain_once():
+            pass
+
+        assert bot.sent == []
+        assert _statuses(db) == {1: ("failed", 3)}
+
+    def test_unfinished_claims_are_retried_after_lease(self, db):
+        """Test that deliveries claimed by a crashed process become due again."""
+        with db.get_session() as session:
+            outbox_repo = ReminderOutboxRepository(session)
+            outbox_repo.enqueue(SLOT_AT, telegram_ids=[1, 2], now=SLOT_AT)
+
+            claimed = outbox_repo.claim(limit=10, lease=60, now=SLOT_AT)
+            assert [telegram_id for _, telegram_id, _ in claimed] == [1, 2]
+            # Process dies here without recording outcomes
+
+            assert outbox_repo.claim(limit=10, lease=60, now=SLOT_AT + timedelta(seconds=30)) == []
+            reclaimed = outbox_repo.claim(limit=10, lease=60, now=SLOT_AT + timedelta(seconds=61))
+            assert [(telegram_id, attempt) for _, telegram_id, attempt in reclaimed] == [
+                (1, 2),
+                (2, 2),
+            ]
+
+    @pytest.mark.asyncio
+    async def test_repeated_failures_deactivate_user(self, db):
+        """Test that a failure streak deactivates a user and a delivery resets it."""
+        error = TelegramNetworkError(_method(1), "timeout")
+        bot = FakeBot({1: [error, error], 2: [error]})
+        outbox = ReminderOutbox(
+            Broadcaster(bot, rate_limit=1000), max_attempts=1, deactivate_after=2
+        )
+
+        for hours in (0, 3):
+            await outbox.enqueue(SLOT_AT + timedelta(hours=hours), telegram_ids=[1, 2])
+            while await outbox.drain_once():
+                pass
+
+        with db.get_session() as session:
+            users = {
+                user.telegram_id: (user.is_active, user.consecutive_failures)
+                for user in session.query(User).filter(User.telegram_id.in_([1, 2]))
+            }
+            reason = session.query(User.last_failure_reason).filter_by(telegram_id=1).scalar()
+        assert users == {1: (False, 2), 2: (True, 0)}
+        assert reason.endswith("timeout")
+
+        # Inactive users get no reminders until they write to the bot again
+        assert await outbox.enqueue(SLOT_AT + timedelta(hours=6), telegram_ids=[1, 2]) == 1
+        with db.get_session() as session:
+            user_repo = get_repositories(session)[0]
+            assert user_repo.reactivate(1) is True
+            assert user_repo.reactivate(1) is False
+        assert await outbox.enqueue(SLOT_AT + timedelta(hours=9), telegram_ids=[1, 2]) == 2
+
+    @pytest.mark.asyncio
+    async def test_message_reactivates_user(self, db):
+        """Test that writing to the bot re-enables a user the outbox deactivated."""
+        bot = FakeBot({1: [TelegramForbiddenError(_method(1), "bot was blocked by the user")]})
+        active_users = LRUCache(max_size=10, ttl=60)
+        middleware = ReactivationMiddleware(active_users)
+        outbox = ReminderOutbox(Broadcaster(bot, rate_limit=1000), active_users=active_users)
+        handled = []
+
+        async def handler(event, data):
+            handled.append(event.from_user.id)
+
+        message = SimpleNamespace(from_user=SimpleNamespace(id=1))
+        await middleware(handler, message, {})
+        assert active_users.get(1) is True
+
+        await outbox.enqueue(SLOT_AT, telegram_ids=[1])
+        while await outbox.drain_once():
+            pass
+        assert active_users.get(1) is None
+
+        await middleware(handler, message, {})
+        assert handled == [1, 1]
+        with db.get_session() as session:
+            assert session.query(User.is_active).filter_by(telegram_id=1).scalar() is True
+
+    @pytest.mark.asyncio
+    async def test_active_sender_is_not_written(self, db):
+        """Test that a message from an active user only reads, and only once per cache TTL."""
+        statements = []
+        event.listen(
+            db.engine,
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement.split()[0]),
+        )
+
+        async def handler(event, data):
+            pass
+
+        middleware = ReactivationMiddleware(LRUCache(max_size=10, ttl=60))
+        message = SimpleNamespace(from_user=SimpleNamespace(id=1))
+        await middleware(handler, message, {})
+        await middleware(handler, message, {})
+
+        assert statements == ["SELECT"]
@@ -0,0 +1,56 @@
+from src.services.report_cache import ReportCache
+
+
+def report(tmp_path, name: str, content: bytes) -> str:
+    """Write a generated report file."""
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path)
+
+
+class TestReportCache:
+    """Test the size-bounded report file cache."""
+
+    def test_hit_only_for_current_version(self, tmp_path):
+        """Test that a report is served for its version and replaced by a newer one."""
+        cache = ReportCache(max_bytes=100, directory=str(tmp_path))
+        cache.set(1, version=3, path=report(tmp_path, "old", b"old"), size=3, measurement_count=3)
+
+        cached_path, count = cache.get(1, 3)
+        assert (cached_path.read_bytes(), count) == (b"old", 3)
+        assert cache.get(1, 4) is None
+
+        cache.set(1, version=4, path=report(tmp_path, "new", b"new!"), size=4, measurement_count=4)
+        assert cache.get(1, 3) is None
+        assert not cached_path.exists()
+        assert cache.get(1, 4)[0].read_bytes() == b"new!"
+        assert cache.stats()["bytes"] == 4
+        assert cache.hit_rate == 0.5
+
+    def test_keeps_its_own_link(self, tmp_path):
+        """Test that the cached report survives the generated file being removed."""
+        cache = ReportCache(max_bytes=100, directory=str(tmp_path))
+        path = report(tmp_path, "report", b"content")
+        cache.set(1, 1, path, 7, 1)
+
+        (tmp_path / "report").unlink()
+        assert cache.get(1, 1)[0].read_bytes() == b"content"
+
+    def test_evicts_least_recently_used_by_size(self, tmp_path):
+        """Test that the total size stays within bounds, dropping the coldest report."""
+        cache = ReportCache(max_bytes=10, directory=str(tmp_path))
+        cache.set(1, 1, report(tmp_path, "a", b"a" * 4), 4, 1)
+        cache.set(2, 1, report(tmp_path, "b", b"b" * 4), 4, 1)
+        cache.get(1, 1)
+        cache.set(3, 1, report(tmp_path, "c", b"c" * 4), 4, 1)
+
+        assert cache.get(2, 1) is None
+        assert cache.get(1, 1) is not None
+        assert cache.get(3, 1) is not None
+
+        cache.set(4, 1, report(tmp_path, "d", b"d" * 11), 11, 1)
+        assert cache.get(4, 1) is None
+        assert len(list(tmp_path.rglob("*.report"))) == 2
+
+        cache.close()
+        assert not list(tmp_path.rglob("*.report"))
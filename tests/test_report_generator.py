@@ -1,7 +1,8 @@
-from datetime import datetime
+import io
+from datetime import datetime, timedelta
 
-from src.database.models import Measurement
-from src.services.report_generator import ReportGenerator
+from src.database.models import Measurement, MeasurementRow
+from src.services.report_generator import ReportGenerator, ReportSummary
 
 
 class TestReportGenerator:
@@ -78,6 +79,63 @@ class TestReportGenerator:
         assert "Highest Systolic,130" in result
         assert "Lowest Systolic,110" in result
 
+    def test_streamed_report_matches_full_report(self):
+        """Test that writing incrementally produces the same CSV across chunk boundaries."""
+        start = datetime(2023, 12, 1)
+        measurements = [
+            Measurement(
+                user_id=1,
+                systolic=100 + i % 80,
+                diastolic=60 + i % 30,
+                measured_at=start - timedelta(hours=i),
+            )
+            for i in range(2500)
+        ]
+
+        generator = ReportGenerator()
+        output = io.StringIO()
+        count = generator.write_csv_report(iter(measurements), output)
+
+        full = generator.generate_csv_report(measurements)
+        streamed = output.getvalue()
+        assert count == 2500
+        assert streamed.split("Report generated on")[0] == full.split("Report generated on")[0]
+        assert "Total measurements,2500" in streamed
+
+    def test_precomputed_summary_is_not_added_to(self):
+        """Test that a summary passed in, e.g. from rollups, is written unchanged."""
+        measurements = [
+            Measurement(user_id=1, systolic=130, diastolic=85, measured_at=datetime(2023, 12, 2)),
+            Measurement(user_id=1, systolic=120, diastolic=80, measured_at=datetime(2023, 12, 1)),
+        ]
+        summary = ReportSummary()
+        for measurement in measurements:
+            summary.add(measurement)
+
+        output = io.StringIO()
+        count = ReportGenerator().write_csv_report(iter(measurements), output, summary)
+
+        assert count == summary.count == 2
+        assert "Average Systolic,125.0" in output.getvalue()
+        assert "Total measurements,2" in output.getvalue()
+
+    def test_rows_match_orm_entities(self):
+        """Test that lightweight rows produce the same report as ORM entities."""
+        readings = [
+            (130, 85, datetime(2023, 12, 2, 15, 0)),
+            (120, 80, datetime(2023, 12, 1, 10, 0)),
+        ]
+        entities = [
+            Measurement(user_id=1, systolic=s, diastolic=d, measured_at=t) for s, d, t in readings
+        ]
+        rows = [MeasurementRow(*reading) for reading in readings]
+
+        generator = ReportGenerator()
+        from_entities = generator.generate_csv_report(entities).split("Report generated on")[0]
+        from_rows = generator.generate_csv_report(rows).split("Report generated on")[0]
+
+        assert from_rows == from_entities
+
     def test_bp_category_classification(self):
         """Test blood pressure category classification in reports."""
         generator = ReportGenerator()
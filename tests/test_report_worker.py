@@ -0,0 +1,222 @@
+import asyncio
+import gzip
+from datetime import datetime
+from pathlib import Path
+
+import pytest
+
+from src.database import database
+from src.database.models import Measurement
+from src.database.repositories import get_repositories
+from src.services.report_cache import ReportCache
+from src.services.report_worker import ReportExecutor, ReportQueueFullError
+
+
+async def generate(executor, user_id, report_format="csv", on_wait=None):
+    """Get a report and its bytes, read while the report is held."""
+    async with executor.report(user_id, report_format, on_wait) as report:
+        return report, Path(report.path).read_bytes()
+
+
+class TestReportExecutor:
+    """Test report generation off the event loop."""
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    async def test_generates_report(self, database_url, mode):
+        """Test that each mode produces the CSV report, removing the file afterwards."""
+        executor = ReportExecutor(database_url, mode=mode)
+        try:
+            report, content = await generate(executor, 1)
+            assert not Path(report.path).exists()
+        finally:
+            executor.shutdown()
+
+        csv_data = content.decode()
+        assert report.measurement_count == 2
+        assert report.size == len(content)
+        assert csv_data.index("2023-12-02") < csv_data.index("2023-12-01")
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    async def test_summary_comes_from_rollups(self, database_url, mode):
+        """Test that the summary is read from the rollups and rows match what it covers."""
+        with database.db_instance.get_session() as session:
+            # Added behind the repository's back, so no rollup covers it
+            session.add(
+                Measurement(
+                    user_id=1, systolic=180, diastolic=110, measured_at=datetime(2023, 12, 3, 10, 0)
+                )
+            )
+            session.commit()
+
+        executor = ReportExecutor(database_url, mode=mode)
+        try:
+            report, content = await generate(executor, 1)
+        finally:
+            executor.shutdown()
+
+        csv_data = content.decode()
+        assert report.measurement_count == 2
+        assert "2023-12-03" not in csv_data
+        assert "Highest Systolic,130" in csv_data
+        assert "Total measurements,2" in csv_data
+
+    @pytest.mark.asyncio
+    async def test_compressed_and_columnar_formats(self, database_url):
+        """Test that csv.gz holds the CSV report and parquet a table of the readings."""
+        executor = ReportExecutor(database_url, mode="thread")
+        try:
+            _, csv_data = await generate(executor, 1)
+            _, compressed = await generate(executor, 1, "csv.gz")
+            assert gzip.decompress(compressed).split(b"\n")[:3] == csv_data.split(b"\n")[:3]
+
+            with pytest.raises(ValueError):
+                await generate(executor, 1, "xlsx")
+
+            parquet = pytest.importorskip("pyarrow.parquet")
+            async with executor.report(1, "parquet") as report:
+                table = parquet.read_table(report.path)
+        finally:
+            executor.shutdown()
+
+        assert report.measurement_count == 2
+        assert table.column("systolic").to_pylist() == [130, 120]
+        assert table.column("category").to_pylist() == [
+            "High Blood Pressure Stage 1",
+            "Normal",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_deduplicates_in_flight_reports(self, database_url):
+        """Test that concurrent requests share a single job and file until both are done."""
+        executor = ReportExecutor(database_url, mode="thread", workers=1, queue_size=0)
+        try:
+            (first, _), (second, _) = await asyncio.gather(
+                generate(executor, 1), generate(executor, 1)
+            )
+            assert first is second
+            assert not Path(first.path).exists()
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_removes_file_when_requesters_leave_early(self, database_url):
+        """Test that a report nobody waits for anymore is removed once generated."""
+        executor = ReportExecutor(database_url, mode="thread")
+        try:
+            requester = asyncio.ensure_future(generate(executor, 1))
+            await asyncio.sleep(0)
+            job = executor._in_flight.get((1, "csv"))
+            requester.cancel()
+
+            report = await job
+            await asyncio.sleep(0)
+            assert not Path(report.path).exists()
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_rejects_when_queue_is_full(self, database_url):
+        """Test that reports beyond workers + queue size are refused."""
+        executor = ReportExecutor(database_url, mode="thread", workers=1, queue_size=0)
+        try:
+            job = asyncio.ensure_future(generate(executor, 1))
+            await asyncio.sleep(0)
+            assert executor.is_busy
+
+            with pytest.raises(ReportQueueFullError):
+                await generate(executor, 2)
+            await job
+        finally:
+            executor.shutdown()
+
+    @pytest.mark.asyncio
+    @pytest.mark.parametrize("mode", ["inline", "thread"])
+    async def test_cached_until_new_measurement(self, database_url, mode, tmp_path):
+        """Test that a report is reused until the user records another measurement."""
+        cache = ReportCache(max_bytes=1 << 20, directory=str(tmp_path))
+        executor = ReportExecutor(database_url, mode=mode, cache=cache)
+        try:
+            first_report, first = await generate(executor, 1)
+            again, content = await generate(executor, 1)
+            assert content == first
+            assert again.path != first_report.path
+            assert not Path(again.path).exists()
+            assert executor.cache.hits == 1
+            # Reports are generated next to the cache, so caching them is a hard link
+            assert Path(first_report.path).is_relative_to(tmp_path)
+
+            with database.db_instance.get_session() as session:
+                _, measurement_repo = get_repositories(session)
+                measurement_repo.create_measurements([(1, 140, 90, datetime(2023, 12, 3, 10, 0))])
+
+            report, _ = await generate(executor, 1)
+        finally:
+            executor.shutdown()
+
+        assert report.measurement_count == 3
+        assert executor.cache.hits == 1
+        cache.close()
+
+    @pytest.mark.asyncio
+    async def test_waiting_notice_only_when_generating(self, database_url, tmp_path):
+        """Test that a busy executor notifies for a report it generates, not a cached one."""
+        cache = ReportCache(max_bytes=1 << 20, directory=str(tmp_path))
+        executor = ReportExecutor(database_url, mode="thread", workers=1, cache=cache)
+        release = asyncio.Event()
+        run = executor._run
+
+        async def held_run(user_id, *args):
+            if user_id == 2:
+                await release.wait()
+            return await run(user_id, *args)
+
+        executor._run = held_run
+        notices = []
+
+        def notice(report_format):
+            async def on_wait():
+                notices.append(report_format)
+
+            return on_wait
+
+        try:
+            await generate(executor, 1, on_wait=notice("first"))
+            busy = asyncio.ensure_future(generate(executor, 2))
+            while not executor.is_busy:
+                await asyncio.sleep(0.01)
+
+            await generate(executor, 1, on_wait=notice("csv"))
+            await generate(executor, 1, "csv.gz", on_wait=notice("csv.gz"))
+            release.set()
+            await busy
+        finally:
+            executor.shutdown()
+            cache.close()
+
+        assert notices == ["csv.gz"]
+
+
+class TestMeasurementsVersion:
+    """Test the per-user stamp that invalidates cached reports."""
+
+    def test_bumped_by_new_measurements(self, db):
+        """Test that single and batched inserts bump only their users' versions."""
+        with db.get_session() as session:
+            user_repo, measurement_repo = get_repositories(session)
+            alice = user_repo.create_user(telegram_id=1)
+            bob = user_repo.create_user(telegram_id=2)
+            assert user_repo.get_measurements_version(alice.id) == 0
+
+            measurement_repo.create_measurement(alice.id, 120, 80)
+            measurement_repo.create_measurements(
+                [
+                    (alice.id, 125, 82, datetime(2023, 12, 1)),
+                    (alice.id, 130, 85, datetime(2023, 12, 2)),
+                ]
+            )
+
+            assert user_repo.get_measurements_version(alice.id) == 2
+            assert user_repo.get_measurements_version(bob.id) == 0
+            assert user_repo.get_measurements_version(999) is None
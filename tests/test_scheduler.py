@@ -0,0 +1,221 @@
+import asyncio
+import heapq
+from datetime import UTC, datetime, time, timedelta
+from unittest.mock import MagicMock
+
+import pytest
+from sqlalchemy import select
+
+from src.database.models import ReminderDelivery, User
+from src.database.repositories import LeaseRepository, get_repositories
+from src.services.leader import LeaderLease
+from src.services.scheduler import (
+    ReminderSchedule,
+    ReminderScheduler,
+    next_occurrence,
+    parse_reminder_times,
+)
+
+NOW = datetime(2024, 3, 9, 12, 0, tzinfo=UTC)  # 15:00 MSK, 07:00 in New York
+
+
+class TestReminderTimes:
+    """Test reminder time parsing and occurrence computation."""
+
+    def test_parse_reminder_times(self):
+        """Test that times are parsed, deduplicated and sorted."""
+        assert parse_reminder_times("21:00, 08:00 21:00") == [time(8, 0), time(21, 0)]
+        for invalid in ("", "8", "25:00", "08:00:00", "abc"):
+            with pytest.raises(ValueError):
+                parse_reminder_times(invalid)
+
+    def test_next_occurrence(self):
+        """Test that the next occurrence is strictly in the future, in the slot's zone."""
+        assert next_occurrence(("Europe/Moscow", time(20, 0)), NOW) == datetime(
+            2024, 3, 9, 17, 0, tzinfo=UTC
+        )
+        assert next_occurrence(("Europe/Moscow", time(15, 0)), NOW) == datetime(
+            2024, 3, 10, 12, 0, tzinfo=UTC
+        )
+
+    def test_next_occurrence_follows_dst(self):
+        """Test that local reminder times stay put across a DST change."""
+        slot = ("America/New_York", time(7, 0))
+        first = next_occurrence(slot, NOW)
+        assert first == datetime(2024, 3, 10, 11, 0, tzinfo=UTC)  # EDT from March 10
+        assert next_occurrence(slot, first) == datetime(2024, 3, 11, 11, 0, tzinfo=UTC)
+
+
+class TestReminderSchedule:
+    """Test the heap of reminder slots."""
+
+    def _schedule(self) -> ReminderSchedule:
+        schedule = ReminderSchedule("Europe/Moscow", [time(7, 0), time(20, 0)])
+        for slot in schedule.default_slots:
+            schedule.schedule(slot, NOW)
+        return schedule
+
+    def test_pops_slots_in_due_order(self):
+        """Test that due slots come out together, earliest first, and are requeued."""
+        schedule = self._schedule()
+        schedule.set_user(1, "Europe/Berlin", "18:00", NOW)  # 17:00 UTC, same instant as 20:00 MSK
+        schedule.set_user(2, None, "09:30", NOW)
+
+        assert schedule.next_due() == datetime(2024, 3, 9, 17, 0, tzinfo=UTC)
+        due = schedule.pop_due(datetime(2024, 3, 9, 17, 0, tzinfo=UTC))
+        assert {slot for _, slot in due} == {
+            ("Europe/Moscow", time(20, 0)),
+            ("Europe/Berlin", time(18, 0)),
+        }
+        assert schedule.members[("Europe/Berlin", time(18, 0))] == {1}
+
+        # 20:00 MSK and 18:00 Berlin are back in the heap for tomorrow
+        assert schedule.next_due() == datetime(2024, 3, 10, 4, 0, tzinfo=UTC)
+        assert len(schedule._heap) == 4
+
+    def test_unused_slots_are_dropped(self):
+        """Test that a slot nobody is on any more is not dispatched or requeued."""
+        schedule = self._schedule()
+        schedule.set_user(1, "Asia/Tokyo", None, NOW)
+        schedule.set_user(1, None, None, NOW)
+
+        assert len(schedule) == 0
+        due = schedule.pop_due(datetime(2024, 3, 11, tzinfo=UTC))
+        assert {slot[0] for _, slot in due} == {"Europe/Moscow"}
+        assert all(slot[0] == "Europe/Moscow" for _, slot in schedule._heap)
+
+    def test_scales_to_many_users(self):
+        """Test that a large number of users only creates one heap entry per slot."""
+        schedule = self._schedule()
+        zones = ["Europe/Moscow", "Europe/Berlin", "Asia/Tokyo", "America/New_York"]
+        for telegram_id in range(100_000):
+            schedule.set_user(telegram_id, zones[telegram_id % 4], None, NOW)
+
+        assert len(schedule) == 100_000
+        assert len(schedule._heap) == 8
+
+
+@pytest.fixture
+def db(db):
+    """Register users on default and personal schedules."""
+    with db.get_session() as session:
+        user_repo, _ = get_repositories(session)
+        for telegram_id in (1, 2, 3):
+            user_repo.create_user(telegram_id=telegram_id)
+        user_repo.set_timezone(2, "Asia/Tokyo")
+        user_repo.set_reminder_times(3, "09:00")
+    return db
+
+
+class TestReminderScheduler:
+    """Test who the scheduler sends reminders to."""
+
+    @pytest.mark.asyncio
+    async def test_due_slots_are_queued_in_outbox(self, db):
+        """Test that default slots queue default users and personal slots their members."""
+        scheduler = ReminderScheduler(MagicMock())
+        await scheduler._load_user_schedules(NOW)
+
+        default_slot = next(iter(scheduler.schedule.default_slots))
+        tokyo_slot = ("Asia/Tokyo", default_slot[1])
+        personal_slot = ("Europe/Moscow", time(9, 0))
+        later = NOW + timedelta(hours=1)
+        await scheduler._send_reminders([(NOW, default_slot), (NOW, personal_slot)])
+        await scheduler._send_reminders([(later, tokyo_slot)])
+        # A slot queued again after a restart is not duplicated
+        await scheduler._send_reminders([(later, tokyo_slot)])
+
+        with db.get_session() as session:
+            rows = session.execute(
+                select(ReminderDelivery.slot_at, User.telegram_id)
+                .join(User)
+                .order_by(ReminderDelivery.slot_at, User.telegram_id)
+            ).all()
+        slot_at = NOW.replace(tzinfo=None)
+        assert [tuple(row) for row in rows] == [
+            (slot_at, 1),
+            (slot_at, 3),
+            (slot_at + timedelta(hours=1), 2),
+        ]
+
+    @pytest.mark.asyncio
+    async def test_reload_picks_up_schedules_changed_elsewhere(self, db):
+        """Test that reloading personal schedules applies changes made by other instances."""
+        scheduler = ReminderScheduler(MagicMock())
+        await scheduler._load_user_schedules(NOW)
+        assert scheduler.schedule.user_ids() == {2, 3}
+
+        with db.get_session() as session:
+            user_repo, _ = get_repositories(session)
+            user_repo.set_reminder_times(3, None)
+            user_repo.set_reminder_times(1, "10:30")
+        await scheduler._load_user_schedules(NOW)
+
+        assert scheduler.schedule.user_ids() == {1, 2}
+        assert scheduler.schedule.members[("Europe/Moscow", time(10, 30))] == {1}
+        assert ("Europe/Moscow", time(9, 0)) not in scheduler.schedule.members
+
+    @pytest.mark.asyncio
+    async def test_timer_wakes_for_next_due_slot(self):
+        """Test that the single timer dispatches a slot when it falls due and records drift."""
+        scheduler = ReminderScheduler(MagicMock())
+        dispatched = []
+
+        async def send_reminders(due):
+            dispatched.extend(slot for _, slot in due)
+
+        scheduler._send_reminders = send_reminders
+        slot = next(iter(scheduler.schedule.default_slots))
+        scheduler.schedule._scheduled.add(slot)
+        heapq.heappush(scheduler.schedule._heap, (datetime.now(UTC) + timedelta(seconds=0.1), slot))
+
+        scheduler.running = True
+        timer = asyncio.create_task(scheduler._run())
+        await asyncio.sleep(0.3)
+        scheduler.stop()
+        await timer
+
+        assert dispatched == [slot]
+        assert scheduler.stats.wakeups == 1
+        assert 0 <= scheduler.stats.max_drift < 0.1
+
+
+class TestLeaderLease:
+    """Test that one of several instances owns reminder dispatch."""
+
+    def test_lease_has_one_holder_until_it_expires(self, db):
+        """Test that a lease is renewed by its holder and taken over once it expires."""
+        now = NOW.replace(tzinfo=None)
+        with db.get_session() as session:
+            lease_repo = LeaseRepository(session)
+            assert lease_repo.acquire("reminders", "a", ttl=30, now=now) is True
+            assert lease_repo.acquire("reminders", "b", ttl=30, now=now) is False
+            later = now + timedelta(seconds=20)
+            assert lease_repo.acquire("reminders", "a", ttl=30, now=later) is True
+            assert lease_repo.acquire("reminders", "b", ttl=30, now=later) is False
+
+            expired = later + timedelta(seconds=31)
+            assert lease_repo.acquire("reminders", "b", ttl=30, now=expired) is True
+            assert lease_repo.acquire("reminders", "a", ttl=30, now=expired) is False
+
+            lease_repo.release("reminders", "b")
+            assert lease_repo.acquire("reminders", "a", ttl=30, now=expired) is True
+
+    @pytest.mark.asyncio
+    async def test_released_lease_is_taken_over(self, db):
+        """Test that another instance takes over when the leader shuts down."""
+        leases = [LeaderLease("reminders", holder, ttl=0.3) for holder in ("a", "b")]
+        renewals = [asyncio.create_task(leases[0].run())]
+        await asyncio.wait_for(leases[0].wait_acquired(), 1)
+        renewals.append(asyncio.create_task(leases[1].run()))
+        await asyncio.sleep(0.2)
+        assert [lease.is_leader for lease in leases] == [True, False]
+
+        renewals[0].cancel()
+        await asyncio.gather(renewals[0], return_exceptions=True)
+        await leases[0].release()
+        await asyncio.wait_for(leases[1].wait_acquired(), 1)
+        assert [lease.is_leader for lease in leases] == [False, True]
+
+        renewals[1].cancel()
+        await asyncio.gather(*renewals, return_exceptions=True)
@@ -0,0 +1,76 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.services.workers import InFlight, WorkerPool, get_worker_database
+
+
+class TestWorkerPool:
+    """Test the pools blocking jobs run in."""
+
+    def test_rejects_unknown_mode(self):
+        """Test that the mode is checked up front and named after the pool."""
+        with pytest.raises(ValueError, match="Unknown chart executor mode"):
+            WorkerPool("fiber", 1, "chart")
+
+    @pytest.mark.asyncio
+    async def test_runs_jobs_off_the_event_loop(self):
+        """Test that jobs run in named pool threads and the pool restarts after shutdown."""
+        pool = WorkerPool("thread", 1, "test")
+        try:
+            name = await pool.run(lambda: threading.current_thread().name)
+            pool.shutdown()
+            assert await pool.run(sum, [1, 2]) == 3
+        finally:
+            pool.shutdown()
+
+        assert name.startswith("test")
+
+    def test_worker_database_is_reused(self, sqlite_url):
+        """Test that workers share one database per URL."""
+        assert get_worker_database(sqlite_url) is get_worker_database(sqlite_url)
+
+
+class TestInFlight:
+    """Test sharing running jobs between requesters."""
+
+    @pytest.mark.asyncio
+    async def test_requests_share_one_job(self):
+        """Test that concurrent requests for a key run it once and the key is freed after."""
+        in_flight: InFlight[str, int] = InFlight()
+        release = asyncio.Event()
+        runs = []
+
+        async def run():
+            runs.append(1)
+            await release.wait()
+            return 42
+
+        waiters = [asyncio.ensure_future(in_flight.join("key", run)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert "key" in in_flight and len(in_flight) == 1
+
+        release.set()
+        assert await asyncio.gather(*waiters) == [42, 42, 42]
+        assert runs == [1]
+        assert in_flight.get("key") is None
+
+    @pytest.mark.asyncio
+    async def test_requester_leaving_does_not_cancel_job(self):
+        """Test that a cancelled requester leaves the shared job running for the others."""
+        in_flight: InFlight[str, int] = InFlight()
+        release = asyncio.Event()
+
+        async def run():
+            await release.wait()
+            return 7
+
+        leaving = asyncio.ensure_future(in_flight.join("key", run))
+        staying = asyncio.ensure_future(in_flight.join("key", run))
+        await asyncio.sleep(0)
+        leaving.cancel()
+        release.set()
+
+        assert await staying == 7
+        assert leaving.cancelled()